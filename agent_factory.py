@@ -0,0 +1,679 @@
+"""
+Common construction for the agent personas: shared tools, shared settings from .env and the
+chat loop every persona runs
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from agent_metrics import SessionStats, shared_exporter
+from conversation_memory import memory_from_env, ollama_summarizer
+from intent_router import IntentRouter, answer_arithmetic, arithmetic_expression
+from model_router import model_router_from_env
+from ollama_router import ollama_base_urls, shared_router
+from resilience import (BackendUnavailable, DeadlineExceeded, aiterate_with_deadline, call_with_deadline,
+                        iterate_with_deadline, shared_breaker, shared_hedger, turn_deadline_from_env)
+from response_cache import make_cache_key, shared_cache
+from turn_metrics import TurnMetrics, astream_agent_run, finish_turn, stream_agent_run
+from warmup import ModelWarmup
+
+logger = logging.getLogger(__name__)
+
+
+def _search_tool(knowledge_base):
+    from cached_search import shared_search_tool
+
+    return shared_search_tool()
+
+
+def _calculator(knowledge_base):
+    from phi.tools.calculator import Calculator
+
+    return Calculator()
+
+
+def _lss_statistics(knowledge_base):
+    from lss_stats import LeanSixSigmaStatistics
+
+    return LeanSixSigmaStatistics()
+
+
+def _knowledge_base_search(knowledge_base):
+    from knowledge_tools import KnowledgeBaseSearch
+
+    return KnowledgeBaseSearch(knowledge_base)
+
+
+# Tool names used by personas.Persona.tools, each built on first use
+TOOL_BUILDERS = {
+    "search": _search_tool,
+    "calculator": _calculator,
+    "lss_statistics": _lss_statistics,
+    "knowledge_base": _knowledge_base_search,
+}
+
+_tools = {}
+_tools_lock = threading.Lock()
+
+
+def shared_tool(name, knowledge_base=None):
+    """Toolkit for the tool name, built once per process and registered on every agent's model.
+
+    Safe to share because none of these toolkits keeps per-run state: phidata
+    creates a new FunctionCall for each call and only reads the Function.
+    """
+    key = (name, knowledge_base if name == "knowledge_base" else None)
+    with _tools_lock:
+        tool = _tools.get(key)
+        if tool is None:
+            tool = _tools[key] = TOOL_BUILDERS[name](knowledge_base)
+        return tool
+
+
+_shared_knowledge_base = None
+_shared_knowledge_base_lock = threading.Lock()
+
+
+def shared_knowledge_base(host, keep_alive=None):
+    """Process-wide knowledge base from LSS_KB_DIR, indexed once however many agents use it"""
+    global _shared_knowledge_base
+    if not os.getenv("LSS_KB_DIR"):
+        return None
+    with _shared_knowledge_base_lock:
+        if _shared_knowledge_base is None:
+            # Imports NumPy, so only loaded when a knowledge base is configured
+            from knowledge_base import knowledge_base_from_env
+
+            _shared_knowledge_base = knowledge_base_from_env(host, keep_alive=keep_alive)
+        return _shared_knowledge_base
+
+
+# Ollama runtime options and the .env settings they are read from, as written by autotune.py
+OLLAMA_OPTIONS = {
+    "num_ctx": "OLLAMA_NUM_CTX",
+    "num_batch": "OLLAMA_NUM_BATCH",
+    "num_thread": "OLLAMA_NUM_THREAD",
+    "num_predict": "OLLAMA_NUM_PREDICT",
+}
+
+
+def ollama_options_from_env():
+    """Runtime options sent with every request, or None when .env sets none of them.
+
+    Every request to a model must carry the same load options (num_ctx, num_batch,
+    num_thread), or Ollama reloads it, so the agent, its summarizer and the warm-up share these.
+    """
+    options = {name: int(os.environ[setting]) for name, setting in OLLAMA_OPTIONS.items() if os.getenv(setting)}
+    return options or None
+
+
+def agent_settings_from_env():
+    """Constructor arguments every persona takes from .env.
+
+    The cache, host router, hedger, circuit breaker and metrics exporter are
+    process-wide; the memory is new, since it holds one conversation.
+    """
+    model_name = os.getenv("OLLAMA_MODEL", "llama2")
+    base_url = ollama_base_urls()[0]
+    router = shared_router()
+
+    keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+    options = ollama_options_from_env()
+    summarizer = ollama_summarizer(model_name, base_url, keep_alive=keep_alive, options=options)
+    return {
+        "model_name": model_name,
+        "base_url": base_url,
+        "cache": shared_cache(),
+        "memory": memory_from_env(summarizer=summarizer),
+        "keep_alive": keep_alive,
+        "options": options,
+        "router": router,
+        "exporter": shared_exporter(),
+        "model_router": model_router_from_env(model_name),
+        "turn_deadline": turn_deadline_from_env(),
+        "hedger": shared_hedger(router),
+        # With several hosts the router keeps a breaker per host
+        "breaker": shared_breaker(base_url) if router is None else None,
+    }
+
+
+class PersonaAgent:
+    """Agent for one of the personas in personas.py; subclasses set ``persona`` and add their commands"""
+
+    persona = None
+
+    def __init__(self, model_name="llama2", base_url="http://localhost:11434", cache=None, memory=None,
+                 keep_alive=None, router=None, exporter=None, options=None,
+                 model_router=None, knowledge_base=None, web_search=True, background=False,
+                 turn_deadline=None, hedger=None, breaker=None):
+        """Initialize the Ollama-powered AI Agent"""
+        self.model_name = model_name
+        self.base_url = base_url
+        self.last_turn_metrics = None
+        self.cache = cache
+        self.memory = memory
+        self.keep_alive = keep_alive
+        self.options = options
+        self.router = router
+        self.model_router = model_router
+        self.exporter = exporter
+        self.knowledge_base = knowledge_base
+        # Whether the last knowledge-base lookup failed, so an outage is logged once rather than every turn
+        self._knowledge_base_failing = False
+        self.web_search = web_search
+        # Seconds a turn may take before the fallback answer; None waits as long as the model takes
+        self.turn_deadline = turn_deadline
+        self.hedger = hedger
+        self.breaker = breaker
+        # Thread still finishing a run whose turn missed its deadline
+        self._abandoned = None
+        # Set by the interactive scripts so every turn is saved as it finishes
+        self.session_store = None
+        self.session_id = None
+        self.session_stats = SessionStats()
+        self.warmup = None
+        self.first_turn = None
+        self.intents = self._build_intents()
+
+        # Building the agent imports phidata and the tools, which takes most of startup
+        self._built = Future()
+        if background:
+            threading.Thread(target=self._build_in_background, name="agent-build", daemon=True).start()
+        else:
+            self._built.set_result(self._create_agent())
+
+    def _tool_names(self):
+        """The persona's tools this agent can offer"""
+        return [
+            name for name in self.persona.tools
+            if (name != "search" or self.web_search) and (name != "knowledge_base" or self.knowledge_base is not None)
+        ]
+
+    def _create_agent(self):
+        """Import phidata and the tools, then build the model and the persona agent"""
+        from phi.agent import Agent
+        from instrumented_ollama import InstrumentedOllama
+
+        # Initialize the Ollama model
+        model = InstrumentedOllama(
+            id=self.model_name,
+            host=self.base_url,
+            keep_alive=self.keep_alive,
+            options=self.options,
+            hedger=self.hedger,
+        )
+
+        tool_names = self._tool_names()
+        instructions = list(self.persona.instructions)
+        tool_instruction = self.persona.tool_instruction(tool_names)
+        if tool_instruction is not None:
+            instructions.append(tool_instruction)
+
+        agent = Agent(
+            model=model,
+            tools=[shared_tool(name, self.knowledge_base) for name in tool_names],
+            instructions=instructions,
+            show_tool_calls=True,
+            markdown=True,
+            # phidata's telemetry opens a new TLS client to phidata.app after every run
+            telemetry=os.getenv("PHI_TELEMETRY", "false").lower() == "true",
+        )
+
+        if self.memory is not None:
+            self.memory.system_tokens = self._system_tokens(agent, self.memory)
+        return agent
+
+    @staticmethod
+    def _tool_schemas(agent):
+        """The tool definitions sent with every request, serialized as the model receives them"""
+        # Registers the agent's tools on the model, which phidata otherwise does at the start of each run
+        agent.update_model()
+        return json.dumps(agent.model.get_tools_for_api() or [])
+
+    def _system_tokens(self, agent, memory):
+        """Tokens the persona prompt and the tool definitions take out of the memory's budget"""
+        tokens = memory.estimate_tokens(agent.get_system_message().content)
+        tokens += memory.estimate_tokens(self._tool_schemas(agent))
+        if self.knowledge_base is not None:
+            # Leave room for the excerpts added to each prompt
+            tokens += memory.estimate_tokens("x" * self.knowledge_base.context_chars)
+        return tokens
+
+    def _build_in_background(self):
+        try:
+            self._built.set_result(self._create_agent())
+        except Exception as e:
+            self._built.set_exception(e)
+
+    @property
+    def agent(self):
+        """The phidata agent, waiting for a background build to finish if needed"""
+        return self._built.result()
+
+    @property
+    def model(self):
+        return self.agent.model
+
+    def start_session(self, memory=None):
+        """Reuse the built agent for another conversation, dropping everything from the previous one"""
+        self._settle()
+        self.memory = memory
+        self.last_turn_metrics = None
+        self.session_id = None
+        agent = self.agent
+        agent.add_messages = None
+        # phidata keeps every run in the agent's own memory; it must not leak into the next session
+        agent.memory.clear()
+        if memory is not None:
+            memory.system_tokens = self._system_tokens(agent, memory)
+
+    def chat(self, message):
+        """Send a message to the agent and get a response"""
+        self.last_turn_metrics = None
+        metrics = TurnMetrics(started_at=time.perf_counter())
+        cached = self._cached_response(message, metrics)
+        if cached is not None:
+            return cached
+        try:
+            response = self._within_deadline(metrics, self._answer, message, metrics)
+            self.last_turn_metrics = finish_turn(self.agent, metrics)
+            self._record_turn(metrics)
+            self._store_response(message, response.content)
+            self._remember(message, response.content)
+            return response.content
+        except (DeadlineExceeded, BackendUnavailable) as e:
+            return self._fallback(message, metrics, e)
+        except Exception as e:
+            return f"Error: {str(e)}"
+
+    async def achat(self, message):
+        """Send a message to the agent without blocking the event loop"""
+        self.last_turn_metrics = None
+        metrics = TurnMetrics(started_at=time.perf_counter())
+        cached = self._cached_response(message, metrics)
+        if cached is not None:
+            return cached
+        try:
+            response = await self._awithin_deadline(metrics, self._aanswer(message, metrics))
+            self.last_turn_metrics = finish_turn(self.agent, metrics)
+            self._record_turn(metrics)
+            self._store_response(message, response.content)
+            await asyncio.get_running_loop().run_in_executor(None, self._remember, message, response.content)
+            return response.content
+        except (DeadlineExceeded, BackendUnavailable) as e:
+            return self._fallback(message, metrics, e)
+        except Exception as e:
+            return f"Error: {str(e)}"
+
+    async def achat_stream(self, message):
+        """Async generator yielding the response as it is generated, for the HTTP server"""
+        self.last_turn_metrics = None
+        metrics = TurnMetrics(started_at=time.perf_counter())
+        cached = self._cached_response(message, metrics)
+        if cached is not None:
+            yield cached
+            return
+        partial = []
+        try:
+            stream = self._aanswer_stream(message, metrics)
+            if self.turn_deadline is not None:
+                deadline = metrics.started_at + self.turn_deadline
+                stream = aiterate_with_deadline(self._abounded_stream(deadline, stream), deadline)
+            async for chunk in stream:
+                partial.append(chunk)
+                yield chunk
+            self.last_turn_metrics = metrics
+            self._record_turn(metrics)
+            self._store_response(message, self.agent.run_response.content)
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._remember, message, self.agent.run_response.content
+            )
+        except (DeadlineExceeded, BackendUnavailable) as e:
+            yield self._fallback(message, metrics, e, "".join(partial))
+        except Exception as e:
+            yield f"Error: {str(e)}"
+
+    def chat_stream(self, message):
+        """Send a message to the agent and yield the response as it is generated"""
+        self.last_turn_metrics = None
+        metrics = TurnMetrics(started_at=time.perf_counter())
+        cached = self._cached_response(message, metrics)
+        if cached is not None:
+            yield cached
+            return
+        partial = []
+        try:
+            stream = self._answer_stream(message, metrics)
+            if self.turn_deadline is not None:
+                deadline = metrics.started_at + self.turn_deadline
+                self._settle(deadline)
+                # The run goes on a worker thread so a stalled stream cannot hold the caller past the deadline
+                stream = iterate_with_deadline(self._bounded_stream(deadline, stream), deadline)
+            for chunk in stream:
+                partial.append(chunk)
+                yield chunk
+            self.last_turn_metrics = metrics
+            self._record_turn(metrics)
+            self._store_response(message, self.agent.run_response.content)
+            self._remember(message, self.agent.run_response.content)
+        except (DeadlineExceeded, BackendUnavailable) as e:
+            yield self._fallback(message, metrics, e, "".join(partial))
+        except Exception as e:
+            yield f"Error: {str(e)}"
+
+    def _answer(self, message, metrics):
+        self._prepare_context(message)
+        return self._run(message, metrics)
+
+    async def _aanswer(self, message, metrics):
+        # Memory may wait on a summarization call, so keep it off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self._prepare_context, message)
+        return await self._arun(message, metrics)
+
+    def _answer_stream(self, message, metrics):
+        self._prepare_context(message)
+        yield from self._stream(message, metrics)
+
+    async def _aanswer_stream(self, message, metrics):
+        await asyncio.get_running_loop().run_in_executor(None, self._prepare_context, message)
+        async for chunk in self._astream(message, metrics):
+            yield chunk
+
+    def _within_deadline(self, metrics, function, *args):
+        """``function(*args)``, given up on at the turn deadline while it finishes on a worker thread"""
+        if self.turn_deadline is None:
+            return function(*args)
+        deadline = metrics.started_at + self.turn_deadline
+        self._settle(deadline)
+        return call_with_deadline(self._bounded, deadline, deadline, function, *args)
+
+    async def _awithin_deadline(self, metrics, coroutine):
+        """Await the turn, cancelling it at the deadline"""
+        if self.turn_deadline is None:
+            return await coroutine
+        deadline = metrics.started_at + self.turn_deadline
+        self.model.deadline = deadline
+        try:
+            return await asyncio.wait_for(coroutine, max(0.0, deadline - time.perf_counter()))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded() from None
+        finally:
+            self.model.deadline = None
+
+    def _bounded(self, deadline, function, *args):
+        """Run with the deadline set on the model, which then starts no model call and no tool past it"""
+        self.model.deadline = deadline
+        try:
+            return function(*args)
+        finally:
+            self.model.deadline = None
+
+    def _bounded_stream(self, deadline, stream):
+        self.model.deadline = deadline
+        try:
+            yield from stream
+        finally:
+            self.model.deadline = None
+
+    async def _abounded_stream(self, deadline, stream):
+        self.model.deadline = deadline
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            self.model.deadline = None
+
+    def _settle(self, deadline=None):
+        """Wait for the run of a turn that missed its deadline: the phidata agent runs one turn at a time"""
+        worker, self._abandoned = self._abandoned, None
+        if worker is None:
+            return
+        worker.join(None if deadline is None else max(0.0, deadline - time.perf_counter()))
+        if worker.is_alive():
+            self._abandoned = worker
+            raise DeadlineExceeded("The previous turn is still finishing")
+
+    def _fallback(self, message, metrics, error, partial=""):
+        """Answer for a turn that missed its deadline or found no host: the streamed part, else a cached answer"""
+        if isinstance(error, DeadlineExceeded):
+            if error.worker is not None:
+                self._abandoned = error.worker
+            metrics.deadline_missed = True
+            reason = f"No answer within the {self.turn_deadline:.3g}s turn deadline"
+        else:
+            reason = str(error)
+        metrics.total_time = time.perf_counter() - metrics.started_at
+        # Any earlier answer to the same question beats none, even if the conversation has moved on
+        cached = self.cache.get(self._cache_key(message)) if self.cache is not None else None
+        if partial.strip():
+            metrics.fallback = "partial"
+            answer = f"\n\n⚠️ {reason}; the answer above is incomplete."
+        elif cached is not None:
+            metrics.fallback = "cache"
+            answer = f"⚠️ {reason}; here is the answer given to the same question earlier:\n\n{cached}"
+        else:
+            metrics.fallback = "none"
+            answer = f"Error: {reason}"
+        self.last_turn_metrics = metrics
+        self._record_turn(metrics)
+        return answer
+
+    def _run(self, message, metrics):
+        """Run the agent on the routed model, escalating to the main model if the answer fails the check"""
+        model_id = self._route(message, metrics)
+        with self._backend(), self._using_model(model_id):
+            response = self.agent.run(message)
+        if self._escalate(model_id, response.content, metrics):
+            with self._backend():
+                response = self.agent.run(message)
+        return response
+
+    async def _arun(self, message, metrics):
+        model_id = self._route(message, metrics)
+        with self._backend(), self._using_model(model_id):
+            response = await self.agent.arun(message)
+        if self._escalate(model_id, response.content, metrics):
+            with self._backend():
+                response = await self.agent.arun(message)
+        return response
+
+    def _stream(self, message, metrics):
+        """Streaming counterpart of _run; an escalated answer follows the small model's after a notice"""
+        model_id = self._route(message, metrics)
+        with self._backend(), self._using_model(model_id):
+            yield from stream_agent_run(self.agent, message, metrics)
+        if self._escalate(model_id, self.agent.run_response.content, metrics):
+            yield f"\n\n↗️ Escalating to {self.model_name}...\n\n"
+            with self._backend():
+                yield from stream_agent_run(self.agent, message, metrics)
+
+    async def _astream(self, message, metrics):
+        model_id = self._route(message, metrics)
+        with self._backend(), self._using_model(model_id):
+            async for chunk in astream_agent_run(self.agent, message, metrics):
+                yield chunk
+        if self._escalate(model_id, self.agent.run_response.content, metrics):
+            yield f"\n\n↗️ Escalating to {self.model_name}...\n\n"
+            with self._backend():
+                async for chunk in astream_agent_run(self.agent, message, metrics):
+                    yield chunk
+
+    def _route(self, message, metrics):
+        """Model id for this turn: the main model unless the model router picks the small one"""
+        if self.model_router is None:
+            return self.model_name
+        has_context = self.memory is not None and self.memory.has_context()
+        metrics.model = self.model_router.choose(message, has_context=has_context)
+        return metrics.model
+
+    def _escalate(self, model_id, answer, metrics):
+        """Whether a small-model answer must be redone on the main model"""
+        if model_id == self.model_name or self.model_router.accept(answer):
+            return False
+        metrics.escalated = True
+        metrics.escalated_after = time.perf_counter() - metrics.started_at
+        metrics.model = self.model_name
+        return True
+
+    @contextlib.contextmanager
+    def _using_model(self, model_id):
+        """Point the agent's Ollama model at another model id for one run"""
+        self.model.id = model_id
+        try:
+            yield
+        finally:
+            self.model.id = self.model_name
+
+    def _cache_key(self, message):
+        knowledge = self.knowledge_base.version if self.knowledge_base is not None else None
+        return make_cache_key(self.model_name, self.agent.instructions, self.agent.tools, message, knowledge=knowledge)
+
+    def _cached_response(self, message, metrics):
+        """Return a cached answer for message, recording the turn as a cache hit"""
+        # Follow-up questions depend on the conversation so far, which the key does not cover
+        if self.cache is None or (self.memory is not None and self.memory.has_context()):
+            return None
+        response = self.cache.get(self._cache_key(message))
+        if response is not None:
+            metrics.cached = True
+            metrics.total_time = time.perf_counter() - metrics.started_at
+            self.last_turn_metrics = metrics
+            self._record_turn(metrics)
+        return response
+
+    def _store_response(self, message, response):
+        """Cache a successful answer so repeated questions skip the LLM"""
+        if self.memory is not None and self.memory.has_context():
+            return
+        if self.cache is not None and isinstance(response, str) and response:
+            self.cache.set(self._cache_key(message), response)
+
+    def _record_turn(self, metrics):
+        """Add a finished turn to the session stats and the configured metrics export"""
+        if self.model_router is not None:
+            self.model_router.record(metrics)
+        self.session_stats.add(metrics)
+        if self.exporter is not None:
+            self.exporter.export(metrics, agent=self.persona.name, model=self.model_name)
+
+    def _backend(self):
+        """Point the model at the least-loaded healthy Ollama host for one turn, through its circuit breaker"""
+        if self.router is not None:
+            return self.router.lease(self.model)
+        if self.breaker is not None:
+            return self.breaker.guard(self.base_url)
+        return contextlib.nullcontext()
+
+    def _prepare_context(self, message):
+        """Replay the budgeted conversation context and relevant knowledge-base excerpts ahead of the new message"""
+        messages = self.memory.context_messages() if self.memory is not None else []
+        if self.knowledge_base is not None:
+            try:
+                excerpts = self.knowledge_base.context(message)
+            except Exception as e:
+                # The knowledge base is optional: without the embedding model the turn goes ahead without excerpts
+                if not self._knowledge_base_failing:
+                    logger.warning("Knowledge base lookup failed, answering without excerpts: %s", e)
+                self._knowledge_base_failing = True
+                excerpts = None
+            else:
+                self._knowledge_base_failing = False
+            if excerpts:
+                messages.append({"role": "system", "content": excerpts})
+        self.agent.add_messages = messages or None
+
+    def _remember(self, message, response):
+        """Add the finished turn to memory, calibrating the token estimate from Ollama's count, and save it"""
+        if not isinstance(response, str):
+            return
+        input_tokens = self.agent.run_response.metrics.get("input_tokens") if self.agent.run_response.metrics else None
+        prompt_tokens = input_tokens[0] if input_tokens else None
+        if self.memory is not None:
+            prompt_chars = len(self.agent.get_system_message().content) + len(message)
+            prompt_chars += len(self._tool_schemas(self.agent))
+            prompt_chars += sum(len(m["content"]) for m in self.agent.add_messages or [])
+            self.memory.add_turn(message, response, prompt_tokens=prompt_tokens, prompt_chars=prompt_chars)
+        self._save_turn(message, response, prompt_tokens)
+
+    def _save_turn(self, message, response, prompt_tokens):
+        """Append the turn to the session store; a failed write costs durability, not the answer"""
+        if self.session_store is None:
+            return
+        try:
+            if self.session_id is None:
+                self.session_id = self.session_store.create_session(self.persona.name, self.model_name)
+            # A summary still being written in the background is saved with the next turn
+            summary, summary_turns = self.memory.snapshot() if self.memory is not None else ("", 0)
+            self.session_store.append_turn(self.session_id, message, response, prompt_tokens=prompt_tokens,
+                                           summary=summary, summary_turns=summary_turns)
+        except sqlite3.Error as e:
+            logger.warning("Could not save the turn to the session store: %s", e)
+
+    def resume_session(self, session_id=None):
+        """Continue a stored session, by id or id prefix, or the persona's latest one; returns its record or None.
+
+        Only the summary and the turns after it are read, so resuming a long session is as fast as a short one.
+        """
+        session_id = self.session_store.resolve(session_id, agent=self.persona.name)
+        # Twice the verbatim turns leaves room for turns the last saved summary did not cover yet
+        tail_turns = 2 * self.memory.keep_recent_turns if self.memory is not None else 0
+        session = self.session_store.resume(session_id, tail_turns=tail_turns) if session_id else None
+        if session is None:
+            return None
+        if self.memory is not None:
+            self.memory.restore(session["summary"], session["tail"], session["summary_turns"])
+        self.session_id = session_id
+        return session
+
+    def _calculate(self, expression):
+        return answer_arithmetic(expression) if expression else "Usage: calc <expression>"
+
+    def _stats_report(self, _=None):
+        """Timing breakdown of the last turn and the session, with local answers and model routing"""
+        lines = [self.session_stats.report(self.last_turn_metrics),
+                 f"   Answered locally: {self.intents.saved_turns} turn(s)"]
+        if self.model_router is not None:
+            lines.append(f"   {self.model_router.summary()}")
+        if self.hedger is not None:
+            lines.append(f"   {self.hedger.summary()}")
+        return "\n" + "\n".join(lines)
+
+    def _build_intents(self):
+        """Quick commands and deterministic questions answered locally before the model"""
+        intents = IntentRouter()
+        intents.add("calc", self._calculate, matcher=arithmetic_expression,
+                    description="Evaluate arithmetic locally")
+        intents.add("stats", self._stats_report, description="Timing details", saves_turn=False)
+        return intents
+
+    def start_warmup(self):
+        """Load the model and pre-evaluate the persona prompt in the background"""
+        urls = [backend.url for backend in self.router.backends] if self.router is not None else [self.base_url]
+        models = [self.model_name] + ([self.model_router.small_model] if self.model_router is not None else [])
+        warmups = [
+            ModelWarmup(
+                url,
+                model_name,
+                system_prompt=lambda: self.agent.get_system_message().content,
+                keep_alive=self.keep_alive,
+                options=self.options,
+            ).start()
+            for model_name in models
+            for url in urls
+        ]
+        self.warmup = warmups[0]
+        return self.warmup
+
+    def _report_first_turn(self, warm):
+        """Record and print whether the first answer came from a warm model"""
+        latency = self.last_turn_metrics.total_time if self.last_turn_metrics is not None else None
+        self.first_turn = {"warm": warm, "latency": latency}
+        if latency is not None:
+            print(f"{'🔥' if warm else '❄️'} First turn on a {'warm' if warm else 'cold'} model: {latency:.2f}s")
@@ -0,0 +1,208 @@
+"""
+Session statistics and metrics export (JSON-lines log, Prometheus text format) for agent turns
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# TurnMetrics fields that are summed across turns
+TIME_FIELDS = ("total_time", "load_time", "prompt_eval_time", "generation_time", "network_overhead", "tool_time")
+
+# Upper bounds (seconds) of the turn-time histogram buckets, for p95/p99 with histogram_quantile()
+TURN_SECONDS_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+
+def _metric_family(name):
+    """Summary and histogram samples (_sum/_count/_bucket) share one metric family; counters are their own"""
+    for suffix in ("_sum", "_count", "_bucket"):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of the samples, or None without any"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(len(ordered) * q / 100) - 1))]
+
+
+class SessionStats:
+    """Running totals over the turns of one agent, shown by the 'stats' command"""
+
+    def __init__(self):
+        self.turns = 0
+        self.cached = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.first_token_times = []
+        self.turn_times = []
+        self.deadline_misses = 0
+        self.totals = dict.fromkeys(TIME_FIELDS, 0.0)
+        self.tool_times = {}
+
+    def add(self, metrics):
+        self.turns += 1
+        if metrics.cached:
+            self.cached += 1
+            return
+        self.prompt_tokens += metrics.prompt_tokens
+        self.output_tokens += metrics.output_tokens
+        self.deadline_misses += metrics.deadline_missed
+        if metrics.total_time is not None:
+            self.turn_times.append(metrics.total_time)
+        if metrics.time_to_first_token is not None:
+            self.first_token_times.append(metrics.time_to_first_token)
+        for name in TIME_FIELDS:
+            self.totals[name] += getattr(metrics, name) or 0.0
+        for name, seconds in metrics.tool_times.items():
+            self.tool_times[name] = self.tool_times.get(name, 0.0) + seconds
+
+    def report(self, last_turn=None):
+        """Multi-line report of the last turn and the session so far"""
+        lines = ["📈 Last turn:"]
+        lines += [f"   {line}" for line in last_turn.breakdown()] if last_turn is not None else ["   (none yet)"]
+        lines.append(f"📊 Session: {self.turns} turn(s), {self.cached} from cache")
+        total = self.totals["total_time"]
+        if total > 0:
+            for label, name in (("Prompt eval", "prompt_eval_time"), ("Generation", "generation_time"),
+                                ("Model load", "load_time"), ("Network/client", "network_overhead"),
+                                ("Tools", "tool_time")):
+                lines.append(f"   {label}: {self.totals[name]:.2f}s ({self.totals[name] / total:.0%})")
+            lines.append(f"   Tokens: {self.prompt_tokens} prompt, {self.output_tokens} generated")
+        if self.first_token_times:
+            mean = sum(self.first_token_times) / len(self.first_token_times)
+            lines.append(f"   Mean time to first token: {mean:.2f}s")
+        if self.turn_times:
+            p50, p95, p99 = (percentile(self.turn_times, q) for q in (50, 95, 99))
+            lines.append(f"   Turn time p50/p95/p99: {p50:.2f}s / {p95:.2f}s / {p99:.2f}s")
+        if self.deadline_misses:
+            lines.append(f"   Deadline misses: {self.deadline_misses}")
+        for name, seconds in sorted(self.tool_times.items(), key=lambda item: -item[1]):
+            lines.append(f"   Tool {name}: {seconds:.2f}s")
+        return "\n".join(lines)
+
+
+class MetricsExporter:
+    def __init__(self, log_path=None, port=None, host="127.0.0.1"):
+        """Export every turn's metrics to a JSON-lines log and/or a Prometheus endpoint.
+
+        Args:
+            log_path: File that gets one JSON object per turn appended.
+            port: Serve Prometheus metrics on http://host:port/metrics when set.
+            host: Interface for the metrics endpoint.
+        """
+        self.log_path = log_path
+        self.port = port
+        self.host = host
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._server = None
+        if log_path and os.path.dirname(log_path):
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+
+    def export(self, metrics, agent, model):
+        labels = (("agent", agent), ("model", model))
+        with self._lock:
+            self._count("agent_turns_total", labels + (("cached", str(metrics.cached).lower()),))
+            if not metrics.cached:
+                self._count("agent_turn_seconds_sum", labels, metrics.total_time or 0.0)
+                self._count("agent_turn_seconds_count", labels)
+                for bound in TURN_SECONDS_BUCKETS + ("+Inf",):
+                    if bound == "+Inf" or (metrics.total_time or 0.0) <= bound:
+                        self._count("agent_turn_seconds_bucket", labels + (("le", str(bound)),))
+                if metrics.deadline_missed:
+                    self._count("agent_deadline_misses_total", labels + (("fallback", metrics.fallback),))
+                if metrics.time_to_first_token is not None:
+                    self._count("agent_time_to_first_token_seconds_sum", labels, metrics.time_to_first_token)
+                    self._count("agent_time_to_first_token_seconds_count", labels)
+                self._count("ollama_prompt_tokens_total", labels, metrics.prompt_tokens)
+                self._count("ollama_output_tokens_total", labels, metrics.output_tokens)
+                self._count("ollama_load_seconds_total", labels, metrics.load_time)
+                self._count("ollama_prompt_eval_seconds_total", labels, metrics.prompt_eval_time)
+                self._count("ollama_generation_seconds_total", labels, metrics.generation_time)
+                self._count("agent_network_overhead_seconds_total", labels, metrics.network_overhead)
+                # Concurrent tool calls overlap, so this can be less than the per-tool seconds added up
+                self._count("agent_tool_wall_seconds_total", labels, metrics.tool_time)
+                for tool, seconds in metrics.tool_times.items():
+                    self._count("agent_tool_seconds_total", labels + (("tool", tool),), seconds)
+                    self._count("agent_tool_calls_total", labels + (("tool", tool),))
+
+            if self.log_path:
+                record = {"timestamp": time.time(), "agent": agent, "model": model, **metrics.as_dict()}
+                record.pop("started_at", None)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+
+    def _count(self, name, labels, value=1):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def render(self):
+        """Current counters in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+        histograms = {_metric_family(name) for (name, _), _ in counters if name.endswith("_bucket")}
+        lines, typed = [], set()
+        for (name, labels), value in counters:
+            family = _metric_family(name)
+            if family not in typed:
+                typed.add(family)
+                kind = "counter" if family == name else "histogram" if family in histograms else "summary"
+                lines.append(f"# TYPE {family} {kind}")
+            label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+            lines.append(f"{name}{{{label_text}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def start_http(self):
+        """Serve /metrics on a background thread"""
+        if self._server is not None or not self.port:
+            return self
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self
+
+
+_shared_exporter = None
+_shared_exporter_lock = threading.Lock()
+
+
+def shared_exporter():
+    """Process-wide exporter configured in .env, or None when metrics export is off.
+
+    AGENT_METRICS_LOG appends one JSON line per turn; AGENT_METRICS_PORT serves
+    Prometheus metrics (AGENT_METRICS_HOST picks the interface, default 127.0.0.1).
+    """
+    global _shared_exporter
+    log_path = os.getenv("AGENT_METRICS_LOG")
+    port = int(os.getenv("AGENT_METRICS_PORT") or 0)
+    if not log_path and not port:
+        return None
+    with _shared_exporter_lock:
+        if _shared_exporter is None:
+            _shared_exporter = MetricsExporter(log_path=log_path, port=port,
+                                               host=os.getenv("AGENT_METRICS_HOST", "127.0.0.1")).start_http()
+        return _shared_exporter
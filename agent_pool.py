@@ -0,0 +1,126 @@
+"""
+Pool of pre-built agents checked out per session and returned afterwards
+"""
+
+import asyncio
+import collections
+import contextlib
+import threading
+import time
+
+
+class AgentPool:
+    def __init__(self, factory, size=4):
+        """Build ``size`` agents up front and lend them out one conversation turn at a time.
+
+        Building an agent (model, tools, persona prompt) costs far more than a
+        turn's bookkeeping, so a multi-user deployment builds a fixed set once and
+        only swaps the session's memory in and out. Thread-safe: the synchronous
+        and asyncio checkouts can be mixed.
+
+        Args:
+            factory: Callable returning a new agent, e.g. ``create_lss_agent``.
+            size: Agents in the pool, i.e. turns that can run at once.
+        """
+        self.size = size
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = collections.deque(factory() for _ in range(size))
+        # Read-only reference for settings every agent shares (model, host, keep-alive)
+        self.template = self._idle[0]
+        # Futures of asyncio checkouts waiting for an agent, served before the idle queue grows
+        self._waiters = collections.deque()
+        self.counters = {"checkouts": 0, "waits": 0, "timeouts": 0}
+        self.wait_seconds = 0.0
+
+    def checkout(self, memory=None, timeout=None):
+        """Take an agent for a session, waiting up to ``timeout`` seconds; raises TimeoutError"""
+        started = time.perf_counter()
+        with self._available:
+            if not self._available.wait_for(lambda: self._idle, timeout):
+                self.counters["timeouts"] += 1
+                raise TimeoutError(f"No agent free within {timeout}s")
+            agent = self._idle.popleft()
+            self._count(started)
+        return self._start(agent, memory)
+
+    async def acheckout(self, memory=None, timeout=None):
+        """Asyncio counterpart of checkout; raises asyncio.TimeoutError"""
+        started = time.perf_counter()
+        with self._lock:
+            waiter = None
+            if self._idle:
+                agent = self._idle.popleft()
+                self._count(started)
+            else:
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+        if waiter is not None:
+            try:
+                # wait_for returns the agent if it arrived just as the timeout fired
+                agent = await asyncio.wait_for(waiter, timeout)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                    self.counters["timeouts"] += 1
+                raise
+            with self._lock:
+                self._count(started)
+        return self._start(agent, memory)
+
+    def _start(self, agent, memory):
+        try:
+            agent.start_session(memory)
+        except BaseException:
+            self.checkin(agent)
+            raise
+        return agent
+
+    def checkin(self, agent):
+        """Return an agent; its session memory is detached so nothing leaks into the next checkout"""
+        agent.memory = None
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if not waiter.done():
+                    waiter.get_loop().call_soon_threadsafe(self._hand_over, waiter, agent)
+                    return
+            self._idle.append(agent)
+            self._available.notify()
+
+    def _hand_over(self, waiter, agent):
+        # The waiter may have timed out between checkin and this callback
+        if waiter.done():
+            self.checkin(agent)
+        else:
+            waiter.set_result(agent)
+
+    def _count(self, started):
+        waited = time.perf_counter() - started
+        self.counters["checkouts"] += 1
+        if waited > 0.001:
+            self.counters["waits"] += 1
+            self.wait_seconds += waited
+
+    @contextlib.contextmanager
+    def lease(self, memory=None, timeout=None):
+        """Agent checked out for the body of a with block"""
+        agent = self.checkout(memory, timeout)
+        try:
+            yield agent
+        finally:
+            self.checkin(agent)
+
+    @contextlib.asynccontextmanager
+    async def alease(self, memory=None, timeout=None):
+        agent = await self.acheckout(memory, timeout)
+        try:
+            yield agent
+        finally:
+            self.checkin(agent)
+
+    def stats(self):
+        with self._lock:
+            return {"size": self.size, "idle": len(self._idle), "waiting": len(self._waiters), **self.counters,
+                    "wait_seconds": round(self.wait_seconds, 3)}
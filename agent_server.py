@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+HTTP serving mode for the Ollama agents.
+
+A small asyncio HTTP/1.1 server (no framework needed) exposing:
+
+    POST   /v1/chat                {"message": ..., "agent": "lss"|"general", "session_id": ..., "stream": true}
+    DELETE /v1/sessions/<id>       forget a session's conversation
+    GET    /health                 queue depth, sessions and workers
+
+Requests go into a bounded queue served by a fixed number of workers, one per
+pre-built agent in each kind's AgentPool, so concurrency against Ollama is capped while dozens of
+clients wait without a thread each. A full queue answers 429, and every request
+carries a deadline covering both queueing and generation; the agent's own turn
+deadline is cut to what is left, so a late turn still returns the partial or cached
+fallback answer instead of only a 504. Streaming responses
+use Server-Sent Events with one event per token chunk.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+from agent_pool import AgentPool
+from ai_agent import create_agent
+from conversation_memory import memory_from_env, ollama_summarizer
+from lss_agent import create_lss_agent
+
+load_dotenv()
+
+AGENT_FACTORIES = {
+    "lss": create_lss_agent,
+    "general": create_agent,
+}
+
+# Seconds past a request's deadline allowed for the agent's fallback answer
+FALLBACK_GRACE = 1.0
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           429: "Too Many Requests", 500: "Internal Server Error", 504: "Gateway Timeout"}
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class Session:
+    def __init__(self, session_id, kind, memory):
+        self.session_id = session_id
+        self.kind = kind
+        self.memory = memory
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+
+
+class Job:
+    def __init__(self, session, message, deadline):
+        self.session = session
+        self.message = message
+        self.deadline = deadline
+        self.events = asyncio.Queue()
+        self.cancelled = False
+
+
+class AgentServer:
+    def __init__(self, workers=4, queue_size=32, deadline=120.0, session_ttl=3600.0, kinds=None):
+        """
+        Args:
+            workers: Agents per kind, i.e. requests in flight against Ollama at once.
+            queue_size: Requests allowed to wait; beyond this clients get 429.
+            deadline: Default and maximum seconds a request may take, queueing included.
+            session_ttl: Idle seconds before a session's conversation is dropped.
+            kinds: Agent kinds to serve (defaults to all of AGENT_FACTORIES).
+        """
+        self.workers = workers
+        self.deadline = deadline
+        self.session_ttl = session_ttl
+        self.kinds = kinds or list(AGENT_FACTORIES)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.pools = {}
+        self.sessions = {}
+        self.counters = {"served": 0, "rejected": 0, "timed_out": 0, "errors": 0, "fallbacks": 0}
+        self._tasks = []
+
+    async def start(self, host, port):
+        for kind in self.kinds:
+            self.pools[kind] = AgentPool(AGENT_FACTORIES[kind], size=self.workers)
+        # One worker per agent across all kinds keeps every pooled agent busy
+        for _ in range(self.workers * len(self.kinds)):
+            self._tasks.append(asyncio.create_task(self._worker()))
+        self._tasks.append(asyncio.create_task(self._expire_sessions()))
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    # -*- Sessions
+
+    def _session(self, session_id, kind):
+        session = self.sessions.get(session_id) if session_id else None
+        if session is None or session.kind != kind:
+            session_id = session_id or uuid.uuid4().hex
+            # Checking out an agent sets the memory's persona prompt size
+            template = self.pools[kind].template
+            # The agent's options, so summaries do not make Ollama reload the model
+            summarizer = ollama_summarizer(template.model_name, template.base_url, keep_alive=template.keep_alive,
+                                           options=template.options)
+            memory = memory_from_env(summarizer=summarizer)
+            session = Session(session_id, kind, memory)
+            self.sessions[session_id] = session
+        session.last_used = time.monotonic()
+        return session
+
+    async def _expire_sessions(self):
+        while True:
+            await asyncio.sleep(60)
+            cutoff = time.monotonic() - self.session_ttl
+            for session_id in [s for s, session in self.sessions.items() if session.last_used < cutoff]:
+                self.sessions.pop(session_id, None)
+
+    # -*- Workers
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._run_job(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run_job(self, job):
+        if job.cancelled:
+            return
+        pool = self.pools[job.session.kind]
+        # Turns of one session run in order so its memory stays consistent
+        async with job.session.lock:
+            try:
+                agent = await pool.acheckout(job.session.memory, timeout=max(0.0, job.deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                self.counters["timed_out"] += 1
+                job.events.put_nowait(("error", {"status": 504, "error": "Deadline exceeded while queued"}))
+                return
+            parts = []
+            turn_deadline = agent.turn_deadline
+            remaining = job.deadline - time.monotonic()
+            agent.turn_deadline = min(remaining, turn_deadline or remaining)
+
+            async def generate():
+                async for chunk in agent.achat_stream(job.message):
+                    if job.cancelled:
+                        break
+                    parts.append(chunk)
+                    job.events.put_nowait(("token", {"content": chunk}))
+
+            try:
+                # A little grace so the agent's fallback, due at the deadline itself, gets out
+                await asyncio.wait_for(generate(), timeout=job.deadline - time.monotonic() + FALLBACK_GRACE)
+                response = "".join(parts)
+                if response.startswith("Error: "):
+                    self.counters["errors"] += 1
+                    job.events.put_nowait(("error", {"status": 500, "error": response[len("Error: "):]}))
+                else:
+                    self.counters["served"] += 1
+                    if agent.last_turn_metrics is not None and agent.last_turn_metrics.fallback is not None:
+                        self.counters["fallbacks"] += 1
+                    metrics = agent.last_turn_metrics.as_dict() if agent.last_turn_metrics else None
+                    job.events.put_nowait(("done", {"response": response, "metrics": metrics}))
+            except asyncio.TimeoutError:
+                self.counters["timed_out"] += 1
+                job.events.put_nowait(
+                    ("error", {"status": 504, "error": "Deadline exceeded", "partial": "".join(parts)})
+                )
+            finally:
+                agent.turn_deadline = turn_deadline
+                pool.checkin(agent)
+
+    # -*- HTTP
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0) or 0)
+            if length > MAX_BODY_BYTES:
+                await self._send_json(writer, 413, {"error": "Request body too large"})
+                return
+            body = await reader.readexactly(length) if length else b""
+            await self._route(method.upper(), path, body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            try:
+                await self._send_json(writer, 500, {"error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _route(self, method, path, body, writer):
+        path = path.split("?", 1)[0]
+        if path == "/health":
+            if method != "GET":
+                return await self._send_json(writer, 405, {"error": "Use GET"})
+            return await self._send_json(writer, 200, {
+                "status": "ok",
+                "queued": self.queue.qsize(),
+                "queue_size": self.queue.maxsize,
+                "sessions": len(self.sessions),
+                "workers": self.workers,
+                "agents": self.kinds,
+                "pools": {kind: pool.stats() for kind, pool in self.pools.items()},
+                "ollama": self._backend_stats(),
+                **self.counters,
+            })
+        if path.startswith("/v1/sessions/"):
+            if method != "DELETE":
+                return await self._send_json(writer, 405, {"error": "Use DELETE"})
+            removed = self.sessions.pop(path[len("/v1/sessions/"):], None) is not None
+            return await self._send_json(writer, 200 if removed else 404, {"deleted": removed})
+        if path == "/v1/chat":
+            if method != "POST":
+                return await self._send_json(writer, 405, {"error": "Use POST"})
+            return await self._chat(body, writer)
+        return await self._send_json(writer, 404, {"error": f"No route for {path}"})
+
+    async def _chat(self, body, writer):
+        try:
+            request = json.loads(body or b"{}")
+            message = str(request.get("message", "")).strip()
+            kind = request.get("agent", "lss")
+            deadline = min(float(request.get("deadline", self.deadline)), self.deadline)
+        except (ValueError, TypeError, AttributeError):
+            return await self._send_json(writer, 400, {"error": "Body must be a JSON object"})
+        if not message:
+            return await self._send_json(writer, 400, {"error": "'message' is required"})
+        if kind not in self.pools:
+            return await self._send_json(writer, 400, {"error": f"'agent' must be one of {list(self.pools)}"})
+
+        session = self._session(request.get("session_id"), kind)
+        job = Job(session, message, time.monotonic() + deadline)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.counters["rejected"] += 1
+            return await self._send_json(writer, 429, {"error": "Server busy, retry later"}, {"Retry-After": "5"})
+
+        session_header = {"X-Session-Id": session.session_id}
+        try:
+            if request.get("stream", True):
+                await self._stream_events(job, writer, session_header)
+            else:
+                kind, payload = await self._final_event(job)
+                status = 200 if kind == "done" else payload.pop("status", 500)
+                await self._send_json(writer, status, {"session_id": session.session_id, **payload}, session_header)
+        except ConnectionError:
+            job.cancelled = True
+
+    async def _final_event(self, job):
+        while True:
+            kind, payload = await job.events.get()
+            if kind != "token":
+                return kind, payload
+
+    async def _stream_events(self, job, writer, extra_headers):
+        headers = {"Content-Type": "text/event-stream", "Cache-Control": "no-cache", **extra_headers}
+        writer.write(self._head(200, headers))
+        await writer.drain()
+        while True:
+            kind, payload = await job.events.get()
+            data = json.dumps({"session_id": job.session.session_id, **payload} if kind != "token" else payload)
+            writer.write(f"event: {kind}\ndata: {data}\n\n".encode("utf-8"))
+            await writer.drain()
+            if kind != "token":
+                return
+
+    @staticmethod
+    def _head(status, headers):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+        lines += [f"{name}: {value}" for name, value in {**headers, "Connection": "close"}.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    def _backend_stats(self):
+        """Circuit state of the Ollama hosts and how many requests were hedged; shared by every agent"""
+        agent = next(iter(self.pools.values())).template
+        stats = {}
+        if agent.router is not None:
+            stats["hosts"] = agent.router.stats()
+        elif agent.breaker is not None:
+            stats["hosts"] = [{"url": agent.base_url, **agent.breaker.as_dict()}]
+        if agent.hedger is not None:
+            stats["hedging"] = dict(agent.hedger.counters)
+        return stats
+
+    async def _send_json(self, writer, status, payload, extra_headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Content-Length": str(len(body)), **(extra_headers or {})}
+        writer.write(self._head(status, headers) + body)
+        await writer.drain()
+
+
+async def serve(host, port, **options):
+    server = AgentServer(**options)
+    tcp_server = await server.start(host, port)
+    print(f"🌐 Serving {', '.join(server.kinds)} agents on http://{host}:{port} "
+          f"({server.workers} workers per agent, queue {server.queue.maxsize})")
+    async with tcp_server:
+        await tcp_server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Ollama agents over HTTP with SSE streaming")
+    parser.add_argument("--host", default=os.getenv("AGENT_SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("AGENT_SERVER_PORT", 8080)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("OLLAMA_NUM_PARALLEL", 4)),
+                        help="Requests in flight against Ollama per agent kind")
+    parser.add_argument("--queue-size", type=int, default=int(os.getenv("AGENT_SERVER_QUEUE", 32)))
+    parser.add_argument("--deadline", type=float, default=float(os.getenv("AGENT_SERVER_DEADLINE", 120)))
+    parser.add_argument("--agents", default="lss,general", help="Comma-separated agent kinds to serve")
+    args = parser.parse_args()
+
+    kinds = [kind.strip() for kind in args.agents.split(",") if kind.strip() in AGENT_FACTORIES]
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers, queue_size=args.queue_size,
+                          deadline=args.deadline, kinds=kinds))
+    except KeyboardInterrupt:
+        print("\nShutting down agent server...")
+
+
+if __name__ == "__main__":
+    main()
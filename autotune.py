@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Tune Ollama's runtime options for this host: benchmark num_ctx, num_batch and num_thread with
+representative Lean Six Sigma prompts, pick num_predict from the answers, and write the best
+profile to .env for create_agent() and create_lss_agent()
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import uuid
+
+import requests
+
+from agent_factory import OLLAMA_OPTIONS
+from ollama_router import ollama_base_urls
+from personas import LEAN_SIX_SIGMA
+
+LSS_PROMPTS = [
+    "Our filling line has a Cpk of 0.8 on fill weight. Walk me through the DMAIC steps to bring it above 1.33.",
+    "Which control chart should I use for the number of defects per 100 invoices, and how do I set its limits?",
+    "Summarize the 8 wastes and give one example of each in a hospital discharge process.",
+    "A gauge R&R study shows 35% of total variation from the measurement system. What should we do before the Analyze phase?",
+]
+
+
+def default_threads():
+    """num_thread candidates: half, three quarters and all of the logical cores"""
+    cores = os.cpu_count() or 4
+    return sorted({max(1, cores // 2), max(1, cores * 3 // 4), cores})
+
+
+def default_max_memory():
+    """80% of physical memory in bytes, or None where it cannot be read"""
+    try:
+        return 0.8 * os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def rate(tokens_per_second):
+    return "n/a" if tokens_per_second is None else f"{tokens_per_second:.1f} tok/s"
+
+
+def gigabytes(size):
+    return "n/a" if size is None else f"{size / 1e9:.2f} GB"
+
+
+def int_list(value):
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+class Autotuner:
+    def __init__(self, base_url, model_name, prompts=None, measure_tokens=32, repeats=2, timeout=600):
+        """Benchmark Ollama runtime options against one host.
+
+        Args:
+            base_url: Ollama server URL.
+            model_name: Model to tune.
+            prompts: User messages sent after the LSS persona's system prompt.
+            measure_tokens: Tokens generated (num_predict) per measured request.
+            repeats: Measured requests per option profile, cycling through the prompts.
+            timeout: Seconds to wait for each request, including a model reload.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.model_name = model_name
+        self.prompts = prompts or LSS_PROMPTS
+        self.measure_tokens = measure_tokens
+        self.repeats = repeats
+        self.timeout = timeout
+        self.system_prompt = "\n".join(
+            LEAN_SIX_SIGMA.instructions + [LEAN_SIX_SIGMA.tool_instruction(LEAN_SIX_SIGMA.tools)]
+        )
+
+    def chat(self, prompt, options):
+        # A fresh prefix on every request, so Ollama's prompt cache does not hide prompt-eval time
+        messages = [
+            {"role": "system", "content": f"[{uuid.uuid4().hex[:8]}] {self.system_prompt}"},
+            {"role": "user", "content": prompt},
+        ]
+        payload = {"model": self.model_name, "messages": messages, "stream": False, "options": options}
+        response = requests.post(f"{self.base_url}/api/chat", json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def loaded_memory(self):
+        """Bytes Ollama reports for the loaded model (weights plus KV cache), or None"""
+        try:
+            response = requests.get(f"{self.base_url}/api/ps", timeout=10)
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            return None
+        sizes = [model.get("size") for model in response.json().get("models", [])
+                 if model.get("name", "").split(":")[0] == self.model_name.split(":")[0]]
+        return sizes[0] if sizes else None
+
+    def measure(self, options):
+        """Prompt-eval and generation tokens/s, load time and memory for one profile"""
+        started = time.perf_counter()
+        # Loads the model with these options; its own timings include the reload
+        warmup = self.chat(self.prompts[0], {**options, "num_predict": 1})
+        result = {
+            "options": options,
+            "load_seconds": warmup.get("load_duration", 0) / 1e9,
+            "memory_bytes": self.loaded_memory(),
+        }
+
+        prompt_tokens = prompt_seconds = eval_tokens = eval_seconds = 0
+        for index in range(self.repeats):
+            response = self.chat(self.prompts[index % len(self.prompts)], {**options, "num_predict": self.measure_tokens})
+            prompt_tokens += response.get("prompt_eval_count", 0)
+            prompt_seconds += response.get("prompt_eval_duration", 0) / 1e9
+            eval_tokens += response.get("eval_count", 0)
+            eval_seconds += response.get("eval_duration", 0) / 1e9
+        result["prompt_tokens"] = prompt_tokens / self.repeats
+        result["prompt_tps"] = prompt_tokens / prompt_seconds if prompt_seconds else None
+        result["generation_tps"] = eval_tokens / eval_seconds if eval_seconds else None
+        result["seconds"] = time.perf_counter() - started
+        return result
+
+    @staticmethod
+    def turn_seconds(result, answer_tokens):
+        """Estimated time for a turn: the measured prompt plus an answer of ``answer_tokens``"""
+        if not result["prompt_tps"] or not result["generation_tps"]:
+            return float("inf")
+        return result["prompt_tokens"] / result["prompt_tps"] + answer_tokens / result["generation_tps"]
+
+    def sweep(self, num_ctx, num_batch, num_thread, log=print):
+        results = []
+        grid = list(itertools.product(num_ctx, num_batch, num_thread))
+        for number, (ctx, batch, threads) in enumerate(grid, 1):
+            options = {"num_ctx": ctx, "num_batch": batch, "num_thread": threads}
+            try:
+                result = self.measure(options)
+            except requests.exceptions.RequestException as e:
+                # Typically out of memory while loading with a large num_ctx
+                result = {"options": options, "error": str(e)}
+                log(f"[{number}/{len(grid)}] {options}: failed ({e})")
+            else:
+                log(f"[{number}/{len(grid)}] {options}: prompt {rate(result['prompt_tps'])}, "
+                    f"generation {rate(result['generation_tps'])}, "
+                    f"{gigabytes(result['memory_bytes'])}")
+            results.append(result)
+        return results
+
+    def choose_num_predict(self, options, candidates, log=print):
+        """Smallest candidate that none of the prompts' answers outgrew; the largest if any was cut off"""
+        longest, truncated = 0, False
+        for prompt in self.prompts:
+            response = self.chat(prompt, {**options, "num_predict": max(candidates)})
+            longest = max(longest, response.get("eval_count", 0))
+            truncated = truncated or response.get("done_reason") == "length"
+        log(f"Longest answer: {longest} tokens{' (cut off)' if truncated else ''}")
+        if truncated:
+            return max(candidates), longest
+        return min(candidate for candidate in candidates if candidate >= longest), longest
+
+
+def best_profile(results, answer_tokens, max_memory=None, tolerance=0.05, min_ctx=None):
+    """The fastest profile that fits in memory; within ``tolerance`` of it, the one with the largest num_ctx.
+
+    A larger window lets conversation memory replay more turns, so it is worth a few percent of speed.
+    Profiles with a num_ctx below ``min_ctx`` are left out: the prompt would not fit.
+    """
+    # Without Ollama's timings a profile's speed is unknown
+    usable = [r for r in results if "error" not in r and r["prompt_tps"] and r["generation_tps"]]
+    if min_ctx:
+        usable = [r for r in usable if r["options"]["num_ctx"] >= min_ctx]
+    if max_memory:
+        usable = [r for r in usable if r["memory_bytes"] is None or r["memory_bytes"] <= max_memory]
+    if not usable:
+        return None
+    fastest = min(Autotuner.turn_seconds(r, answer_tokens) for r in usable)
+    close = [r for r in usable if Autotuner.turn_seconds(r, answer_tokens) <= fastest * (1 + tolerance)]
+    return max(close, key=lambda r: (r["options"]["num_ctx"], -Autotuner.turn_seconds(r, answer_tokens)))
+
+
+def write_env(path, options):
+    """Store the options in the .env file under the settings agent_factory reads them from"""
+    from dotenv import set_key
+
+    existing = open(path, encoding="utf-8").read() if os.path.exists(path) else ""
+    # OLLAMA_NUM_CTX usually exists already and is updated where it is
+    if not any(f"{setting}=" in existing for setting in OLLAMA_OPTIONS.values() if setting != "OLLAMA_NUM_CTX"):
+        with open(path, "a", encoding="utf-8") as f:
+            if existing and not existing.endswith("\n"):
+                f.write("\n")
+            f.write(f"\n# Ollama runtime options, written by autotune.py on {time.strftime('%Y-%m-%d')}\n")
+    for name, value in options.items():
+        set_key(path, OLLAMA_OPTIONS[name], str(value), quote_mode="never")
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--base-url", default=ollama_base_urls()[0])
+    parser.add_argument("--model", default=os.getenv("OLLAMA_MODEL", "llama3.1"))
+    parser.add_argument("--num-ctx", type=int_list, default=[4096, 8192, 16384])
+    parser.add_argument("--min-ctx", type=int, default=4096,
+                        help="Smallest num_ctx to accept (the LSS agent's tool definitions alone take ~2,100 tokens)")
+    parser.add_argument("--num-batch", type=int_list, default=[128, 256, 512])
+    parser.add_argument("--num-thread", type=int_list, default=default_threads())
+    parser.add_argument("--predict", type=int_list, default=[256, 512, 1024],
+                        help="num_predict candidates; the smallest that fits the longest answer is kept")
+    parser.add_argument("--measure-tokens", type=int, default=32, help="Tokens generated per measured request")
+    parser.add_argument("--repeats", type=int, default=2, help="Measured requests per profile")
+    parser.add_argument("--max-memory-gb", type=float, default=None,
+                        help="Skip profiles whose loaded model needs more (default: 80%% of RAM)")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="Prefer a larger num_ctx when its turn time is within this fraction of the fastest")
+    parser.add_argument("--env", default=".env", help="File the best profile is written to")
+    parser.add_argument("--out", default=os.path.join(".cache", "autotune.json"), help="Where all results are saved")
+    parser.add_argument("--dry-run", action="store_true", help="Print the best profile without writing --env")
+    args = parser.parse_args()
+
+    tuner = Autotuner(args.base_url, args.model, measure_tokens=args.measure_tokens, repeats=args.repeats)
+    try:
+        requests.get(f"{tuner.base_url}/api/tags", timeout=5).raise_for_status()
+    except requests.exceptions.RequestException:
+        sys.exit(f"Ollama is not reachable at {tuner.base_url}. Start it with: ollama serve")
+
+    print(f"Tuning {args.model} on {tuner.base_url}...")
+    started = time.perf_counter()
+    results = tuner.sweep(args.num_ctx, args.num_batch, args.num_thread)
+    max_memory = args.max_memory_gb * 1e9 if args.max_memory_gb else default_max_memory()
+    best = best_profile(results, max(args.predict) // 2, max_memory, args.tolerance, min_ctx=args.min_ctx)
+    if best is None:
+        sys.exit(f"No option profile with a num_ctx of at least {args.min_ctx} ran within the memory limit")
+
+    options = dict(best["options"])
+    options["num_predict"], longest = tuner.choose_num_predict(options, args.predict)
+    print(f"\nBest profile: {options} ({Autotuner.turn_seconds(best, options['num_predict']):.1f}s for a full answer, "
+          f"prompt {rate(best['prompt_tps'])}, generation {rate(best['generation_tps'])}) "
+          f"after {time.perf_counter() - started:.0f}s")
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model, "base_url": tuner.base_url, "best": options, "longest_answer": longest,
+                       "results": results}, f, indent=2)
+    if args.dry_run:
+        return
+    write_env(args.env, options)
+    print(f"Wrote {', '.join(OLLAMA_OPTIONS[name] for name in options)} to {args.env}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Asynchronous batch runner for pushing JSONL prompt files through the agents
+"""
+
+import asyncio
+import json
+import os
+import time
+
+from agent_pool import AgentPool
+
+
+def default_concurrency():
+    """Match the number of requests Ollama is configured to serve in parallel"""
+    try:
+        return max(1, int(os.getenv("OLLAMA_NUM_PARALLEL", "4")))
+    except ValueError:
+        return 4
+
+
+def iter_prompts(in_path):
+    """Yield (prompt_id, prompt, record) tuples from a JSONL file one line at a time.
+
+    Each line is a JSON object with a "prompt" (or "message") field and an optional
+    "id". Lines without an id are keyed by their line number so reruns line up.
+    """
+    with open(in_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"prompt": record}
+            prompt = record.get("prompt") or record.get("message")
+            if not prompt:
+                continue
+            prompt_id = str(record.get("id", f"line-{line_number}"))
+            yield prompt_id, prompt, record
+
+
+def _repair_tail(out_path):
+    """Drop a half-written last line left behind by a crash so appends stay valid JSONL"""
+    if not os.path.exists(out_path):
+        return
+    with open(out_path, "rb+") as f:
+        data = f.read()
+        if not data or data.endswith(b"\n"):
+            return
+        f.truncate(data.rfind(b"\n") + 1)
+
+
+def load_completed_ids(out_path):
+    """Return the ids already answered successfully in an existing results file"""
+    completed = set()
+    if not os.path.exists(out_path):
+        return completed
+    with open(out_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not result.get("error"):
+                completed.add(str(result.get("id")))
+    return completed
+
+
+async def run_batch(create_agent, in_path, out_path, concurrency=None, verbose=True):
+    """Run every prompt in ``in_path`` through agents built by ``create_agent``.
+
+    Up to ``concurrency`` prompts are in flight at once, each on its own agent
+    instance since phidata agents keep per-run state. Results are appended to
+    ``out_path`` as they complete, and prompts already answered there are
+    skipped, so an interrupted run resumes where it stopped. Failed prompts are
+    retried on the next run.
+    """
+    concurrency = concurrency or default_concurrency()
+    _repair_tail(out_path)
+    completed = load_completed_ids(out_path)
+
+    agents = AgentPool(create_agent, size=concurrency)
+    slots = asyncio.BoundedSemaphore(concurrency)
+
+    summary = {"completed": 0, "failed": 0, "skipped": 0, "elapsed": 0.0}
+    started = time.perf_counter()
+
+    with open(out_path, "a", encoding="utf-8") as out:
+
+        async def process(prompt_id, prompt):
+            # Batch prompts are independent, so every checkout starts without conversation context
+            # The slot was taken before this task started; it is returned even if the checkout fails
+            try:
+                agent = await agents.acheckout()
+                try:
+                    turn_started = time.perf_counter()
+                    response = await agent.achat(prompt)
+                    latency = time.perf_counter() - turn_started
+                finally:
+                    agents.checkin(agent)
+            finally:
+                slots.release()
+
+            failed = response is None or response.startswith("Error: ")
+            result = {
+                "id": prompt_id,
+                "prompt": prompt,
+                "response": response,
+                "latency": round(latency, 3),
+                "error": failed,
+            }
+            # Writes happen on the event loop thread, so lines never interleave
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+
+            summary["failed" if failed else "completed"] += 1
+            if verbose:
+                status = "✗" if failed else "✓"
+                print(f"{status} [{prompt_id}] {latency:.1f}s")
+
+        tasks = set()
+        for prompt_id, prompt, _ in iter_prompts(in_path):
+            if prompt_id in completed:
+                summary["skipped"] += 1
+                continue
+            # Blocks reading further input until a slot frees up
+            await slots.acquire()
+            task = asyncio.create_task(process(prompt_id, prompt))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    summary["elapsed"] = time.perf_counter() - started
+    return summary
+
+
+def print_batch_summary(summary):
+    """Print the outcome of a batch run"""
+    finished = summary["completed"] + summary["failed"]
+    rate = finished / summary["elapsed"] if summary["elapsed"] > 0 else 0.0
+    print("\n=== Batch Summary ===")
+    print(f"Completed: {summary['completed']}")
+    print(f"Failed: {summary['failed']}")
+    print(f"Skipped (already done): {summary['skipped']}")
+    print(f"Elapsed: {summary['elapsed']:.1f}s ({rate:.2f} prompts/s)")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-request setup cost of the agents: a new agent, new tools and a new HTTP
+connection for every request, as before the shared factory, against a checkout from an
+AgentPool of pre-built agents on pooled keep-alive connections
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import agent_factory
+from agent_pool import AgentPool
+from ai_agent import create_agent
+from fake_ollama import FakeOllama
+from instrumented_ollama import InstrumentedOllama
+from lss_agent import create_lss_agent
+from phi.model.ollama import Ollama
+
+AGENT_FACTORIES = {
+    "general": create_agent,
+    "lss": create_lss_agent,
+}
+
+
+def percentiles(samples):
+    return {f"p{q}": float(np.percentile(samples, q)) * 1000 for q in (50, 95)}
+
+
+def unshared_tool(name, knowledge_base=None):
+    """A new toolkit per agent, as every agent built its own before the factory"""
+    return agent_factory.TOOL_BUILDERS[name](knowledge_base)
+
+
+def run_requests(fake, requests, setup, teardown):
+    """Time each request's setup and everything the client adds to the model's own time.
+
+    phidata registers the tools on the model at the first run, so much of a new
+    agent's setup shows up in the overhead rather than in ``setup_ms``.
+    """
+    setup_times, overheads, totals = [], [], []
+    connections = fake.connections
+    for number in range(requests):
+        fake.reset()
+        started = time.perf_counter()
+        agent = setup()
+        setup_times.append(time.perf_counter() - started)
+        agent.chat(f"How do I shorten changeover {number}?")
+        totals.append(time.perf_counter() - started)
+        overheads.append(totals[-1] - fake.server_seconds())
+        teardown(agent)
+    return {
+        "setup_ms": percentiles(setup_times),
+        "client_overhead_ms": percentiles(overheads),
+        "request_ms": percentiles(totals),
+        "connections_per_request": (fake.connections - connections) / requests,
+    }
+
+
+def bench_per_request(factory, fake, requests):
+    """Before: everything built for each request, and phidata's new client per call"""
+    shared_client, shared_tool = InstrumentedOllama.get_client, agent_factory.shared_tool
+    InstrumentedOllama.get_client, agent_factory.shared_tool = Ollama.get_client, unshared_tool
+    try:
+        return run_requests(fake, requests, factory, lambda agent: None)
+    finally:
+        InstrumentedOllama.get_client, agent_factory.shared_tool = shared_client, shared_tool
+
+
+def bench_pooled(factory, fake, requests, size):
+    """After: agents built once; a request only checks one out and returns it"""
+    started = time.perf_counter()
+    pool = AgentPool(factory, size=size)
+    build_seconds = time.perf_counter() - started
+    result = run_requests(fake, requests, pool.checkout, pool.checkin)
+    result["pool_build_ms"] = build_seconds * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--agents", default="general,lss", help="Comma-separated agent kinds to benchmark")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--out", help="Write the results to a JSON file")
+    args = parser.parse_args()
+
+    fake = FakeOllama(tokens_per_second=2000.0, prompt_eval_seconds=0.0, response_tokens=10).start()
+    os.environ.pop("OLLAMA_BASE_URLS", None)
+    os.environ["OLLAMA_BASE_URL"] = fake.base_url
+    # Every request must reach the model, so no cached answers
+    os.environ.pop("RESPONSE_CACHE_PATH", None)
+    os.environ["RESPONSE_CACHE"] = "off"
+
+    results = {"requests": args.requests, "pool_size": args.pool_size, "agents": {}}
+    try:
+        for kind in [kind.strip() for kind in args.agents.split(",") if kind.strip()]:
+            factory = AGENT_FACTORIES[kind]
+            # Imports and one-off process setup are not per-request costs
+            factory().chat("warm up")
+            print(f"Benchmarking {kind} agent setup...")
+            results["agents"][kind] = {
+                "per_request": bench_per_request(factory, fake, args.requests),
+                "pooled": bench_pooled(factory, fake, args.requests, args.pool_size),
+            }
+    finally:
+        fake.stop()
+
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
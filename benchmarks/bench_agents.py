@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Benchmark the agents against a local fake Ollama: latency percentiles, time to first token,
+turns/sec under concurrency, framework overhead per tool call and concurrent tool execution
+"""
+
+import argparse
+import asyncio
+import builtins
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_agent import create_agent
+from lss_agent import create_lss_agent
+from fake_ollama import FakeOllama
+
+AGENT_FACTORIES = {
+    "general": create_agent,
+    "lss": create_lss_agent,
+}
+
+QUESTION = "How do I reduce changeover time on a packaging line?"
+
+# Metrics where a larger value is an improvement; every other metric is a cost
+HIGHER_IS_BETTER = ("turns_per_second",)
+
+
+def percentiles(values):
+    values = np.asarray(values, dtype=float)
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+        "mean": float(values.mean()),
+    }
+
+
+def new_agent(agent_factory):
+    """Agent with caching and memory off so every turn reaches the (fake) model"""
+    agent = agent_factory()
+    agent.cache = None
+    agent.memory = None
+    return agent
+
+
+def bench_chat(agent_factory, turns):
+    agent = new_agent(agent_factory)
+    agent.chat(QUESTION)
+    latencies = []
+    for _ in range(turns):
+        started = time.perf_counter()
+        agent.chat(QUESTION)
+        latencies.append(time.perf_counter() - started)
+    return {"latency": percentiles(latencies)}
+
+
+def bench_stream(agent_factory, turns):
+    agent = new_agent(agent_factory)
+    latencies, first_tokens = [], []
+    for _ in range(turns):
+        started = time.perf_counter()
+        for _ in agent.chat_stream(QUESTION):
+            pass
+        latencies.append(time.perf_counter() - started)
+        first_tokens.append(agent.last_turn_metrics.time_to_first_token)
+    return {"latency": percentiles(latencies), "time_to_first_token": percentiles(first_tokens)}
+
+
+def bench_concurrency(agent_factory, turns, concurrency):
+    async def run():
+        agents = asyncio.Queue()
+        for _ in range(concurrency):
+            agents.put_nowait(new_agent(agent_factory))
+        latencies = []
+
+        async def turn():
+            agent = await agents.get()
+            try:
+                started = time.perf_counter()
+                await agent.achat(QUESTION)
+                latencies.append(time.perf_counter() - started)
+            finally:
+                agents.put_nowait(agent)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(turn() for _ in range(turns)))
+        return latencies, time.perf_counter() - started
+
+    latencies, elapsed = asyncio.run(run())
+    return {"concurrency": concurrency, "turns_per_second": turns / elapsed, "latency": percentiles(latencies)}
+
+
+def bench_tool_overhead(agent_factory, fake, turns):
+    """Client wall time minus the fake model's own time, with and without a scripted tool call.
+
+    The difference is what phidata, the HTTP client and the tool itself add per call.
+    """
+    agent = new_agent(agent_factory)
+    overheads = {"plain": [], "tool": []}
+    for _ in range(turns):
+        for kind, message in (("plain", QUESTION), ("tool", f"{QUESTION} {fake.tool_trigger}")):
+            fake.reset()
+            started = time.perf_counter()
+            agent.chat(message)
+            overheads[kind].append(time.perf_counter() - started - fake.server_seconds())
+    plain = percentiles(overheads["plain"])
+    tool = percentiles(overheads["tool"])
+    return {
+        "overhead_per_turn": plain,
+        "overhead_per_tool_call": {
+            key: (tool[key] - plain[key]) / len(fake.tool_calls) for key in ("p50", "mean")
+        },
+    }
+
+
+def slow_lookup(seconds: float, label: str) -> str:
+    """Look up a reference value; stands in for a web search or database query.
+
+    Args:
+        seconds (float): How long the lookup takes.
+        label (str): What to look up.
+    """
+    time.sleep(seconds)
+    return f"{label}: 42"
+
+
+def bench_parallel_tools(agent_factory, fake, turns, calls=3, seconds=0.2):
+    """Turn latency when the model asks for several slow tool calls at once, run one by one and concurrently"""
+    scripted = fake.tool_calls
+    fake.tool_calls = [{"name": "slow_lookup", "arguments": {"seconds": seconds, "label": f"lookup {i}"}}
+                       for i in range(calls)]
+    result = {"calls": calls, "seconds_per_call": seconds}
+    try:
+        for mode, workers in (("sequential", 1), ("concurrent", calls)):
+            agent = new_agent(agent_factory)
+            agent.agent.tools.append(slow_lookup)
+            agent.model.tool_workers = workers
+            latencies = []
+            for _ in range(turns):
+                started = time.perf_counter()
+                agent.chat(f"{QUESTION} {fake.tool_trigger}")
+                latencies.append(time.perf_counter() - started)
+            result[mode] = percentiles(latencies)
+    finally:
+        fake.tool_calls = scripted
+    return result
+
+
+def bench_interactive(agent_factory, turns):
+    """Drive start_interactive_session with scripted input, timing each prompt-to-prompt turn"""
+    agent = new_agent(agent_factory)
+    lines = iter([QUESTION] * turns + ["quit"])
+    prompted_at = []
+
+    def scripted_input(prompt=""):
+        prompted_at.append(time.perf_counter())
+        return next(lines)
+
+    original_input = builtins.input
+    builtins.input = scripted_input
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent.start_interactive_session()
+    finally:
+        builtins.input = original_input
+    latencies = [after - before for before, after in zip(prompted_at, prompted_at[1:])]
+    return {"latency": percentiles(latencies)}
+
+
+def flatten(report, prefix=""):
+    flat = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of every metric against a baseline run and return the regressions"""
+    current, previous = flatten(results["agents"]), flatten(baseline["agents"])
+    regressions = []
+    print(f"\n=== Compared with baseline ({tolerance:.0%} tolerance) ===")
+    for name in sorted(current):
+        if name not in previous or not previous[name] or name.endswith("concurrency"):
+            continue
+        change = (current[name] - previous[name]) / abs(previous[name])
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        flag = ""
+        if worse > tolerance:
+            flag = "  ← regression"
+            regressions.append(name)
+        print(f"{name}: {previous[name]:.4f} -> {current[name]:.4f} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--agents", default="general,lss", help="Comma-separated agent kinds to benchmark")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--prompt-eval-seconds", type=float, default=0.02)
+    parser.add_argument("--response-tokens", type=int, default=40)
+    parser.add_argument("--out", help="Write the results to a JSON file")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Relative slowdown tolerated before a metric counts as a regression")
+    args = parser.parse_args()
+
+    fake = FakeOllama(tokens_per_second=args.tokens_per_second, prompt_eval_seconds=args.prompt_eval_seconds,
+                      response_tokens=args.response_tokens).start()
+    os.environ.pop("OLLAMA_BASE_URLS", None)
+    os.environ["OLLAMA_BASE_URL"] = fake.base_url
+
+    results = {
+        "config": {
+            "turns": args.turns,
+            "concurrency": args.concurrency,
+            "tokens_per_second": args.tokens_per_second,
+            "prompt_eval_seconds": args.prompt_eval_seconds,
+            "response_tokens": args.response_tokens,
+            "python": sys.version.split()[0],
+        },
+        "agents": {},
+    }
+    try:
+        for kind in [kind.strip() for kind in args.agents.split(",") if kind.strip()]:
+            agent_factory = AGENT_FACTORIES[kind]
+            print(f"Benchmarking {kind} agent...")
+            results["agents"][kind] = {
+                "chat": bench_chat(agent_factory, args.turns),
+                "stream": bench_stream(agent_factory, args.turns),
+                "concurrent": bench_concurrency(agent_factory, args.turns * args.concurrency, args.concurrency),
+                "tools": bench_tool_overhead(agent_factory, fake, args.turns),
+                "parallel_tools": bench_parallel_tools(agent_factory, fake, max(3, args.turns // 4)),
+                "interactive": bench_interactive(agent_factory, args.turns),
+            }
+    finally:
+        fake.stop()
+
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark the local knowledge base: full and incremental indexing, and search latency split
+into query embedding and the cosine search over the memory-mapped matrix
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from fake_ollama import FakeOllama
+from knowledge_base import KnowledgeBase, OllamaEmbedder
+
+TOPICS = ("torque audit", "weld penetration", "paint defects", "changeover", "kanban loop", "calibration",
+          "scrap rate", "downtime", "operator training", "supplier quality", "5S audit", "leak test")
+
+
+def write_documents(docs_dir, documents, paragraphs=6, seed=0):
+    """Synthetic SOPs and project reports, each mixing a few plant topics"""
+    rng = np.random.default_rng(seed)
+    for number in range(documents):
+        topics = rng.choice(TOPICS, size=3, replace=False)
+        lines = [f"# Document {number}: {topics[0]}"]
+        for paragraph in range(paragraphs):
+            topic = topics[paragraph % 3]
+            lines.append(f"Step {paragraph + 1} for {topic}: check the {topic} record, compare against the "
+                         f"limit of {rng.integers(10, 99)} and follow the {topic} reaction plan. " * 3)
+        with open(os.path.join(docs_dir, f"doc_{number:05d}.md"), "w", encoding="utf-8") as f:
+            f.write("\n\n".join(lines))
+
+
+def percentiles(samples):
+    return {f"p{q}": float(np.percentile(samples, q)) * 1000 for q in (50, 95)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=768, help="Embedding length served by the fake server")
+    parser.add_argument("--out", help="Write the results to a JSON file")
+    args = parser.parse_args()
+
+    fake = FakeOllama(embedding_dim=args.dim, embed_seconds=0.0).start()
+    with tempfile.TemporaryDirectory() as docs_dir, tempfile.TemporaryDirectory() as index_dir:
+        write_documents(docs_dir, args.documents)
+        knowledge_base = KnowledgeBase(docs_dir, OllamaEmbedder("fake-embed", fake.base_url), index_dir=index_dir)
+        try:
+            full = knowledge_base.update()
+            unchanged = knowledge_base.update()
+            with open(os.path.join(docs_dir, "doc_00000.md"), "a", encoding="utf-8") as f:
+                f.write("\n\nRevision 2: torque audit frequency raised to every two hours.")
+            one_changed = knowledge_base.update()
+
+            rng = np.random.default_rng(1)
+            queries = [f"{rng.choice(TOPICS)} reaction plan {i}" for i in range(args.queries)]
+            embed, search = [], []
+            for query in queries:
+                started = time.perf_counter()
+                knowledge_base._embed_query(query)
+                embed.append(time.perf_counter() - started)
+                # The embedding is cached now, so this times the matrix search alone
+                started = time.perf_counter()
+                knowledge_base.search(query, top_k=4)
+                search.append(time.perf_counter() - started)
+        finally:
+            fake.stop()
+
+        result = {
+            "documents": args.documents,
+            **{key: value for key, value in knowledge_base.stats().items() if key in ("chunks", "dim")},
+            "index_seconds": round(full["seconds"], 3),
+            "unchanged_update_seconds": round(unchanged["seconds"], 4),
+            "one_changed_update_seconds": round(one_changed["seconds"], 4),
+            "query_embedding_ms": percentiles(embed),
+            "matrix_search_ms": percentiles(search),
+        }
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark the tail-latency controls against fake Ollama hosts that stall now and then: turn-time
+percentiles with no controls, with hedged requests, with a turn deadline and with both, and how
+many requests a failing host still receives with and without its circuit breaker
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from agent_factory import agent_settings_from_env
+from ai_agent import OllamaAgent
+from fake_ollama import FakeOllama
+from ollama_router import OllamaRouter
+from resilience import CircuitBreaker, Hedger
+
+QUESTION = "Which control chart fits defect counts from sample {n}?"
+
+
+def percentiles(samples):
+    return {f"p{q}": float(np.percentile(samples, q)) for q in (50, 95, 99)} | {"max": max(samples)}
+
+
+def new_agent(urls, hedge_percentile=None, turn_deadline=None, breaker=None):
+    """A general agent without cache or memory, so every turn reaches a host"""
+    settings = agent_settings_from_env()
+    router = OllamaRouter(urls) if len(urls) > 1 else None
+    settings.update(
+        base_url=urls[0],
+        cache=None,
+        memory=None,
+        router=router,
+        model_router=None,
+        exporter=None,
+        turn_deadline=turn_deadline,
+        hedger=Hedger(router, percentile=hedge_percentile, min_samples=10) if hedge_percentile else None,
+        breaker=breaker,
+    )
+    return OllamaAgent(**settings, web_search=False)
+
+
+def run_turns(agent, turns, stream):
+    times, errors = [], 0
+    for number in range(turns):
+        started = time.perf_counter()
+        if stream:
+            response = "".join(agent.chat_stream(QUESTION.format(n=number)))
+        else:
+            response = agent.chat(QUESTION.format(n=number))
+        times.append(time.perf_counter() - started)
+        errors += response.startswith("Error")
+    stats = agent.session_stats
+    result = {"turn_seconds": percentiles(times), "errors": errors, "deadline_misses": stats.deadline_misses}
+    if agent.hedger is not None:
+        result["hedging"] = dict(agent.hedger.counters)
+    return result
+
+
+def bench_tail(hosts, turns, stream, hedge_percentile, turn_deadline):
+    urls = [fake.base_url for fake in hosts]
+    modes = {
+        "no_controls": {},
+        "hedged": {"hedge_percentile": hedge_percentile},
+        "deadline": {"turn_deadline": turn_deadline},
+        "hedged_and_deadline": {"hedge_percentile": hedge_percentile, "turn_deadline": turn_deadline},
+    }
+    results = {}
+    for mode, options in modes.items():
+        agent = new_agent(urls, **options)
+        # Gives the hedger its latency history and the router its estimates
+        run_turns(agent, 20, stream)
+        agent.session_stats.__init__()
+        results[mode] = run_turns(agent, turns, stream)
+        # An abandoned run must not leak into the next mode
+        agent.start_session()
+    return results
+
+
+def bench_breaker(fake, turns, cooldown):
+    """The host fails for the first half of the turns, then recovers"""
+    results = {}
+    for mode, breaker in (("no_breaker", None), ("breaker", CircuitBreaker(failure_threshold=3, cooldown=cooldown))):
+        agent = new_agent([fake.base_url], breaker=breaker)
+        fake.reset()
+        fake.failing = True
+        answered_at = None
+        started = time.perf_counter()
+        for number in range(turns):
+            if number == turns // 2:
+                fake.failing = False
+                recovered = time.perf_counter()
+            response = agent.chat(QUESTION.format(n=number))
+            if answered_at is None and number >= turns // 2 and not response.startswith("Error"):
+                answered_at = time.perf_counter()
+            # Turns spaced out as a user or a queue would send them
+            time.sleep(0.02)
+        results[mode] = {
+            "seconds": time.perf_counter() - started,
+            "chat_requests": sum(1 for request in fake.reset() if request["path"] == "/api/chat"),
+            "first_answer_after_recovery": None if answered_at is None else answered_at - recovered,
+            "circuit": breaker.as_dict() if breaker is not None else None,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--stall-every", type=int, default=10, help="Every n-th request on a host stalls")
+    parser.add_argument("--stall-seconds", type=float, default=2.0)
+    parser.add_argument("--hedge-percentile", type=float, default=90.0)
+    parser.add_argument("--turn-deadline", type=float, default=1.0)
+    parser.add_argument("--stream", action="store_true", help="Use chat_stream instead of chat")
+    parser.add_argument("--out", help="Write the results to a JSON file")
+    args = parser.parse_args()
+
+    # Both hosts stall, out of step with each other, so routing alone cannot avoid the stalls
+    hosts = [
+        FakeOllama(tokens_per_second=400.0, prompt_eval_seconds=0.05, response_tokens=20,
+                   stall_every=args.stall_every, stall_seconds=args.stall_seconds).start()
+        for _ in range(2)
+    ]
+    hosts[1]._generations = args.stall_every // 2
+    os.environ["OLLAMA_BASE_URL"] = hosts[0].base_url
+    os.environ.pop("OLLAMA_BASE_URLS", None)
+
+    try:
+        print("Benchmarking turn-time percentiles...")
+        results = {
+            "turns": args.turns,
+            "stall": {"every": args.stall_every, "seconds": args.stall_seconds},
+            "tail": bench_tail(hosts, args.turns, args.stream, args.hedge_percentile, args.turn_deadline),
+        }
+        print("Benchmarking the circuit breaker...")
+        hosts[0].stall_every = 0
+        results["failing_host"] = bench_breaker(hosts[0], 40, cooldown=0.2)
+    finally:
+        for fake in hosts:
+            fake.stop()
+
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark the session store: cost of saving a turn and of resuming a session as sessions grow,
+next to rewriting the whole history as one JSON file per turn
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from session_store import SessionStore
+
+QUESTION = "Our changeover on line {n} takes 47 minutes; which SMED steps should we pilot first?"
+ANSWER = ("Separate internal from external work, convert what you can to external, then standardize "
+          "clamping and pre-stage tooling. Measure ten changeovers before and after. ") * 4
+
+
+def percentiles(samples):
+    return {f"p{q}": float(np.percentile(samples, q)) * 1000 for q in (50, 95)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="Session lengths in turns")
+    parser.add_argument("--resumes", type=int, default=50)
+    parser.add_argument("--out", help="Write the results to a JSON file")
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    results = {"sizes": {}}
+    with tempfile.TemporaryDirectory() as directory:
+        store = SessionStore(os.path.join(directory, "sessions.sqlite3"))
+        session_id = store.create_session("lss", "fake")
+        history, appends, turns = [], [], 0
+        for size in sizes:
+            while turns < size:
+                turns += 1
+                # The memory folds older turns every few turns; its summary is appended with the turn
+                summary = f"Summary through turn {turns - 6}" if turns > 6 else ""
+                started = time.perf_counter()
+                store.append_turn(session_id, QUESTION.format(n=turns), ANSWER, prompt_tokens=600,
+                                  summary=summary, summary_turns=max(0, turns - 6))
+                appends.append(time.perf_counter() - started)
+                history.append({"user": QUESTION.format(n=turns), "assistant": ANSWER})
+
+            resumes = []
+            for _ in range(args.resumes):
+                started = time.perf_counter()
+                session = store.resume(session_id, tail_turns=6)
+                resumes.append(time.perf_counter() - started)
+            assert session["turns"] == size and len(session["tail"]) == min(size, 6)
+
+            # What saving a turn costs when the whole history is rewritten instead
+            path = os.path.join(directory, "history.json")
+            started = time.perf_counter()
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(history, f)
+            rewrite = time.perf_counter() - started
+
+            results["sizes"][size] = {
+                "append_ms": percentiles(appends[-min(len(appends), 100):]),
+                "resume_ms": percentiles(resumes),
+                "rewrite_history_ms": rewrite * 1000,
+                "database_kb": sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+                                   if name.startswith("sessions")) / 1024,
+            }
+        store.close()
+
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark setup_environment.py against a fake Ollama host: a first run that pulls the models (one
+pull breaks off halfway and resumes) and repeat runs that find every step unchanged
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from fake_ollama import FakeOllama
+
+
+def run_setup(env, state_path):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(REPO_DIR, "setup_environment.py"), "--state", state_path,
+                             "--requirements", os.path.join(REPO_DIR, "requirements.txt")],
+                            env=env, capture_output=True, text=True)
+    lines = result.stdout.splitlines()
+    return {
+        "seconds": time.perf_counter() - started,
+        "passed": [line[2:].split(": ", 1)[0] for line in lines if line.startswith("✓")],
+        "resumed_pulls": sum("resuming" in line for line in lines),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--pull-seconds", type=float, default=2.0, help="Time the fake host takes per model pull")
+    parser.add_argument("--out", help="Write the results to a JSON file")
+    args = parser.parse_args()
+
+    fake = FakeOllama(pull_seconds=args.pull_seconds, drop_pulls=1).start()
+    env = dict(os.environ, OLLAMA_BASE_URL=fake.base_url, OLLAMA_MODEL="llama3.1", OLLAMA_SMALL_MODEL="llama3.2:1b",
+               LSS_KB_DIR=REPO_DIR, OLLAMA_EMBED_MODEL="nomic-embed-text")
+    env.pop("OLLAMA_BASE_URLS", None)
+
+    try:
+        with tempfile.TemporaryDirectory() as state_dir:
+            state_path = os.path.join(state_dir, "setup_state.json")
+            print("Running setup on a fresh host...")
+            results = {"first_run": run_setup(env, state_path)}
+            print("Running setup again...")
+            results["repeat_runs"] = [run_setup(env, state_path) for _ in range(args.repeats)]
+            results["pull_requests"] = sum(1 for request in fake.reset() if request["path"] == "/api/pull")
+    finally:
+        fake.stop()
+
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
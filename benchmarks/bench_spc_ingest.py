@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark streaming SPC ingestion: rows/sec and peak RSS on a synthetic sensor CSV
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spc_ingest import DEFAULT_CHUNK_BYTES, summarize_csv
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unsupported (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def write_sensor_csv(path, rows, with_text_columns, block=1_000_000, seed=0):
+    """Write a synthetic line-sensor file in blocks so generation itself stays small"""
+    rng = np.random.default_rng(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("timestamp,line,value\n" if with_text_columns else "sample,value\n")
+        for start in range(0, rows, block):
+            count = min(block, rows - start)
+            values = rng.normal(10.0, 0.5, count)
+            index = np.arange(start, start + count)
+            if with_text_columns:
+                f.writelines(f"t{i},L1,{v:.5f}\n" for i, v in zip(index, values))
+            else:
+                np.savetxt(f, np.column_stack([index, values]), fmt=["%d", "%.5f"], delimiter=",")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--chunk-mb", type=float, default=DEFAULT_CHUNK_BYTES / (1024 * 1024))
+    parser.add_argument("--text-columns", action="store_true", help="Include non-numeric columns (slow path)")
+    parser.add_argument("--csv", help="Benchmark an existing file instead of generating one")
+    parser.add_argument("--column", default="value")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    path = args.csv
+    if path is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp_dir.name, "sensor.csv")
+        print(f"Generating {args.rows:,} rows...")
+        write_sensor_csv(path, args.rows, args.text_columns)
+
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    summary = summarize_csv(path, args.column, lsl=8.5, usl=11.5, chunk_bytes=int(args.chunk_mb * 1024 * 1024))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "rows": summary["rows"],
+        "file_mb": round(os.path.getsize(path) / (1024 * 1024), 1),
+        "chunk_mb": args.chunk_mb,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(summary["rows"] / elapsed) if elapsed > 0 else None,
+        "peak_rss_mb_before": rss_before,
+        "peak_rss_mb": peak_rss_mb(),
+        "summary_bytes": len(json.dumps(summary, default=float)),
+    }
+    print(json.dumps(result, indent=2))
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark interactive startup: import time, time until the prompt appears, quick-command
+latency and time to the first answer, with the agent script run as a real subprocess
+"""
+
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from fake_ollama import FakeOllama
+
+SCRIPTS = {
+    "lss": ("run_lss_agent.py", "run_lss_agent", "Your Challenge:", "⏱️"),
+    "general": ("run_agent.py", "run_agent", "You:", "["),
+}
+
+
+def import_seconds(module):
+    """Wall time of importing the module in a fresh interpreter"""
+    code = f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+class ScriptSession:
+    """An agent script under a pipe, with a reader thread so output can be awaited with a timeout"""
+
+    def __init__(self, script, env):
+        self.process = subprocess.Popen([sys.executable, "-u", script, "--no-warmup"], cwd=REPO_DIR, env=env,
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        self.output = ""
+        self._chunks = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for chunk in iter(lambda: self.process.stdout.read1(4096), b""):
+            self._chunks.put(chunk.decode("utf-8", errors="replace"))
+
+    def wait_for(self, marker, timeout=60.0):
+        """Seconds until ``marker`` appears in output not yet consumed"""
+        started = time.perf_counter()
+        while marker not in self.output:
+            remaining = timeout - (time.perf_counter() - started)
+            if remaining <= 0:
+                raise TimeoutError(f"{marker!r} did not appear; output so far:\n{self.output}")
+            try:
+                self.output += self._chunks.get(timeout=remaining)
+            except queue.Empty:
+                continue
+        self.output = self.output.split(marker, 1)[1]
+        return time.perf_counter() - started
+
+    def send(self, line):
+        self.process.stdin.write((line + "\n").encode("utf-8"))
+        self.process.stdin.flush()
+
+    def close(self):
+        try:
+            self.send("quit")
+            self.process.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+def startup_round(kind, env):
+    script, _, prompt, answer_marker = SCRIPTS[kind]
+    started = time.perf_counter()
+    session = ScriptSession(script, env)
+    try:
+        session.wait_for(prompt)
+        result = {"time_to_prompt": time.perf_counter() - started}
+
+        quick_started = time.perf_counter()
+        session.send("stats" if kind == "general" else "dmaic")
+        session.wait_for(prompt)
+        result["quick_command"] = time.perf_counter() - quick_started
+
+        answer_started = time.perf_counter()
+        session.send("What is takt time?")
+        session.wait_for(answer_marker)
+        result["first_answer"] = time.perf_counter() - answer_started
+        result["time_to_first_answer"] = time.perf_counter() - started
+        session.wait_for(prompt)
+    finally:
+        session.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--agent", choices=sorted(SCRIPTS), default="lss")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--out", help="Write the results to a JSON file")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.20,
+                        help="Relative slowdown tolerated before a figure counts as a regression")
+    args = parser.parse_args()
+
+    fake = FakeOllama(tokens_per_second=500.0, prompt_eval_seconds=0.01, response_tokens=20).start()
+    env = {**os.environ, "OLLAMA_BASE_URL": fake.base_url, "CONVERSATION_MEMORY": "off", "PYTHONIOENCODING": "utf-8"}
+    env.pop("OLLAMA_BASE_URLS", None)
+    env.pop("RESPONSE_CACHE_PATH", None)
+
+    module = SCRIPTS[args.agent][1]
+    try:
+        imports = [import_seconds(module) for _ in range(args.rounds)]
+        rounds = [startup_round(args.agent, env) for _ in range(args.rounds)]
+    finally:
+        fake.stop()
+
+    report = {"agent": args.agent, "import_seconds": float(np.median(imports))}
+    for name in rounds[0]:
+        report[name] = float(np.median([r[name] for r in rounds]))
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({**report, "rounds": rounds}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = []
+        print("\n=== Compared with baseline (medians) ===")
+        for name, value in report.items():
+            if not isinstance(value, float) or not baseline.get(name):
+                continue
+            change = (value - baseline[name]) / baseline[name]
+            regressed = change > args.tolerance
+            if regressed:
+                regressions.append(name)
+            print(f"{name}: {baseline[name]:.3f}s -> {value:.3f}s ({change:+.1%}){'  ← regression' if regressed else ''}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
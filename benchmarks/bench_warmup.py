@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Measure first-turn latency on a cold model versus after the background warm-up
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_agent import create_agent
+from lss_agent import create_lss_agent
+
+
+def unload_model(base_url, model_name):
+    """Ask Ollama to evict the model so the next request starts cold"""
+    requests.post(f"{base_url}/api/generate", json={"model": model_name, "keep_alive": 0}, timeout=60)
+    time.sleep(1)
+
+
+def first_turn(agent_factory, question, warm):
+    agent = agent_factory()
+    agent.memory = None
+    warmup_seconds = None
+    if warm:
+        warmup = agent.start_warmup()
+        warmup.wait()
+        warmup_seconds = warmup.elapsed
+    started = time.perf_counter()
+    agent.chat(question)
+    return {
+        "warm": warm,
+        "warmup_seconds": warmup_seconds,
+        "first_turn_seconds": time.perf_counter() - started,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--agent", choices=["general", "lss"], default="lss")
+    parser.add_argument("--question", default="What does SMED stand for?")
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--out", help="Write the results to a JSON file")
+    args = parser.parse_args()
+
+    agent_factory = create_lss_agent if args.agent == "lss" else create_agent
+    probe = agent_factory()
+    results = []
+    for _ in range(args.rounds):
+        for warm in (False, True):
+            unload_model(probe.base_url, probe.model_name)
+            results.append(first_turn(agent_factory, args.question, warm))
+            print(json.dumps(results[-1]))
+
+    def mean(warm):
+        values = [r["first_turn_seconds"] for r in results if r["warm"] == warm]
+        return sum(values) / len(values)
+
+    report = {
+        "model": probe.model_name,
+        "cold_first_turn_seconds": mean(False),
+        "warm_first_turn_seconds": mean(True),
+        "rounds": results,
+    }
+    report["speedup"] = report["cold_first_turn_seconds"] / report["warm_first_turn_seconds"]
+    print(json.dumps({k: v for k, v in report.items() if k != "rounds"}, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
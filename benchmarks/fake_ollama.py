@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Deterministic stand-in for the Ollama HTTP API, for benchmarks that must not depend on a GPU
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESPONSE_WORDS = (
+    "Define the problem, measure the baseline, analyze root causes, improve the process "
+    "and control the gains so the defect rate stays inside the specification limits."
+).split()
+
+
+class FakeOllama:
+    def __init__(self, host="127.0.0.1", port=0, tokens_per_second=50.0, prompt_eval_seconds=0.05,
+                 response_tokens=40, load_seconds=0.0, tool_calls=None, tool_trigger="#tool", replies=None,
+                 embedding_dim=64, embed_seconds=0.001, stall_every=0, stall_seconds=0.0, cpu_threads=0,
+                 prompt_tokens_per_second=200.0, model_bytes=2_000_000_000, kv_bytes_per_token=131_072,
+                 pull_seconds=0.5, drop_pulls=0):
+        """Serve /api/tags, /api/chat, /api/generate, /api/embed and /api/pull with scripted timing.
+
+        Args:
+            host: Interface to bind.
+            port: Port to bind; 0 picks a free one.
+            tokens_per_second: Generation rate for streamed and non-streamed replies.
+            prompt_eval_seconds: Delay before the first token, standing in for prompt evaluation.
+            response_tokens: Tokens in every text reply.
+            load_seconds: Delay added to the first request only, as if loading the model.
+            tool_calls: Calls ({"name": ..., "arguments": {...}}) returned when the last user
+                message contains ``tool_trigger``; the reply after the tool results is plain text.
+            tool_trigger: Marker that makes a user message request the scripted tool calls.
+            replies: Fixed reply text per model name, replacing the generated words for that model.
+            embedding_dim: Length of the bag-of-words vectors returned by /api/embed.
+            embed_seconds: Delay per embedded text.
+            stall_every: Every n-th chat or generate request waits ``stall_seconds`` before its first
+                token, like a host stuck behind a long prompt; 0 never stalls.
+            stall_seconds: Length of those stalls.
+            cpu_threads: Simulate a CPU-only host with this many cores: prompt evaluation runs at
+                ``prompt_tokens_per_second`` and generation at ``tokens_per_second`` only with one
+                thread per core (num_thread), a num_batch of 256 and the smallest num_ctx; other
+                options are slower. 0 keeps the fixed ``prompt_eval_seconds`` delay.
+            prompt_tokens_per_second: Best prompt-evaluation rate of the simulated CPU host.
+            model_bytes: Memory /api/ps reports for the loaded model's weights.
+            kv_bytes_per_token: Memory /api/ps adds per token of num_ctx, for the KV cache.
+            pull_seconds: Time /api/pull takes to stream a model's download progress.
+            drop_pulls: The first n pulls break off halfway, like a dropped connection; the next
+                pull of the model resumes from where the broken one stopped.
+
+        Models pulled through /api/pull are listed by /api/tags. Setting ``failing`` makes chat and generate requests answer HTTP 500 until it is cleared.
+        As in Ollama, a request with other num_ctx, num_batch or num_thread options than the
+        loaded model's reloads it, paying ``load_seconds`` again.
+        """
+        self.tokens_per_second = tokens_per_second
+        self.prompt_eval_seconds = prompt_eval_seconds
+        self.response_tokens = response_tokens
+        self.load_seconds = load_seconds
+        self.tool_calls = tool_calls if tool_calls is not None else [{"name": "add", "arguments": {"a": 2, "b": 3}}]
+        self.tool_trigger = tool_trigger
+        self.replies = replies or {}
+        self.embedding_dim = embedding_dim
+        self.embed_seconds = embed_seconds
+        self.stall_every = stall_every
+        self.stall_seconds = stall_seconds
+        self.failing = False
+        self._generations = 0
+        self.cpu_threads = cpu_threads
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.model_bytes = model_bytes
+        self.kv_bytes_per_token = kv_bytes_per_token
+        self.pull_seconds = pull_seconds
+        self.drop_pulls = drop_pulls
+        # Pulled models by name, with their digest, and the bytes of interrupted pulls already downloaded
+        self.pulled = {}
+        self._partial = {}
+
+        self.requests = []
+        # TCP connections accepted, to show whether clients reuse keep-alive connections
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._model = None
+        # Load options of the loaded model; None until the first request
+        self._loaded = None
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def reset(self):
+        """Forget recorded requests, returning what had been recorded"""
+        with self._lock:
+            requests, self.requests = self.requests, []
+        return requests
+
+    def server_seconds(self):
+        """Total time spent producing the recorded responses"""
+        with self._lock:
+            return sum(request["seconds"] for request in self.requests)
+
+    # -*- Scripted model
+
+    def _wants_tools(self, body):
+        messages = body.get("messages") or []
+        if not body.get("tools") or not self.tool_calls or not messages:
+            return False
+        last = messages[-1]
+        return last.get("role") == "user" and self.tool_trigger in (last.get("content") or "")
+
+    def _embedding(self, text):
+        """Hashed bag of words, so texts sharing words get similar vectors"""
+        vector = [0.0] * self.embedding_dim
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.embedding_dim] += 1.0
+        return vector
+
+    @staticmethod
+    def _load_options(body):
+        options = body.get("options") or {}
+        return tuple(options.get(name) for name in ("num_ctx", "num_batch", "num_thread"))
+
+    @staticmethod
+    def _prompt_tokens(body):
+        prompt = body.get("prompt") or ""
+        prompt += "".join(message.get("content") or "" for message in body.get("messages") or [])
+        return max(1, len(prompt) // 4)
+
+    def _speeds(self, body):
+        """Prompt-eval seconds and generation tokens/s for a request"""
+        if not self.cpu_threads:
+            return self.prompt_eval_seconds, self.tokens_per_second
+        num_ctx, num_batch, num_thread = self._load_options(body)
+        threads = num_thread or self.cpu_threads
+        # Oversubscribed threads contend for the cores and lose more than they add
+        thread_factor = threads / self.cpu_threads if threads <= self.cpu_threads else 0.8 * self.cpu_threads / threads
+        batch = num_batch or 512
+        batch_factor = min(batch, 256) / 256 * (0.9 if batch > 256 else 1.0)
+        ctx_factor = 1 / (1 + 0.05 * math.log2(max(2048, num_ctx or 2048) / 2048))
+        prompt_rate = self.prompt_tokens_per_second * thread_factor * batch_factor * ctx_factor
+        return self._prompt_tokens(body) / prompt_rate, self.tokens_per_second * thread_factor * ctx_factor
+
+    def _first_token_delay(self, body):
+        """Delay before the first token, the load time within it, and the request's generation rate"""
+        prompt_eval_seconds, tokens_per_second = self._speeds(body)
+        with self._lock:
+            load = self.load_seconds if self._loaded != self._load_options(body) else 0.0
+            self._loaded = self._load_options(body)
+            delay = prompt_eval_seconds + load
+            self._generations += 1
+            if self.stall_every and self._generations % self.stall_every == 0:
+                delay += self.stall_seconds
+        return delay, load, tokens_per_second
+
+    def _pull_updates(self, name):
+        """Progress lines of a pull, stopping early (None) when it is one of the pulls to drop"""
+        digest = "sha256:" + hashlib.sha256(name.encode("utf-8")).hexdigest()
+        yield {"status": "pulling manifest"}
+        with self._lock:
+            drop = self.drop_pulls > 0
+            self.drop_pulls -= drop
+            completed = self._partial.get(name, 0)
+        steps = 10
+        for step in range(steps * completed // self.model_bytes + 1, steps + 1):
+            time.sleep(self.pull_seconds / steps)
+            completed = self.model_bytes * step // steps
+            with self._lock:
+                self._partial[name] = completed
+            yield {"status": f"pulling {digest[7:19]}", "digest": digest, "total": self.model_bytes,
+                   "completed": completed}
+            if drop and step == steps // 2:
+                yield None
+                return
+        with self._lock:
+            self.pulled[name] = digest
+            self._partial.pop(name, None)
+        yield {"status": "verifying sha256 digest"}
+        yield {"status": "success"}
+
+    def memory_bytes(self):
+        """What /api/ps reports for the loaded model: weights plus a KV cache sized by num_ctx"""
+        num_ctx = (self._loaded[0] if self._loaded else None) or 2048
+        return self.model_bytes + num_ctx * self.kv_bytes_per_token
+
+    def _timings(self, body, output_tokens, load, started, tokens_per_second, truncated=False):
+        return {
+            "done": True,
+            "done_reason": "length" if truncated else "stop",
+            "prompt_eval_count": self._prompt_tokens(body),
+            "prompt_eval_duration": int(self._speeds(body)[0] * 1e9),
+            "eval_count": output_tokens,
+            "eval_duration": int(output_tokens / tokens_per_second * 1e9),
+            "load_duration": int(load * 1e9),
+            "total_duration": int((time.perf_counter() - started) * 1e9),
+        }
+
+    def _record(self, path, started, tool_calls):
+        with self._lock:
+            self.requests.append({"path": path, "seconds": time.perf_counter() - started, "tool_calls": tool_calls})
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this, delayed ACKs add ~40 ms per request
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def handle(self):
+                # Clients drop streams they no longer want: a hedge that lost, a turn past its deadline
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _send_json(self, payload, status=200):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _write_line(self, payload):
+                data = json.dumps(payload).encode("utf-8") + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/api/tags":
+                    models = [{"name": "fake", "model": "fake"}]
+                    models += [{"name": name, "model": name, "digest": digest} for name, digest in fake.pulled.items()]
+                    return self._send_json({"models": models})
+                if self.path.rstrip("/") == "/api/version":
+                    return self._send_json({"version": "0.0.0-fake"})
+                if self.path.rstrip("/") == "/api/ps":
+                    loaded = [{"name": fake._model or "fake", "model": fake._model or "fake",
+                               "size": fake.memory_bytes(), "size_vram": 0}] if fake._loaded else []
+                    return self._send_json({"models": loaded})
+                self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                started = time.perf_counter()
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                path = self.path.rstrip("/")
+                if path in ("/api/embed", "/api/embeddings"):
+                    texts = body.get("input", body.get("prompt", ""))
+                    texts = [texts] if isinstance(texts, str) else texts
+                    time.sleep(fake.embed_seconds * len(texts))
+                    embeddings = [fake._embedding(text) for text in texts]
+                    self._send_json({"model": body.get("model", "fake"), "embeddings": embeddings}
+                                    if path == "/api/embed" else {"embedding": embeddings[0]})
+                    return fake._record(path, started, False)
+                if path == "/api/pull":
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for update in fake._pull_updates(body.get("model", "fake")):
+                        if update is None:
+                            # Dropped mid-download: the stream breaks off without its final chunk
+                            self.close_connection = True
+                            break
+                        self._write_line(update)
+                    else:
+                        self.wfile.write(b"0\r\n\r\n")
+                        self.wfile.flush()
+                    return fake._record(path, started, False)
+                if path not in ("/api/chat", "/api/generate"):
+                    return self._send_json({"error": "not found"}, 404)
+                if fake.failing:
+                    self._send_json({"error": "model runner has unexpectedly stopped"}, 500)
+                    return fake._record(path, started, False)
+
+                model = body.get("model", "fake")
+                wants_tools = path == "/api/chat" and fake._wants_tools(body)
+                # An empty prompt only loads the model, as in Ollama
+                if path == "/api/generate" and not body.get("prompt"):
+                    delay, load, rate = fake._first_token_delay(body)
+                    fake._model = model
+                    time.sleep(load)
+                    self._send_json({"model": model, "response": "", **fake._timings(body, 0, load, started, rate)})
+                    return fake._record(path, started, False)
+
+                delay, load, rate = fake._first_token_delay(body)
+                fake._model = model
+                if wants_tools:
+                    words = []
+                elif model in fake.replies:
+                    words = [word + " " for word in fake.replies[model].split()]
+                else:
+                    words = [RESPONSE_WORDS[i % len(RESPONSE_WORDS)] + " " for i in range(fake.response_tokens)]
+                num_predict = (body.get("options") or {}).get("num_predict")
+                truncated = num_predict is not None and 0 <= num_predict < len(words)
+                if truncated:
+                    words = words[:num_predict]
+                tool_calls = [{"function": call} for call in fake.tool_calls] if wants_tools else None
+                interval = 1.0 / rate
+
+                time.sleep(delay)
+                if not body.get("stream", True):
+                    time.sleep(interval * len(words))
+                    message = {"role": "assistant", "content": "".join(words)}
+                    if tool_calls:
+                        message["tool_calls"] = tool_calls
+                    payload = {"model": model, **fake._timings(body, len(words), load, started, rate, truncated)}
+                    payload["message" if path == "/api/chat" else "response"] = (
+                        message if path == "/api/chat" else message["content"]
+                    )
+                    self._send_json(payload)
+                    return fake._record(path, started, bool(tool_calls))
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, word in enumerate(words):
+                    if i:
+                        time.sleep(interval)
+                    chunk = {"role": "assistant", "content": word}
+                    self._write_line({"model": model, "message": chunk, "done": False} if path == "/api/chat"
+                                     else {"model": model, "response": word, "done": False})
+                if tool_calls:
+                    self._write_line({"model": model, "done": False,
+                                      "message": {"role": "assistant", "content": "", "tool_calls": tool_calls}})
+                final = {"model": model, **fake._timings(body, len(words), load, started, rate, truncated)}
+                final["message" if path == "/api/chat" else "response"] = (
+                    {"role": "assistant", "content": ""} if path == "/api/chat" else ""
+                )
+                self._write_line(final)
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+                fake._record(path, started, bool(tool_calls))
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--prompt-eval-seconds", type=float, default=0.05)
+    parser.add_argument("--response-tokens", type=int, default=40)
+    parser.add_argument("--load-seconds", type=float, default=0.0)
+    parser.add_argument("--stall-every", type=int, default=0, help="Every n-th chat request stalls")
+    parser.add_argument("--stall-seconds", type=float, default=0.0)
+    parser.add_argument("--cpu-threads", type=int, default=0,
+                        help="Simulate a CPU-only host whose speed depends on num_thread, num_batch and num_ctx")
+    args = parser.parse_args()
+
+    fake = FakeOllama(args.host, args.port, tokens_per_second=args.tokens_per_second,
+                      prompt_eval_seconds=args.prompt_eval_seconds, response_tokens=args.response_tokens,
+                      load_seconds=args.load_seconds, stall_every=args.stall_every, stall_seconds=args.stall_seconds,
+                      cpu_threads=args.cpu_threads)
+    print(f"Fake Ollama on {fake.base_url} ({args.tokens_per_second:g} tokens/s); point OLLAMA_BASE_URL at it")
+    try:
+        fake.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Caching, de-duplicating wrapper around the DuckDuckGo search tool
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from phi.tools import Toolkit
+from phi.utils.log import logger
+
+
+class CachedDuckDuckGo(Toolkit):
+    """
+    Drop-in replacement for phidata's DuckDuckGo toolkit.
+
+    Identical in-flight queries share one backend call (single-flight), results
+    are kept on disk for ``ttl`` seconds, and each lookup waits at most
+    ``timeout`` seconds before falling back to the last cached result.
+
+    Args:
+        backend: Object exposing ``duckduckgo_search(query, max_results)`` and
+            ``duckduckgo_news(query, max_results)`` returning JSON strings.
+            Defaults to phidata's DuckDuckGo; tests can plug in a local fake.
+        cache_path: SQLite file for results; None keeps them in memory.
+        ttl: Seconds a result is served without refreshing.
+        stale_ttl: Seconds an expired result is still usable as a fallback.
+        timeout: Hard limit in seconds for a single lookup.
+        news: Register the news search function as well.
+    """
+
+    def __init__(self, backend=None, cache_path=None, ttl=24 * 3600, stale_ttl=7 * 24 * 3600, timeout=8.0,
+                 news=True, max_workers=4):
+        super().__init__(name="duckduckgo")
+
+        if backend is None:
+            from phi.tools.duckduckgo import DuckDuckGo
+
+            backend = DuckDuckGo(timeout=int(timeout))
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "timeouts": 0, "errors": 0, "stale_served": 0}
+
+        # Re-entrant: a future that is already done runs its callback while we hold the lock
+        self._lock = threading.RLock()
+        self._inflight = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search")
+
+        if cache_path:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self._db = sqlite3.connect(cache_path or ":memory:", check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS search_results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._db.execute("DELETE FROM search_results WHERE fetched_at < ?", (time.time() - self.stale_ttl,))
+        self._db.commit()
+
+        self.register(self.duckduckgo_search)
+        if news:
+            self.register(self.duckduckgo_news)
+
+    def duckduckgo_search(self, query: str, max_results: int = 5) -> str:
+        """Use this function to search DuckDuckGo for a query.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The result from DuckDuckGo.
+        """
+        return self._lookup("search", query, max_results)
+
+    def duckduckgo_news(self, query: str, max_results: int = 5) -> str:
+        """Use this function to get the latest news from DuckDuckGo.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The latest news from DuckDuckGo.
+        """
+        return self._lookup("news", query, max_results)
+
+    def _lookup(self, kind, query, max_results):
+        key = json.dumps([kind, " ".join(str(query).split()).casefold(), int(max_results)])
+        cached = self._read(key)
+        if cached is not None and time.time() - cached[1] < self.ttl:
+            self._count("hits")
+            return cached[0]
+        self._count("misses")
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self._fetch, key, kind, query, max_results)
+                self._inflight[key] = future
+                future.add_done_callback(lambda _: self._forget(key))
+            else:
+                self.counters["coalesced"] += 1
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # The fetch keeps running and will refresh the cache when it lands
+            self._count("timeouts")
+            reason = f"search timed out after {self.timeout}s"
+        except Exception as e:
+            self._count("errors")
+            reason = f"search failed: {e}"
+
+        # Rows past stale_ttl are only purged at startup, so their age is checked here too
+        if cached is not None and time.time() - cached[1] < self.stale_ttl:
+            logger.warning(f"Serving cached result for '{query}': {reason}")
+            self._count("stale_served")
+            return cached[0]
+        return json.dumps({"error": reason, "query": query})
+
+    def _fetch(self, key, kind, query, max_results):
+        if kind == "news":
+            result = self.backend.duckduckgo_news(query=query, max_results=max_results)
+        else:
+            result = self.backend.duckduckgo_search(query=query, max_results=max_results)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO search_results (key, value, fetched_at) VALUES (?, ?, ?)",
+                (key, result, time.time()),
+            )
+            self._db.commit()
+        return result
+
+    def _read(self, key):
+        with self._lock:
+            return self._db.execute(
+                "SELECT value, fetched_at FROM search_results WHERE key = ?", (key,)
+            ).fetchone()
+
+    def _forget(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        """Cache and single-flight counters"""
+        with self._lock:
+            return dict(self.counters)
+
+
+_shared_search_tool = None
+_shared_search_lock = threading.Lock()
+
+
+def shared_search_tool():
+    """Process-wide CachedDuckDuckGo so queries are de-duplicated across agents and sessions.
+
+    Configured by SEARCH_CACHE_PATH, SEARCH_CACHE_TTL and SEARCH_TIMEOUT.
+    """
+    global _shared_search_tool
+    with _shared_search_lock:
+        if _shared_search_tool is None:
+            _shared_search_tool = CachedDuckDuckGo(
+                cache_path=os.getenv("SEARCH_CACHE_PATH", os.path.join(".cache", "search.sqlite3")),
+                ttl=float(os.getenv("SEARCH_CACHE_TTL", 24 * 3600)),
+                timeout=float(os.getenv("SEARCH_TIMEOUT", 8)),
+            )
+        return _shared_search_tool
@@ -0,0 +1,228 @@
+"""
+Token-budgeted conversation memory with rolling summarization.
+
+The most recent turns are replayed verbatim; older turns are folded into a
+running summary so the prompt sent to Ollama stays inside ``num_ctx`` and
+prompt-eval time stays flat however long the session runs.
+"""
+
+import math
+import os
+import threading
+
+SUMMARY_INSTRUCTIONS = [
+    "You maintain the running summary of a Lean Six Sigma consultation.",
+    "Merge the new conversation turns into the existing summary.",
+    "Keep facts, numbers, decisions, open questions and the current DMAIC phase; drop pleasantries.",
+    "Reply with the updated summary only, as short bullet points.",
+]
+
+
+class ConversationMemory:
+    def __init__(self, token_budget=2048, reserve_tokens=768, keep_recent_turns=6, summarizer=None,
+                 chars_per_token=4.0, background=True):
+        """Keep conversation context inside a token budget.
+
+        Args:
+            token_budget: Total prompt window, normally the model's num_ctx.
+            reserve_tokens: Room left for the new message and the response.
+            keep_recent_turns: Upper bound on turns replayed verbatim.
+            summarizer: Callable (previous_summary, transcript) -> new summary. Without one,
+                folded turns are condensed by truncation.
+            chars_per_token: Starting estimate, recalibrated from Ollama's prompt token counts.
+            background: Fold old turns on a background thread after each turn.
+        """
+        self.token_budget = token_budget
+        self.reserve_tokens = reserve_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.summarizer = summarizer
+        self.chars_per_token = chars_per_token
+        self.background = background
+        self.system_tokens = 0
+        self.summary = ""
+        self.turns = []
+        # Turns of the session folded into the summary so far
+        self.folded_turns = 0
+        self.prompt_tokens_per_turn = []
+        self._lock = threading.Lock()
+        self._compaction = None
+
+    def estimate_tokens(self, text):
+        return math.ceil(len(text or "") / self.chars_per_token)
+
+    def has_context(self):
+        return bool(self.summary or self.turns)
+
+    def context_tokens(self):
+        """Estimated tokens of the summary plus the verbatim turns"""
+        total = self.estimate_tokens(self.summary)
+        for user, assistant in self.turns:
+            total += self.estimate_tokens(user) + self.estimate_tokens(assistant)
+        return total
+
+    def available_tokens(self):
+        return max(0, self.token_budget - self.system_tokens - self.reserve_tokens)
+
+    def context_messages(self):
+        """Messages to place between the system prompt and the new user message"""
+        self.wait()
+        with self._lock:
+            messages = []
+            if self.summary:
+                messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+            for user, assistant in self.turns:
+                messages.append({"role": "user", "content": user})
+                messages.append({"role": "assistant", "content": assistant})
+            return messages
+
+    def add_turn(self, user, assistant, prompt_tokens=None, prompt_chars=None):
+        """Record a completed turn and fold older turns if the budget is exceeded.
+
+        ``prompt_tokens`` is what Ollama reported for the turn; together with the
+        ``prompt_chars`` that were sent it recalibrates the token estimate.
+        """
+        self.wait()
+        with self._lock:
+            self.turns.append((user, assistant or ""))
+            if prompt_tokens:
+                self.prompt_tokens_per_turn.append(prompt_tokens)
+                if prompt_chars:
+                    observed = prompt_chars / prompt_tokens
+                    # Ignore outliers such as partially cached prompts
+                    if 2.0 <= observed <= 8.0:
+                        self.chars_per_token = 0.7 * self.chars_per_token + 0.3 * observed
+
+        if not self._needs_compaction():
+            return
+        if self.background:
+            self._compaction = threading.Thread(target=self.compact, daemon=True)
+            self._compaction.start()
+        else:
+            self.compact()
+
+    def _needs_compaction(self):
+        with self._lock:
+            return len(self.turns) > self.keep_recent_turns or self.context_tokens() > self.available_tokens()
+
+    def compact(self):
+        """Fold the oldest turns into the summary until the context fits the budget"""
+        with self._lock:
+            folded = []
+            while len(self.turns) > 1 and (
+                len(self.turns) > self.keep_recent_turns or self.context_tokens() > self.available_tokens()
+            ):
+                folded.append(self.turns.pop(0))
+            previous = self.summary
+        if not folded:
+            return
+
+        transcript = "\n\n".join(f"User: {user}\nAssistant: {assistant}" for user, assistant in folded)
+        summary = None
+        if self.summarizer is not None:
+            try:
+                summary = self.summarizer(previous, transcript)
+            except Exception:
+                summary = None
+        if not summary:
+            summary = f"{previous}\n{transcript}".strip()
+
+        # The summary itself may use at most a quarter of the window
+        limit = int(self.available_tokens() / 4 * self.chars_per_token)
+        if limit <= 0:
+            # The system prompt and the reserve take the whole window: there is no room for a summary
+            summary = ""
+        elif len(summary) > limit:
+            summary = "..." + summary[-limit:]
+        with self._lock:
+            self.summary = summary
+            self.folded_turns += len(folded)
+
+    def wait(self):
+        """Block until a background compaction has finished"""
+        compaction = self._compaction
+        if compaction is not None:
+            compaction.join()
+            self._compaction = None
+
+    def snapshot(self):
+        """The summary and how many turns it covers, read together"""
+        with self._lock:
+            return self.summary, self.folded_turns
+
+    def restore(self, summary, turns, folded_turns):
+        """Continue a stored session from its summary and the verbatim turns that follow it.
+
+        Turns beyond ``keep_recent_turns`` are folded after the next turn, like any other.
+        """
+        self.wait()
+        with self._lock:
+            self.summary = summary or ""
+            self.turns = [(user, assistant or "") for user, assistant in turns]
+            self.folded_turns = folded_turns
+            self.prompt_tokens_per_turn = []
+
+    def clear(self):
+        self.wait()
+        with self._lock:
+            self.summary = ""
+            self.turns = []
+            self.folded_turns = 0
+            self.prompt_tokens_per_turn = []
+
+
+def llm_summarizer(model):
+    """Summarizer backed by a tool-free agent on the given model"""
+    from phi.agent import Agent
+
+    agent = Agent(
+        model=model,
+        instructions=SUMMARY_INSTRUCTIONS,
+        markdown=False,
+        # Off unless asked for, as for the persona agents in agent_factory
+        telemetry=os.getenv("PHI_TELEMETRY", "false").lower() == "true",
+    )
+
+    def summarize(previous_summary, transcript):
+        prompt = f"Existing summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{transcript}"
+        # Every summary stands alone; the agent would otherwise keep each run for the whole session
+        agent.memory.clear()
+        return (agent.run(prompt).content or "").strip()
+
+    return summarize
+
+
+def ollama_summarizer(model_name, host, keep_alive=None, options=None):
+    """llm_summarizer on an Ollama model, importing phidata only when the first summary is due"""
+    summarizer = None
+    lock = threading.Lock()
+
+    def summarize(previous_summary, transcript):
+        nonlocal summarizer
+        with lock:
+            if summarizer is None:
+                from phi.model.ollama import Ollama
+
+                # The agent's options, so summarizing does not make Ollama reload the model
+                summarizer = llm_summarizer(Ollama(id=model_name, host=host, keep_alive=keep_alive, options=options))
+        return summarizer(previous_summary, transcript)
+
+    return summarize
+
+
+def memory_from_env(summarizer=None):
+    """Build the conversation memory configured in .env, or None if disabled.
+
+    OLLAMA_NUM_CTX sets the token budget; CONVERSATION_MEMORY=off disables memory
+    and MEMORY_RECENT_TURNS sets how many turns are replayed verbatim. A cap on the
+    answer length (OLLAMA_NUM_PREDICT) is kept free for the answer.
+    """
+    if os.getenv("CONVERSATION_MEMORY", "on").lower() in ("0", "off", "false", "no"):
+        return None
+    num_predict = int(os.getenv("OLLAMA_NUM_PREDICT") or 0)
+    return ConversationMemory(
+        token_budget=int(os.getenv("OLLAMA_NUM_CTX", 8192)),
+        # Room for the new message on top of the longest answer
+        reserve_tokens=max(768, num_predict + 256),
+        keep_recent_turns=int(os.getenv("MEMORY_RECENT_TURNS", 6)),
+        summarizer=summarizer,
+    )
@@ -0,0 +1,449 @@
+"""
+phidata Ollama model that keeps the server-side timing fields of every response, runs
+the independent tool calls of a response concurrently, reuses pooled connections and
+hedges slow requests
+"""
+
+import asyncio
+import collections.abc
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from ollama import AsyncClient, Client
+from pydantic import BaseModel, Field
+
+from phi.model.message import Message
+from phi.model.ollama import Ollama
+from phi.model.response import ModelResponse, ModelResponseEvent
+from phi.tools.function import ToolCallException
+from phi.utils.log import logger
+
+from resilience import DeadlineExceeded
+
+# Ollama duration fields (nanoseconds) and the per-call metric each is stored under (seconds)
+OLLAMA_DURATIONS = {
+    "load_duration": "load_time",
+    "prompt_eval_duration": "prompt_eval_time",
+    "eval_duration": "generation_time",
+    "total_duration": "server_time",
+}
+
+
+_clients = {}
+# Async clients are tied to the event loop they were first used on
+_async_clients = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def shared_client(host=None, timeout=None):
+    """ollama.Client for the host, shared process-wide so its keep-alive connections are reused"""
+    with _clients_lock:
+        client = _clients.get((host, timeout))
+        if client is None:
+            client = _clients[(host, timeout)] = Client(host=host, timeout=timeout)
+        return client
+
+
+def shared_async_client(host=None, timeout=None):
+    """ollama.AsyncClient for the host on the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get((host, timeout))
+        if client is None:
+            client = clients[(host, timeout)] = AsyncClient(host=host, timeout=timeout)
+        return client
+
+
+def tool_timeouts_from_env():
+    """Per-tool timeouts in seconds from TOOL_CALL_TIMEOUTS, e.g. duckduckgo_search=10,summarize_measurement_file=30"""
+    timeouts = {}
+    for item in os.getenv("TOOL_CALL_TIMEOUTS", "").split(","):
+        name, _, seconds = item.partition("=")
+        if name.strip() and seconds.strip():
+            timeouts[name.strip()] = float(seconds)
+    return timeouts
+
+
+def _run_call(function_call):
+    """Execute one tool call on a worker thread, collecting what phidata gathers inline"""
+    started = time.perf_counter()
+    outcome = {"success": False, "output": "", "messages": [], "stop": False, "started": started}
+    try:
+        outcome["success"] = function_call.execute()
+    except ToolCallException as tce:
+        for role, message in (("user", tce.user_message), ("assistant", tce.agent_message)):
+            if message is not None:
+                outcome["messages"].append(Message(role=role, content=message) if isinstance(message, str) else message)
+        for message in tce.messages or []:
+            try:
+                outcome["messages"].append(message if isinstance(message, Message) else Message(**message))
+            except Exception as e:
+                logger.warning(f"Failed to convert dict to Message: {e}")
+        if tce.stop_execution:
+            outcome["stop"] = True
+            for message in outcome["messages"]:
+                message.stop_after_tool_call = True
+
+    result = function_call.result
+    if isinstance(result, collections.abc.Iterator):
+        # Generators are drained here so the tool's work happens on the worker thread too
+        outcome["output"] = "".join(str(item) for item in result)
+    else:
+        outcome["output"] = result
+    outcome["time"] = time.perf_counter() - started
+    return outcome
+
+
+def _failed(started, now):
+    return {"success": False, "output": "", "messages": [], "stop": False, "started": started, "time": now - started}
+
+
+class _ToolBatch:
+    """The tool calls of one response on a thread pool of their own, collected as they finish.
+
+    Waiting is left to the caller, a thread or the event loop: ``pending`` holds the
+    futures still running and ``timeout()`` how long to wait before ``collect()``
+    must cut off the next call.
+    """
+
+    def __init__(self, model, function_calls):
+        self.model = model
+        self.function_calls = function_calls
+        # A pool per batch: a call that never returns cannot hold a worker other turns need
+        self.workers = max(1, min(model.tool_workers, len(function_calls)))
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tool-call")
+        self.submitted_at = time.perf_counter()
+        self.started = {}
+        self.results = [None] * len(function_calls)
+        self.abandoned = 0
+        self.futures = {self.pool.submit(self._run, index, call): index for index, call in enumerate(function_calls)}
+        self.pending = set(self.futures)
+
+    def _run(self, index, function_call):
+        self.started[index] = time.perf_counter()
+        return _run_call(function_call)
+
+    def deadline(self, index):
+        """Each call's timeout runs from its own start, so time spent queued does not count; none outlives the turn"""
+        model = self.model
+        timeout = model.tool_timeouts.get(self.function_calls[index].function.name, model.tool_timeout)
+        own = None if timeout is None or index not in self.started else self.started[index] + timeout
+        if model.deadline is None:
+            return own
+        return model.deadline if own is None else min(own, model.deadline)
+
+    def timeout(self):
+        """Seconds until the first pending call is due, or None when none has a deadline"""
+        deadlines = [d for d in (self.deadline(self.futures[future]) for future in self.pending) if d is not None]
+        return max(0.0, min(deadlines) - time.perf_counter()) if deadlines else None
+
+    def collect(self):
+        """Take the outcomes of finished calls and give up on the ones past their deadline"""
+        now = time.perf_counter()
+        for future in [future for future in self.pending if future.done()]:
+            self.pending.discard(future)
+            index = self.futures[future]
+            try:
+                self.results[index] = future.result()
+            except Exception as e:
+                self.function_calls[index].error = str(e)
+                self.results[index] = _failed(self.started.get(index, self.submitted_at), now)
+        for future in list(self.pending):
+            index = self.futures[future]
+            if self.deadline(index) is None or now < self.deadline(index):
+                continue
+            # A running thread cannot be stopped: it is abandoned and its result ignored
+            self.pending.discard(future)
+            function_call = self.function_calls[index]
+            started = self.started.get(index, self.submitted_at)
+            function_call.error = f"Tool call timed out after {now - started:.1f}s"
+            logger.warning(f"{function_call.get_call_str()}: {function_call.error}")
+            self.results[index] = _failed(started, now)
+            self.abandoned += 1
+        if self.abandoned >= self.workers:
+            # Every worker is stuck in an abandoned call, so the queued ones would never start
+            for future in self.pending:
+                future.cancel()
+                self.function_calls[self.futures[future]].error = "Tool call not run: earlier calls timed out"
+                self.results[self.futures[future]] = _failed(now, now)
+            self.pending = set()
+
+    def close(self):
+        # Calls that have not started are dropped; running ones finish on their own
+        for future in self.futures:
+            future.cancel()
+        self.pool.shutdown(wait=False)
+
+    def outcomes(self):
+        """Outcomes of the calls in their original order"""
+        for outcome in self.results:
+            outcome["queued"] = outcome["started"] - self.submitted_at
+        return self.results
+
+
+class InstrumentedOllama(Ollama):
+    """Ollama model recording load, prompt-eval, generation and total server time per call.
+
+    phidata keeps only token counts; the durations land in each assistant message's
+    metrics, so ``agent.run_response.metrics`` lists them per model call alongside
+    ``input_tokens`` and the client-side ``time``.
+
+    When a response asks for several tool calls, they run at the same time on up to
+    ``tool_workers`` threads (TOOL_WORKERS) instead of one after another, each limited
+    to ``tool_timeout`` seconds from its start (TOOL_CALL_TIMEOUT; ``tool_timeouts``
+    overrides it per tool name, from TOOL_CALL_TIMEOUTS). Results
+    are returned to the model in the order it asked for them. Every tool message
+    records its own ``time`` and ``queued`` seconds plus ``batch_time``, the wall
+    time of the whole batch, which is what the turn actually waited. Under ``arun``
+    the batch runs off the event loop, so one session's tools do not stall the others.
+
+    phidata opens a new HTTP client, and so a new TCP connection, for every request;
+    this model takes the process-wide client for its current host instead, so every
+    agent talking to a host shares one keep-alive connection pool.
+
+    ``deadline`` (a ``time.perf_counter()`` value) is the end of the current turn:
+    no model call starts after it and tool calls are cut off at it. With a
+    ``hedger``, each request is also sent to a second host when the first is slow.
+    """
+
+    tool_workers: int = Field(default_factory=lambda: int(os.getenv("TOOL_WORKERS", 4)))
+    tool_timeout: Optional[float] = Field(default_factory=lambda: float(os.getenv("TOOL_CALL_TIMEOUT", 60)) or None)
+    tool_timeouts: Dict[str, float] = Field(default_factory=tool_timeouts_from_env)
+    deadline: Optional[float] = None
+    hedger: Optional[Any] = None
+
+    def get_client(self):
+        if self.client is not None or self.client_params:
+            return super().get_client()
+        # Looked up per request: OllamaRouter moves the model between hosts
+        return shared_client(self.host, self.timeout)
+
+    def get_async_client(self):
+        if self.async_client is not None or self.client_params:
+            return super().get_async_client()
+        return shared_async_client(self.host, self.timeout)
+
+    def _check_deadline(self):
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise DeadlineExceeded("Turn deadline passed before the next model call")
+
+    def _hedged(self):
+        return self.hedger is not None and self.client is None and self.async_client is None and not self.client_params
+
+    def _request_kwargs(self, stream):
+        """request_kwargs plus what phidata's own invoke and ainvoke add: a structured output's JSON schema"""
+        kwargs = self.request_kwargs
+        if not stream and self.response_format is not None and self.structured_outputs:
+            if isinstance(self.response_format, type) and issubclass(self.response_format, BaseModel):
+                kwargs.setdefault("format", self.response_format.model_json_schema())
+        return kwargs
+
+    def _chat_request(self, messages, stream, client):
+        """The chat request as a function of the host, so the hedger can send it to any of them"""
+        kwargs = {"model": self.id, "messages": [self.format_message(m) for m in messages], "stream": stream,
+                  **self._request_kwargs(stream)}
+        return lambda host: client(host, self.timeout).chat(**kwargs)
+
+    def invoke(self, messages: List[Message]):
+        self._check_deadline()
+        if not self._hedged():
+            return super().invoke(messages)
+        return self.hedger.call(self.host, self._chat_request(messages, False, shared_client))
+
+    def invoke_stream(self, messages: List[Message]):
+        self._check_deadline()
+        if not self._hedged():
+            yield from super().invoke_stream(messages)
+            return
+        yield from self.hedger.call(self.host, self._chat_request(messages, True, shared_client), stream=True)
+
+    async def ainvoke(self, messages: List[Message]):
+        self._check_deadline()
+        if not self._hedged():
+            return await super().ainvoke(messages)
+        return await self.hedger.acall(self.host, self._chat_request(messages, False, shared_async_client))
+
+    async def ainvoke_stream(self, messages: List[Message]):
+        self._check_deadline()
+        if not self._hedged():
+            async for chunk in super().ainvoke_stream(messages):
+                yield chunk
+            return
+        request = self._chat_request(messages, True, shared_async_client)
+        async for chunk in await self.hedger.acall(self.host, request, stream=True):
+            yield chunk
+
+    def _wants_tools(self, run_tools, messages):
+        """Whether the assistant message the response just appended asks for tool calls"""
+        last = messages[-1] if messages else None
+        return run_tools and last is not None and last.role == "assistant" and bool(last.tool_calls)
+
+    def _running_lines(self, function_calls):
+        """The "Running: ..." text phidata adds to the answer when show_tool_calls is on"""
+        if not self.show_tool_calls or not function_calls:
+            return []
+        if len(function_calls) == 1:
+            return [f" - Running: {function_calls[0].get_call_str()}\n\n"]
+        return ["Running:"] + [f"\n - {call.get_call_str()}" for call in function_calls] + ["\n\n"]
+
+    async def aresponse(self, messages: List[Message]):
+        # phidata runs the tool calls inline, holding the event loop; they are held back and awaited here instead
+        run_tools, self.run_tools = self.run_tools, False
+        try:
+            model_response = await super().aresponse(messages)
+        finally:
+            self.run_tools = run_tools
+        if not self._wants_tools(run_tools, messages):
+            return model_response
+
+        assistant_message = messages[-1]
+        function_calls = self.get_function_calls_to_run(assistant_message, messages)
+        model_response.content = assistant_message.get_content_string() + "\n\n"
+        model_response.content += "".join(self._running_lines(function_calls))
+        function_call_results: List[Message] = []
+        async for _ in self._arun_function_calls(function_calls, function_call_results):
+            pass
+        self.format_function_call_results(function_call_results, messages)
+        return await self.ahandle_post_tool_call_messages(messages=messages, model_response=model_response)
+
+    async def aresponse_stream(self, messages: List[Message]):
+        run_tools, self.run_tools = self.run_tools, False
+        try:
+            async for response in super().aresponse_stream(messages):
+                yield response
+        finally:
+            self.run_tools = run_tools
+        if not self._wants_tools(run_tools, messages):
+            return
+
+        yield ModelResponse(content="\n\n")
+        function_calls = self.get_function_calls_to_run(messages[-1], messages)
+        for line in self._running_lines(function_calls):
+            yield ModelResponse(content=line)
+        function_call_results: List[Message] = []
+        async for response in self._arun_function_calls(function_calls, function_call_results):
+            yield response
+        self.format_function_call_results(function_call_results, messages)
+        async for response in self.ahandle_post_tool_call_messages_stream(messages=messages):
+            yield response
+
+    async def _arun_function_calls(self, function_calls, function_call_results, tool_role="tool"):
+        """run_function_calls with the batch awaited, so other sessions keep streaming while the tools run"""
+        if any(call.function.stop_after_tool_call for call in function_calls):
+            # One after another, as phidata does, on a worker thread
+            responses = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: list(Ollama.run_function_calls(self, function_calls, function_call_results, tool_role))
+            )
+            for response in responses:
+                yield response
+            return
+
+        for response in self._tool_calls_started(function_calls, tool_role):
+            yield response
+        batch_started = time.perf_counter()
+        outcomes = await self._arun_concurrently(function_calls)
+        for response in self._tool_calls_completed(function_calls, outcomes, time.perf_counter() - batch_started,
+                                                   function_call_results, tool_role):
+            yield response
+
+    def update_usage_metrics(self, assistant_message, metrics, response=None):
+        super().update_usage_metrics(assistant_message, metrics, response)
+        if not response:
+            return
+        for field, name in OLLAMA_DURATIONS.items():
+            value = response.get(field)
+            if value is not None:
+                assistant_message.metrics[name] = value / 1e9
+
+    def run_function_calls(self, function_calls, function_call_results: List[Message], tool_role: str = "tool"):
+        # A call that may stop the run has to finish before the next one starts
+        if any(call.function.stop_after_tool_call for call in function_calls):
+            yield from super().run_function_calls(function_calls, function_call_results, tool_role)
+            return
+
+        yield from self._tool_calls_started(function_calls, tool_role)
+        batch_started = time.perf_counter()
+        outcomes = self._run_concurrently(function_calls)
+        yield from self._tool_calls_completed(function_calls, outcomes, time.perf_counter() - batch_started,
+                                              function_call_results, tool_role)
+
+    def _tool_calls_started(self, function_calls, tool_role):
+        if self.function_call_stack is None:
+            self.function_call_stack = []
+        for function_call in function_calls:
+            yield ModelResponse(
+                content=function_call.get_call_str(),
+                tool_call={
+                    "role": tool_role,
+                    "tool_call_id": function_call.call_id,
+                    "tool_name": function_call.function.name,
+                    "tool_args": function_call.arguments,
+                },
+                event=ModelResponseEvent.tool_call_started.value,
+            )
+
+    def _tool_calls_completed(self, function_calls, outcomes, batch_time, function_call_results, tool_role):
+        for function_call, outcome in zip(function_calls, outcomes):
+            output = outcome["output"]
+            if function_call.function.show_result and outcome["success"]:
+                yield ModelResponse(content=output)
+            function_call_result = Message(
+                role=tool_role,
+                content=output if outcome["success"] else function_call.error,
+                tool_call_id=function_call.call_id,
+                tool_name=function_call.function.name,
+                tool_args=function_call.arguments,
+                tool_call_error=not outcome["success"],
+                stop_after_tool_call=function_call.function.stop_after_tool_call or outcome["stop"],
+                metrics={"time": outcome["time"], "queued": outcome["queued"], "batch_time": batch_time,
+                         "batch_size": len(function_calls)},
+            )
+            yield ModelResponse(
+                content=f"{function_call.get_call_str()} completed in {outcome['time']:.4f}s.",
+                tool_call=function_call_result.model_dump(
+                    include={"content", "tool_call_id", "tool_name", "tool_args", "tool_call_error", "metrics",
+                             "created_at"}
+                ),
+                event=ModelResponseEvent.tool_call_completed.value,
+            )
+            self.metrics.setdefault("tool_call_times", {}).setdefault(function_call.function.name, []).append(
+                outcome["time"]
+            )
+            function_call_results.append(function_call_result)
+            function_call_results.extend(outcome["messages"])
+            self.function_call_stack.append(function_call)
+
+        if self.tool_call_limit and len(self.function_call_stack) >= self.tool_call_limit:
+            self.deactivate_function_calls()
+
+    def _run_concurrently(self, function_calls):
+        """Outcomes of the calls in their original order, with timed-out calls turned into errors"""
+        batch = _ToolBatch(self, function_calls)
+        try:
+            while batch.pending:
+                wait(batch.pending, timeout=batch.timeout(), return_when=FIRST_COMPLETED)
+                batch.collect()
+        finally:
+            batch.close()
+        return batch.outcomes()
+
+    async def _arun_concurrently(self, function_calls):
+        """_run_concurrently for the event loop: the batch is awaited instead of waited on"""
+        batch = _ToolBatch(self, function_calls)
+        waiters = {future: asyncio.wrap_future(future) for future in batch.pending}
+        try:
+            while batch.pending:
+                await asyncio.wait([waiters[future] for future in batch.pending], timeout=batch.timeout(),
+                                   return_when=asyncio.FIRST_COMPLETED)
+                batch.collect()
+        finally:
+            batch.close()
+            # Abandoned calls finish after the loop may be gone; a cancelled waiter ignores their result
+            for waiter in waiters.values():
+                waiter.cancel()
+        return batch.outcomes()
@@ -0,0 +1,230 @@
+"""
+Local intent routing: answer commands, templates and plain arithmetic without an LLM round-trip
+"""
+
+import ast
+import difflib
+import math
+import operator
+import re
+
+# Words that only dress up a request ("give me a SIPOC template please") and are ignored when matching
+FILLER_WORDS = {
+    "a", "an", "the", "me", "us", "my", "our", "please", "pls", "give", "show", "get", "send", "need", "want",
+    "i", "can", "could", "you", "create", "make", "new", "blank", "empty", "template", "templates", "form",
+    "sheet", "worksheet", "for", "of",
+}
+
+ARITHMETIC_PREFIXES = ("what is", "what's", "whats", "calculate", "calc", "compute", "evaluate", "eval")
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+_UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+_FUNCTIONS = {
+    "sqrt": math.sqrt,
+    "abs": abs,
+    "round": round,
+    "min": min,
+    "max": max,
+    "log": math.log,
+    "log10": math.log10,
+    "exp": math.exp,
+}
+
+_CONSTANTS = {"pi": math.pi, "e": math.e}
+
+MAX_EXPONENT = 1000
+# Integer results beyond this many bits (about 3,000 digits) are refused before they are computed
+MAX_RESULT_BITS = 10_000
+
+
+def normalize(text):
+    """Lower-case, drop punctuation at the ends and collapse whitespace"""
+    return " ".join(text.lower().strip().strip("?!.:").split())
+
+
+def _evaluate(node):
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return node.value
+    if isinstance(node, ast.Name) and node.id in _CONSTANTS:
+        return _CONSTANTS[node.id]
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left, right = _evaluate(node.left), _evaluate(node.right)
+        # Keep 10**10**10 and ((9**999)**999)**99 from hanging the loop: the exponent and the size
+        # of the integer it would produce are both bounded
+        if isinstance(node.op, ast.Pow):
+            if abs(right) > MAX_EXPONENT:
+                raise ValueError("Exponent too large")
+            bits = right * math.log2(abs(left) + 1) if isinstance(left, int) and isinstance(right, int) else 0
+            if bits > MAX_RESULT_BITS:
+                raise ValueError("Result too large")
+        if isinstance(node.op, ast.Mult) and isinstance(left, int) and isinstance(right, int):
+            if left.bit_length() + right.bit_length() > MAX_RESULT_BITS + 1:
+                raise ValueError("Result too large")
+        return _BINARY_OPERATORS[type(node.op)](left, right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_evaluate(node.operand))
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS
+            and not node.keywords):
+        return _FUNCTIONS[node.func.id](*[_evaluate(arg) for arg in node.args])
+    raise ValueError("Not plain arithmetic")
+
+
+def safe_eval(expression):
+    """Evaluate numbers, + - * / // % ** and a few math functions; anything else raises ValueError"""
+    try:
+        tree = ast.parse(expression.replace("^", "**").replace("×", "*").replace("÷", "/"), mode="eval")
+    except SyntaxError:
+        raise ValueError("Not plain arithmetic")
+    return _evaluate(tree)
+
+
+def arithmetic_expression(text):
+    """The expression in "what is 17 * 23?" or "calc (4+5)/3", or None if the text is not arithmetic"""
+    expression = text.strip().rstrip("?=. ")
+    lowered = expression.lower()
+    for prefix in ARITHMETIC_PREFIXES:
+        if lowered.startswith(prefix + " "):
+            expression = expression[len(prefix):].strip()
+            break
+    # Needs an operator or a function call, so a bare number or word never matches
+    if not re.search(r"\d", expression) or not re.search(r"[-+*/%^×÷(]", expression.lstrip("-+")):
+        return None
+    try:
+        safe_eval(expression)
+    except ZeroDivisionError:
+        return expression
+    except (ValueError, TypeError, ArithmeticError):
+        return None
+    return expression
+
+
+def format_number(value):
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    if isinstance(value, float):
+        return f"{value:.10g}"
+    return str(value)
+
+
+def answer_arithmetic(expression):
+    try:
+        return f"{expression} = {format_number(safe_eval(expression))}"
+    except ZeroDivisionError:
+        return f"{expression}: division by zero"
+    except (ValueError, TypeError, ArithmeticError) as e:
+        return f"{expression}: {e}"
+
+
+class Intent:
+    def __init__(self, name, handler, phrases=(), description=None, takes_argument=False, matcher=None,
+                 saves_turn=True):
+        self.name = name
+        self.handler = handler
+        self.phrases = [normalize(phrase) for phrase in phrases or (name,)]
+        self.description = description
+        self.takes_argument = takes_argument
+        self.matcher = matcher
+        self.saves_turn = saves_turn
+
+
+class IntentRouter:
+    def __init__(self, fuzzy_cutoff=0.8):
+        """Match user input against registered intents before it reaches the model.
+
+        Matching tries, in order: an exact phrase (ignoring filler words such as
+        "give me a ... template"), a command followed by an argument, custom
+        matchers such as arithmetic, then a fuzzy phrase match for typos.
+
+        Args:
+            fuzzy_cutoff: Minimum difflib similarity (0-1) for a fuzzy match.
+        """
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.intents = []
+        self._phrases = {}
+        self.saved_turns = 0
+
+    def add(self, name, handler, phrases=(), description=None, takes_argument=False, matcher=None,
+            saves_turn=True):
+        """Register an intent.
+
+        Args:
+            name: Intent name, also its default phrase.
+            handler: Callable taking the matched argument (or None) and returning the answer text.
+                Returning None passes the input on to the model.
+            phrases: Texts that trigger the intent; matched after normalization.
+            description: Help text shown by ``help_lines``; intents without one are not listed.
+            takes_argument: The phrases are command prefixes and the rest of the input their argument;
+                a bare command still matches, with None as the argument.
+            matcher: Callable(text) returning an argument when the intent applies, else None.
+            saves_turn: Count answers toward ``saved_turns``; False for session commands
+                such as 'stats' that would never have reached the model.
+        """
+        intent = Intent(name, handler, phrases, description, takes_argument, matcher, saves_turn)
+        self.intents.append(intent)
+        for phrase in intent.phrases:
+            self._phrases[phrase] = intent
+            self._phrases[self._strip_filler(phrase)] = intent
+        return intent
+
+    @staticmethod
+    def _strip_filler(text):
+        words = [word for word in text.split() if word not in FILLER_WORDS]
+        return " ".join(words) or text
+
+    def match(self, text):
+        """Return (intent, argument) for the input, or None when the model should answer"""
+        normalized = normalize(text)
+        if not normalized:
+            return None
+        stripped = self._strip_filler(normalized)
+        for candidate in (normalized, stripped):
+            if candidate in self._phrases:
+                return self._phrases[candidate], None
+
+        for intent in self.intents:
+            if intent.takes_argument:
+                for phrase in intent.phrases:
+                    if normalized.startswith(phrase + " "):
+                        return intent, text.split(None, len(phrase.split()))[-1].strip()
+
+        for intent in self.intents:
+            if intent.matcher is not None:
+                argument = intent.matcher(text)
+                if argument is not None:
+                    return intent, argument
+
+        # Fuzzy matching is for typos in short commands, not for rephrased questions
+        if len(stripped.split()) <= 3:
+            close = difflib.get_close_matches(stripped, list(self._phrases), n=1, cutoff=self.fuzzy_cutoff)
+            if close:
+                return self._phrases[close[0]], None
+        return None
+
+    def handle(self, text):
+        """Answer the input locally if an intent matches; None means it should go to the model"""
+        matched = self.match(text)
+        if matched is None:
+            return None
+        intent, argument = matched
+        answer = intent.handler(argument)
+        if answer is not None and intent.saves_turn:
+            self.saved_turns += 1
+        return answer
+
+    def help_lines(self):
+        return [f"  '{intent.phrases[0]}' - {intent.description}" for intent in self.intents if intent.description]
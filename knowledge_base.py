@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Local knowledge base: plant documents chunked, embedded with Ollama and searched by cosine
+similarity over a memory-mapped NumPy matrix
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Plain-text formats only; export PDFs and Word files to text or Markdown first
+DOCUMENT_EXTENSIONS = (".md", ".markdown", ".txt", ".rst", ".csv")
+
+
+def chunk_text(text, chunk_chars=1200, overlap=200):
+    """Split text into chunks of about ``chunk_chars`` on paragraph boundaries.
+
+    Paragraphs longer than a chunk are cut into overlapping windows; a short
+    paragraph that ends one chunk is repeated at the start of the next so a
+    boundary does not separate it from what follows.
+    """
+    pieces = []
+    step = max(1, chunk_chars - overlap)
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        for start in range(0, max(1, len(paragraph) - overlap), step):
+            pieces.append(paragraph[start:start + chunk_chars])
+
+    chunks, current, size = [], [], 0
+    for piece in pieces:
+        if current and size + len(piece) > chunk_chars:
+            chunks.append("\n\n".join(current))
+            current = [current[-1]] if len(current[-1]) <= overlap else []
+            size = sum(len(p) + 2 for p in current)
+        current.append(piece)
+        size += len(piece) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _normalized(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class OllamaEmbedder:
+    def __init__(self, model="nomic-embed-text", host="http://localhost:11434", keep_alive=None, batch_size=32,
+                 timeout=120.0):
+        """Embed texts with Ollama's /api/embed, falling back to /api/embeddings on older servers.
+
+        Args:
+            model: Embedding model, e.g. nomic-embed-text or mxbai-embed-large.
+            host: Ollama server URL.
+            keep_alive: How long Ollama keeps the embedding model loaded.
+            batch_size: Texts per request while indexing.
+            timeout: Seconds allowed per request.
+        """
+        self.model = model
+        self.host = host.rstrip("/")
+        self.keep_alive = keep_alive
+        self.batch_size = batch_size
+        self.timeout = timeout
+        # One pooled connection keeps per-query overhead to the embedding itself
+        self._session = requests.Session()
+        self._legacy = False
+
+    def __call__(self, texts):
+        """Embedding matrix (len(texts) x dim, float32) for the texts"""
+        rows = []
+        for start in range(0, len(texts), self.batch_size):
+            rows.extend(self._embed(texts[start:start + self.batch_size]))
+        return np.asarray(rows, dtype=np.float32)
+
+    def _embed(self, texts):
+        options = {"keep_alive": self.keep_alive} if self.keep_alive else {}
+        if not self._legacy:
+            response = self._session.post(f"{self.host}/api/embed", timeout=self.timeout,
+                                          json={"model": self.model, "input": texts, "truncate": True, **options})
+            if response.status_code != 404:
+                response.raise_for_status()
+                return response.json()["embeddings"]
+            self._legacy = True
+        embeddings = []
+        for text in texts:
+            response = self._session.post(f"{self.host}/api/embeddings", timeout=self.timeout,
+                                          json={"model": self.model, "prompt": text, **options})
+            response.raise_for_status()
+            embeddings.append(response.json()["embedding"])
+        return embeddings
+
+
+class KnowledgeBase:
+    def __init__(self, docs_dir, embedder, index_dir=None, chunk_chars=1200, overlap=200, query_cache_size=256,
+                 min_score=0.35, context_chars=1500):
+        """Searchable index of the documents under ``docs_dir``.
+
+        The index lives in ``index_dir``: ``vectors.f32`` holds one unit-length
+        embedding per chunk and is memory-mapped for search, ``chunks.jsonl``
+        the chunk texts, and ``manifest.json`` which rows belong to which file.
+        ``update`` only embeds files whose size, modification time and content
+        changed; rows of changed or deleted files are dropped from results and
+        reclaimed once they make up a quarter of the matrix.
+
+        Args:
+            docs_dir: Folder of SOPs, control plans and project reports (searched recursively).
+            embedder: Callable(list of str) -> embedding matrix, normally an OllamaEmbedder.
+            index_dir: Where the index is stored; defaults to ``.index`` inside ``docs_dir``.
+            chunk_chars: Target chunk length in characters.
+            overlap: Characters shared between consecutive chunks.
+            query_cache_size: Recent query embeddings kept in memory.
+            min_score: Cosine similarity a chunk needs to be added to a prompt by ``context``.
+            context_chars: Upper bound on the excerpt characters ``context`` adds to a prompt.
+        """
+        self.docs_dir = os.path.abspath(docs_dir)
+        self.embedder = embedder
+        self.index_dir = os.path.abspath(index_dir or os.path.join(docs_dir, ".index"))
+        self.chunk_chars = chunk_chars
+        self.overlap = overlap
+        self.query_cache_size = query_cache_size
+        self.min_score = min_score
+        self.context_chars = context_chars
+        self.model = getattr(embedder, "model", None)
+
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._query_cache = OrderedDict()
+        self._thread = None
+        self.manifest = None
+        # Changes whenever the indexed documents do, so answers built on old excerpts can be told apart
+        self.version = None
+        self._matrix = None
+        self._live = None
+        self._chunks = []
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._load()
+
+    # -*- Index files
+
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def _empty_manifest(self):
+        return {"model": self.model, "dim": None, "rows": 0, "files": {}}
+
+    def _load(self):
+        """Open the index on disk, discarding rows written after the last complete update"""
+        manifest = self._empty_manifest()
+        try:
+            with open(self._path("manifest.json"), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if manifest.get("model") != self.model:
+            # Vectors from another embedding model are not comparable
+            manifest = self._empty_manifest()
+
+        rows, dim = manifest["rows"], manifest["dim"]
+        vectors_path = self._path("vectors.f32")
+        # Windows refuses to truncate, replace or delete a file that is still mapped
+        self._release_matrix()
+        if rows and os.path.exists(vectors_path):
+            expected = rows * dim * np.dtype(np.float32).itemsize
+            if os.path.getsize(vectors_path) > expected:
+                os.truncate(vectors_path, expected)
+            matrix = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(rows, dim))
+        else:
+            if rows:
+                manifest = self._empty_manifest()
+            matrix = None
+            for name in ("vectors.f32", "chunks.jsonl"):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+
+        chunks, extra = [], False
+        if matrix is not None:
+            with open(self._path("chunks.jsonl"), "r", encoding="utf-8") as f:
+                for line in f:
+                    if len(chunks) == rows:
+                        extra = True
+                        break
+                    chunks.append(json.loads(line))
+            if len(chunks) < rows:
+                raise ValueError(f"Knowledge base index in {self.index_dir} is damaged; delete it to rebuild")
+            if extra:
+                self._rewrite_lines("chunks.jsonl", chunks)
+
+        live = np.zeros(manifest["rows"], dtype=bool)
+        for entry in manifest["files"].values():
+            live[entry["rows"][0]:entry["rows"][1]] = True
+        contents = sorted((path, entry["sha1"]) for path, entry in manifest["files"].items())
+        version = hashlib.sha1(json.dumps([manifest["model"], contents]).encode("utf-8")).hexdigest()
+        with self._lock:
+            self.manifest, self._matrix, self._live, self._chunks = manifest, matrix, live, chunks
+            self.version = version
+
+    def _release_matrix(self):
+        """Unmap vectors.f32; searches see an empty index until ``_load`` maps it again"""
+        with self._lock:
+            matrix, self._matrix = self._matrix, None
+            if matrix is not None and getattr(matrix, "_mmap", None) is not None:
+                # Searches read the matrix under the lock, so none is using it
+                matrix._mmap.close()
+
+    def _rewrite_lines(self, name, records):
+        with open(self._path(name) + ".tmp", "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        os.replace(self._path(name) + ".tmp", self._path(name))
+
+    def _write_manifest(self, manifest):
+        with open(self._path("manifest.json") + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(self._path("manifest.json") + ".tmp", self._path("manifest.json"))
+
+    # -*- Indexing
+
+    def _scan(self):
+        """Documents under docs_dir by relative path, with their size and modification time"""
+        found = {}
+        for root, dirs, files in os.walk(self.docs_dir):
+            dirs[:] = [d for d in dirs if not d.startswith(".")
+                       and os.path.abspath(os.path.join(root, d)) != self.index_dir]
+            for name in files:
+                if name.lower().endswith(DOCUMENT_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    found[os.path.relpath(path, self.docs_dir).replace(os.sep, "/")] = (path, stat.st_size,
+                                                                                        stat.st_mtime)
+        return found
+
+    def update(self):
+        """Embed new and changed documents and drop deleted ones.
+
+        Returns:
+            dict: Files added, updated, removed and unchanged, chunks embedded and seconds taken.
+        """
+        started = time.perf_counter()
+        with self._update_lock:
+            manifest = json.loads(json.dumps(self.manifest))
+            known = manifest["files"]
+            found = self._scan()
+            counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "chunks_embedded": 0}
+
+            for path in [path for path in known if path not in found]:
+                del known[path]
+                counts["removed"] += 1
+
+            pending = []
+            for path, (full_path, size, mtime) in sorted(found.items()):
+                entry = known.get(path)
+                if entry is not None and entry["size"] == size and entry["mtime"] == mtime:
+                    counts["unchanged"] += 1
+                    continue
+                with open(full_path, "r", encoding="utf-8", errors="replace") as f:
+                    text = f.read()
+                digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+                if entry is not None and entry["sha1"] == digest:
+                    # Touched or copied without changes
+                    entry.update(size=size, mtime=mtime)
+                    counts["unchanged"] += 1
+                    continue
+                counts["updated" if entry is not None else "added"] += 1
+                known.pop(path, None)
+                pending.append((path, size, mtime, digest, chunk_text(text, self.chunk_chars, self.overlap)))
+
+            if not pending and not counts["removed"] and manifest["files"] == self.manifest["files"]:
+                counts["seconds"] = time.perf_counter() - started
+                return counts
+
+            try:
+                self._write_manifest(manifest)
+                checkpoint = time.perf_counter()
+                # Small documents share embedding requests, up to the embedder's batch size
+                batch_size = getattr(self.embedder, "batch_size", 32)
+                group = []
+                for index, document in enumerate(pending):
+                    group.append(document)
+                    if sum(len(chunks) for *_, chunks in group) < batch_size and index < len(pending) - 1:
+                        continue
+                    self._append(manifest, group)
+                    counts["chunks_embedded"] += sum(len(chunks) for *_, chunks in group)
+                    group = []
+                    # Checkpoint regularly so an interrupted first index keeps most of its progress
+                    if time.perf_counter() - checkpoint > 1.0:
+                        self._write_manifest(manifest)
+                        checkpoint = time.perf_counter()
+                self._write_manifest(manifest)
+
+                live_rows = sum(entry["rows"][1] - entry["rows"][0] for entry in known.values())
+                if manifest["rows"] - live_rows > manifest["rows"] / 4:
+                    self._compact(manifest)
+            finally:
+                self._load()
+        counts["seconds"] = time.perf_counter() - started
+        return counts
+
+    def _append(self, manifest, documents):
+        """Embed the documents' chunks and append them to the vector and chunk files"""
+        texts = []
+        for path, *_, chunks in documents:
+            title = os.path.splitext(os.path.basename(path))[0].replace("_", " ").replace("-", " ")
+            texts.extend(f"{title}\n{chunk}" for chunk in chunks)
+        if texts:
+            vectors = _normalized(self.embedder(texts))
+            if manifest["dim"] is None:
+                manifest["dim"] = int(vectors.shape[1])
+            elif vectors.shape[1] != manifest["dim"]:
+                raise ValueError(f"Embedding size changed from {manifest['dim']} to {vectors.shape[1]}")
+            with open(self._path("vectors.f32"), "ab") as f:
+                f.write(vectors.tobytes())
+
+        with open(self._path("chunks.jsonl"), "a", encoding="utf-8") as f:
+            for path, size, mtime, digest, chunks in documents:
+                for number, chunk in enumerate(chunks):
+                    f.write(json.dumps({"source": path, "chunk": number, "text": chunk}) + "\n")
+                start = manifest["rows"]
+                manifest["rows"] += len(chunks)
+                manifest["files"][path] = {"size": size, "mtime": mtime, "sha1": digest,
+                                           "rows": [start, manifest["rows"]]}
+
+    def _compact(self, manifest):
+        """Rewrite the index without the rows of changed and deleted documents"""
+        matrix = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r",
+                           shape=(manifest["rows"], manifest["dim"]))
+        with open(self._path("chunks.jsonl"), "r", encoding="utf-8") as f:
+            chunks = [json.loads(line) for line, _ in zip(f, range(manifest["rows"]))]
+
+        kept, kept_chunks, row = [], [], 0
+        for entry in manifest["files"].values():
+            start, stop = entry["rows"]
+            kept.append(np.array(matrix[start:stop]))
+            kept_chunks.extend(chunks[start:stop])
+            entry["rows"] = [row, row + stop - start]
+            row += stop - start
+        matrix._mmap.close()
+        del matrix
+        self._release_matrix()
+
+        with open(self._path("vectors.f32") + ".tmp", "wb") as f:
+            for block in kept:
+                f.write(block.tobytes())
+        os.replace(self._path("vectors.f32") + ".tmp", self._path("vectors.f32"))
+        self._rewrite_lines("chunks.jsonl", kept_chunks)
+        manifest["rows"] = row
+        self._write_manifest(manifest)
+
+    def start_indexing(self):
+        """Run ``update`` on a background thread; searches use the previous index until it finishes"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._index_in_background, name="kb-index", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def _index_in_background(self):
+        try:
+            logger.info("Knowledge base indexed: %s", self.update())
+        except Exception as e:
+            logger.warning("Knowledge base indexing failed: %s", e)
+
+    # -*- Search
+
+    def _embed_query(self, query):
+        key = " ".join(query.split()).casefold()
+        with self._lock:
+            if key in self._query_cache:
+                self._query_cache.move_to_end(key)
+                return self._query_cache[key]
+        vector = _normalized(self.embedder([query]))[0]
+        with self._lock:
+            self._query_cache[key] = vector
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+        return vector
+
+    def search(self, query, top_k=4, min_score=0.0):
+        """The ``top_k`` chunks most similar to the query.
+
+        Returns:
+            list of dict: ``source``, ``chunk``, ``score`` (cosine similarity) and ``text``,
+            best first, leaving out chunks scoring below ``min_score``.
+        """
+        with self._lock:
+            empty = self._matrix is None or not self._live.any()
+        if empty or not query.strip():
+            return []
+        vector = self._embed_query(query)
+        with self._lock:
+            matrix, live, chunks = self._matrix, self._live, self._chunks
+            if matrix is None or not live.any():
+                return []
+            # Scored under the lock: an update may unmap the matrix as soon as it is released
+            scores = np.array(matrix @ vector)
+        scores[~live] = -np.inf
+        k = min(top_k, int(live.sum()))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{**chunks[i], "score": float(scores[i])} for i in top if scores[i] >= min_score]
+
+    def context(self, query, top_k=3):
+        """Excerpts relevant to the query, formatted for the prompt, or None when nothing is relevant"""
+        excerpts, used = [], 0
+        for hit in self.search(query, top_k=top_k, min_score=self.min_score):
+            text = hit["text"][:max(0, self.context_chars - used)]
+            if not text:
+                break
+            excerpts.append(f"[{hit['source']}]\n{text}")
+            used += len(text)
+        if not excerpts:
+            return None
+        return ("Excerpts from the plant knowledge base (SOPs, control plans, past project reports). "
+                "Prefer them over general knowledge and cite the source in brackets:\n\n" + "\n\n".join(excerpts))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self.manifest["files"]),
+                "chunks": int(self._live.sum()),
+                "rows": self.manifest["rows"],
+                "dim": self.manifest["dim"],
+                "model": self.model,
+            }
+
+
+def knowledge_base_from_env(host, keep_alive=None, index=True):
+    """Knowledge base configured in .env, or None when LSS_KB_DIR is not set.
+
+    LSS_KB_DIR is the document folder, LSS_KB_INDEX the index folder and
+    OLLAMA_EMBED_MODEL the embedding model; LSS_KB_MIN_SCORE and
+    LSS_KB_CONTEXT_CHARS control what is added to prompts. With ``index`` the
+    folder is re-scanned on a background thread.
+    """
+    docs_dir = os.getenv("LSS_KB_DIR")
+    if not docs_dir or not os.path.isdir(docs_dir):
+        return None
+    embedder = OllamaEmbedder(os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text"), host, keep_alive=keep_alive)
+    knowledge_base = KnowledgeBase(docs_dir, embedder,
+                                   index_dir=os.getenv("LSS_KB_INDEX", os.path.join(".cache", "knowledge_base")),
+                                   min_score=float(os.getenv("LSS_KB_MIN_SCORE", 0.35)),
+                                   context_chars=int(os.getenv("LSS_KB_CONTEXT_CHARS", 1500)))
+    if index:
+        knowledge_base.start_indexing()
+    return knowledge_base
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("query", nargs="*", help="Search the index after updating it")
+    parser.add_argument("--top-k", type=int, default=4)
+    args = parser.parse_args()
+
+    from ollama_router import ollama_base_urls
+
+    knowledge_base = knowledge_base_from_env(ollama_base_urls()[0], index=False)
+    if knowledge_base is None:
+        parser.error("Set LSS_KB_DIR to the folder holding the documents")
+    counts = knowledge_base.update()
+    print(f"Indexed {knowledge_base.docs_dir}: {counts['added']} added, {counts['updated']} updated, "
+          f"{counts['removed']} removed, {counts['unchanged']} unchanged, {counts['chunks_embedded']} chunks "
+          f"embedded in {counts['seconds']:.1f}s ({knowledge_base.stats()['chunks']} chunks searchable)")
+
+    if args.query:
+        query = " ".join(args.query)
+        started = time.perf_counter()
+        hits = knowledge_base.search(query, top_k=args.top_k)
+        print(f"\n{len(hits)} result(s) in {(time.perf_counter() - started) * 1000:.1f} ms")
+        for hit in hits:
+            print(f"\n[{hit['score']:.3f}] {hit['source']} #{hit['chunk']}\n{hit['text'][:400]}")
+
+
+if __name__ == "__main__":
+    main()
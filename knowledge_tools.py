@@ -0,0 +1,46 @@
+"""
+Toolkit exposing the local knowledge base to the Lean Six Sigma agent
+"""
+
+import json
+
+from phi.tools import Toolkit
+from phi.utils.log import logger
+
+
+class KnowledgeBaseSearch(Toolkit):
+    def __init__(self, knowledge_base, max_chars=800):
+        """Search plant documents instead of the web.
+
+        Args:
+            knowledge_base: KnowledgeBase to search.
+            max_chars: Characters returned per matching chunk.
+        """
+        super().__init__(name="knowledge_base")
+        self.knowledge_base = knowledge_base
+        self.max_chars = max_chars
+        self.register(self.search_knowledge_base)
+
+    def search_knowledge_base(self, query: str, top_k: int = 4) -> str:
+        """Search the plant's own SOPs, control plans and past project reports.
+
+        Use this before any web search for site procedures, specifications,
+        reaction plans, past project results and internal benchmarks.
+
+        Args:
+            query (str): What to look for, e.g. "torque audit reaction plan".
+            top_k (int): Number of passages to return.
+
+        Returns:
+            str: JSON string with the matching passages, their source documents and similarity scores.
+        """
+        try:
+            hits = self.knowledge_base.search(query, top_k=max(1, min(int(top_k), 10)))
+            results = [
+                {"source": hit["source"], "score": round(hit["score"], 3), "text": hit["text"][:self.max_chars]}
+                for hit in hits
+            ]
+            return json.dumps({"operation": "search_knowledge_base", "query": query, "results": results})
+        except Exception as e:
+            logger.error(f"search_knowledge_base failed: {e}")
+            return json.dumps({"operation": "search_knowledge_base", "error": str(e)})
@@ -1,104 +1,40 @@
+import json
 import os
+import shlex
+import time
 from dotenv import load_dotenv
-from phi.agent import Agent
-from phi.model.ollama import Ollama
-from phi.tools.duckduckgo import DuckDuckGo
-from phi.tools.calculator import Calculator
+from agent_factory import PersonaAgent, agent_settings_from_env, shared_knowledge_base
+from intent_router import IntentRouter, arithmetic_expression
+from personas import LEAN_SIX_SIGMA
 
 # Load environment variables
 load_dotenv()
 
 
-class LeanSixSigmaAgent:
-    def __init__(self, model_name="llama2", base_url="http://localhost:11434"):
-        """Initialize the Lean Six Sigma Black Belt AI Agent"""
-        self.model_name = model_name
-        self.base_url = base_url
+class LeanSixSigmaAgent(PersonaAgent):
+    """Master Black Belt persona with the statistics tools, DMAIC templates and the plant knowledge base"""
 
-        # Initialize the Ollama model
-        self.model = Ollama(
-            id=model_name,
-            base_url=base_url,
-        )
+    persona = LEAN_SIX_SIGMA
 
-        # Create the specialized Lean Six Sigma agent
-        self.agent = Agent(
-            model=self.model,
-            tools=[
-                DuckDuckGo(),
-                Calculator(),
-            ],
-            instructions=[
-                "You are Master Black Belt Sarah Chen, a seasoned Lean Six Sigma expert with 18+ years of experience across manufacturing, healthcare, financial services, and technology sectors.",
-
-                "PROFESSIONAL BACKGROUND:",
-                "- Master Black Belt certification (ASQ, IASSC)",
-                "- Led 200+ improvement projects with combined savings of $50M+",
-                "- Expertise in Change Management, Project Management (PMP), and Statistical Analysis",
-                "- Industry experience: Automotive, Aerospace, Healthcare, Banking, IT/Software",
-                "- Trained 150+ Green Belts and 45+ Black Belts",
-
-                "CORE METHODOLOGIES & TOOLS:",
-                "DMAIC Framework:",
-                "- Define: Project Charter, SIPOC, VOC, CTQ Tree, Stakeholder Analysis",
-                "- Measure: Data Collection Plan, MSA, Process Capability, Baseline Metrics",
-                "- Analyze: Root Cause Analysis (5 Whys, Fishbone, FMEA), Statistical Analysis, Hypothesis Testing",
-                "- Improve: Solution Design, Pilot Planning, Cost-Benefit Analysis, Implementation Planning",
-                "- Control: Control Plan, SPC, Mistake-Proofing, Standardization",
-
-                "LEAN TOOLS:",
-                "- 8 Wastes (TIMWOODS): Transportation, Inventory, Motion, Waiting, Overprocessing, Overproduction, Defects, Skills",
-                "- Value Stream Mapping, Kaizen Events, 5S, Kanban, Takt Time, Flow Analysis",
-                "- Standard Work, Quick Changeover (SMED), Total Productive Maintenance (TPM)",
-
-                "STATISTICAL EXPERTISE:",
-                "- Descriptive Statistics, Hypothesis Testing (t-tests, ANOVA, Chi-square)",
-                "- Regression Analysis, DOE (Design of Experiments), Control Charts",
-                "- Process Capability Studies (Cp, Cpk, Pp, Ppk), Measurement Systems Analysis",
-                "- Statistical Software: Minitab, JMP, R, Excel Analytics",
-
-                "PROBLEM-SOLVING APPROACH:",
-                "1. Always start with business impact and customer value",
-                "2. Use data to drive every decision - 'In God we trust, all others bring data'",
-                "3. Apply appropriate statistical rigor based on problem complexity",
-                "4. Consider both short-term fixes and long-term systematic solutions",
-                "5. Focus on sustainable improvements with robust control systems",
-                "6. Engage stakeholders throughout the process",
-                "7. Calculate ROI and business impact of all recommendations",
-
-                "COMMUNICATION STYLE:",
-                "- Lead with business impact and customer value",
-                "- Use structured problem-solving frameworks",
-                "- Provide specific, actionable recommendations",
-                "- Include implementation timelines and resource requirements",
-                "- Address potential risks and mitigation strategies",
-                "- Suggest appropriate metrics and control mechanisms",
-                "- Reference relevant case studies and best practices",
-
-                "RESPONSE FRAMEWORK:",
-                "For any problem or question:",
-                "1. Clarify the problem statement and scope",
-                "2. Identify relevant LSS methodology (DMAIC, Kaizen, etc.)",
-                "3. Recommend specific tools and techniques",
-                "4. Provide step-by-step implementation guidance",
-                "5. Suggest metrics for tracking progress",
-                "6. Address sustainability and control considerations",
-                "7. Estimate timeline and resource requirements",
-
-                "Use Calculator for statistical calculations and DuckDuckGo for current industry benchmarks or specific methodology updates.",
-            ],
-            show_tool_calls=True,
-            markdown=True,
-        )
+    def analyze_dataset(self, csv_path, column, question=None, subgroup_size=5, lsl=None, usl=None):
+        """Summarize a large measurement CSV in one streaming pass and have the agent interpret it"""
+        from spc_ingest import summarize_csv
 
-    def chat(self, message):
-        """Send a message to the agent and get a response"""
         try:
-            response = self.agent.run(message)
-            return response.content
+            summary = summarize_csv(csv_path, column, subgroup_size=subgroup_size, lsl=lsl, usl=usl)
         except Exception as e:
             return f"Error: {str(e)}"
 
+        question = question or (
+            "Interpret this Measure-phase data set: assess stability, capability and the out-of-control "
+            "signals, and recommend next steps."
+        )
+        prompt = (
+            f"{question}\n\nSummary of all {summary['rows']:,} rows of column '{column}' "
+            f"from {os.path.basename(csv_path)}:\n```json\n{json.dumps(summary, default=float)}\n```"
+        )
+        return self.chat(prompt)
+
     def provide_dmaic_template(self):
         """Provide a DMAIC project template"""
         template = """
@@ -147,7 +83,125 @@ class LeanSixSigmaAgent:
         """
         return template
 
-    def start_interactive_session(self):
+    def provide_sipoc_template(self):
+        """Provide a SIPOC diagram template"""
+        template = """
+# SIPOC Diagram
+
+Process name: ____________________   Process owner: ____________________
+Start trigger: ___________________   End point: ________________________
+
+| Suppliers | Inputs | Process (5-7 high-level steps) | Outputs | Customers |
+|-----------|--------|--------------------------------|---------|-----------|
+|           |        | 1.                             |         |           |
+|           |        | 2.                             |         |           |
+|           |        | 3.                             |         |           |
+|           |        | 4.                             |         |           |
+|           |        | 5.                             |         |           |
+
+Tips:
+- [ ] Map the Process column first, then Outputs and Customers, then Inputs and Suppliers
+- [ ] Keep steps at a high level (verb + noun)
+- [ ] Mark the outputs that are CTQ for each customer
+- [ ] Confirm scope boundaries with the project sponsor
+        """
+        return template
+
+    def provide_fmea_template(self):
+        """Provide a Failure Mode and Effects Analysis worksheet"""
+        template = """
+# Process FMEA Worksheet
+
+| Process Step | Failure Mode | Effect | SEV | Cause | OCC | Current Controls | DET | RPN | Recommended Action | Owner / Due | New SEV | New OCC | New DET | New RPN |
+|--------------|--------------|--------|-----|-------|-----|------------------|-----|-----|--------------------|-------------|---------|---------|---------|---------|
+|              |              |        |     |       |     |                  |     |     |                    |             |         |         |         |         |
+
+Scoring (1-10):
+- SEV: 1 = no noticeable effect ... 10 = hazardous without warning
+- OCC: 1 = failure unlikely ... 10 = failure almost certain
+- DET: 1 = control almost certainly detects ... 10 = no detection possible
+- RPN = SEV x OCC x DET
+
+Next steps:
+- [ ] Act on every SEV 9-10 regardless of RPN
+- [ ] Prioritize the remaining failure modes by RPN (Pareto)
+- [ ] Re-score after actions are implemented
+        """
+        return template
+
+    def provide_control_plan_template(self):
+        """Provide a control plan template"""
+        template = """
+# Control Plan
+
+Process: ____________________   Owner: ____________________   Revision / date: __________
+
+| Process Step | Characteristic (KPOV / KPIV) | Specification / Target | Measurement Method | Sample Size | Frequency | Control Method (chart, checklist, poka-yoke) | Responsible | Reaction Plan |
+|--------------|------------------------------|------------------------|--------------------|-------------|-----------|----------------------------------------------|-------------|---------------|
+|              |                              |                        |                    |             |           |                                              |             |               |
+
+Checklist:
+- [ ] Each critical X and Y from the project has a row
+- [ ] MSA completed for every measurement method
+- [ ] Control chart limits calculated from post-improvement data
+- [ ] Reaction plan names who stops, contains and escalates
+- [ ] Procedure and training records updated
+- [ ] Handoff to process owner signed off
+        """
+        return template
+
+    def list_lss_tools(self):
+        """List the Lean Six Sigma tools by DMAIC phase"""
+        tools_list = """
+🛠️ LEAN SIX SIGMA TOOLKIT:
+
+DEFINE: Project Charter, SIPOC, VOC, CTQ Tree, Stakeholder Analysis
+MEASURE: MSA, Process Capability, Data Collection Plans, Baseline Metrics  
+ANALYZE: 5 Whys, Fishbone, FMEA, Hypothesis Testing, Pareto Charts
+IMPROVE: DOE, Pilot Plans, Cost-Benefit Analysis, Solution Design
+CONTROL: Control Charts, SPC, Standard Work, Poka-Yoke
+
+LEAN TOOLS: VSM, Kaizen, 5S, Kanban, SMED, Takt Time Analysis
+STATISTICAL: t-tests, ANOVA, Regression, Control Charts, Cp/Cpk
+                    """
+        return tools_list
+
+    def _search_knowledge_base(self, query):
+        """Matching passages straight from the knowledge base, without the model"""
+        if not query:
+            return "Usage: kb <what to look for>"
+        started = time.perf_counter()
+        hits = self.knowledge_base.search(query, top_k=3)
+        if not hits:
+            return "No matching documents in the knowledge base."
+        lines = [f"\n📚 {len(hits)} passage(s) in {(time.perf_counter() - started) * 1000:.0f} ms:"]
+        for hit in hits:
+            lines.append(f"\n[{hit['source']}] (similarity {hit['score']:.2f})\n{hit['text'][:600]}")
+        return "\n".join(lines)
+
+    def _build_intents(self):
+        """Quick commands and deterministic questions answered locally before the model"""
+        intents = IntentRouter()
+        intents.add("dmaic", lambda _: "\n📋 DMAIC PROJECT TEMPLATE:" + self.provide_dmaic_template(),
+                    phrases=["dmaic", "dmaic project", "dmaic checklist"], description="Get DMAIC project template")
+        intents.add("sipoc", lambda _: self.provide_sipoc_template(),
+                    phrases=["sipoc", "sipoc diagram"], description="Get SIPOC diagram template")
+        intents.add("fmea", lambda _: self.provide_fmea_template(),
+                    phrases=["fmea", "pfmea", "fmea worksheet", "failure mode and effects analysis"],
+                    description="Get FMEA worksheet")
+        intents.add("control plan", lambda _: self.provide_control_plan_template(),
+                    phrases=["control plan", "control plan worksheet"], description="Get control plan template")
+        intents.add("tools", lambda _: self.list_lss_tools(),
+                    phrases=["tools", "lss tools", "list tools", "toolkit"], description="List available LSS tools")
+        intents.add("calc", self._calculate, matcher=arithmetic_expression,
+                    description="Evaluate arithmetic locally, e.g. 'calc (12.5-9.8)/0.4'")
+        if self.knowledge_base is not None:
+            intents.add("kb", self._search_knowledge_base, phrases=["kb", "search kb"], takes_argument=True,
+                        description="Search plant SOPs, control plans and project reports, e.g. 'kb torque audit'")
+        intents.add("stats", self._stats_report, description="Where the last turn and the session spent their time", saves_turn=False)
+        return intents
+
+    def start_interactive_session(self, stream=True):
         """Start an interactive LSS consultation session"""
         print("=" * 60)
         print("🎯 LEAN SIX SIGMA BLACK BELT CONSULTANT")
@@ -160,8 +214,9 @@ class LeanSixSigmaAgent:
         print("  • Statistical Analysis & Data-Driven Solutions")
         print("  • Change Management & Project Leadership")
         print("\n💡 Quick Commands:")
-        print("  'dmaic' - Get DMAIC project template")
-        print("  'tools' - List available LSS tools")
+        for line in self.intents.help_lines():
+            print(line)
+        print("  'analyze <csv> <column> [lsl] [usl]' - Summarize a large measurement file")
         print("  'quit' or 'exit' - End session")
         print("\n" + "─" * 60)
 
@@ -172,36 +227,46 @@ class LeanSixSigmaAgent:
                 if user_input.lower() in ['quit', 'exit', 'q']:
                     print("\n✅ Remember: Continuous improvement is a journey, not a destination!")
                     print("   Keep measuring, analyzing, and improving!")
+                    if self.cache is not None:
+                        stats = self.cache.stats()
+                        print(f"   Response cache: {stats['hits']} hits, {stats['misses']} misses")
+                    if self.intents.saved_turns:
+                        print(f"   Answered locally without the model: {self.intents.saved_turns} turn(s)")
                     break
 
-                if user_input.lower() == 'dmaic':
-                    print("\n📋 DMAIC PROJECT TEMPLATE:")
-                    print(self.provide_dmaic_template())
+                if user_input.lower().startswith('analyze '):
+                    args = [arg.strip('"\'') for arg in shlex.split(user_input, posix=False)[1:]]
+                    if len(args) < 2:
+                        print("Usage: analyze <csv> <column> [lsl] [usl]")
+                        continue
+                    limits = [float(arg) for arg in args[2:4]] + [None, None]
+                    print("\n📊 Streaming dataset summary...")
+                    print("─" * 40)
+                    print(self.analyze_dataset(args[0], args[1], lsl=limits[0], usl=limits[1]))
                     continue
 
-                if user_input.lower() == 'tools':
-                    tools_list = """
-🛠️ LEAN SIX SIGMA TOOLKIT:
-
-DEFINE: Project Charter, SIPOC, VOC, CTQ Tree, Stakeholder Analysis
-MEASURE: MSA, Process Capability, Data Collection Plans, Baseline Metrics  
-ANALYZE: 5 Whys, Fishbone, FMEA, Hypothesis Testing, Pareto Charts
-IMPROVE: DOE, Pilot Plans, Cost-Benefit Analysis, Solution Design
-CONTROL: Control Charts, SPC, Standard Work, Poka-Yoke
-
-LEAN TOOLS: VSM, Kaizen, 5S, Kanban, SMED, Takt Time Analysis
-STATISTICAL: t-tests, ANOVA, Regression, Control Charts, Cp/Cpk
-                    """
-                    print(tools_list)
+                answer = self.intents.handle(user_input)
+                if answer is not None:
+                    print(answer)
                     continue
 
                 if not user_input:
                     continue
 
+                warm = self.warmup is not None and self.warmup.is_warm()
                 print("\n🎯 LSS Analysis:")
                 print("─" * 40)
-                response = self.chat(user_input)
-                print(response)
+                if stream:
+                    for chunk in self.chat_stream(user_input):
+                        print(chunk, end="", flush=True)
+                    print()
+                else:
+                    response = self.chat(user_input)
+                    print(response)
+                if self.last_turn_metrics is not None:
+                    print(f"\n⏱️ {self.last_turn_metrics.summary()}")
+                if self.first_turn is None:
+                    self._report_first_turn(warm)
 
             except KeyboardInterrupt:
                 print("\n\n✅ Session ended. Keep improving!")
@@ -210,12 +275,14 @@ STATISTICAL: t-tests, ANOVA, Regression, Control Charts, Cp/Cpk
                 print(f"❌ Error: {str(e)}")
 
 
-def create_lss_agent():
+def create_lss_agent(background=False):
     """Factory function to create a Lean Six Sigma agent"""
-    model_name = os.getenv("OLLAMA_MODEL", "llama2")
-    base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-
-    return LeanSixSigmaAgent(model_name=model_name, base_url=base_url)
+    settings = agent_settings_from_env()
+    knowledge_base = shared_knowledge_base(settings["base_url"], keep_alive=settings["keep_alive"])
+    # LSS_WEB_SEARCH=off leaves DuckDuckGo out, e.g. on a network without internet access
+    web_search = os.getenv("LSS_WEB_SEARCH", "on").lower() not in ("0", "off", "false", "no")
+    return LeanSixSigmaAgent(**settings, knowledge_base=knowledge_base, web_search=web_search,
+                             background=background)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,579 @@
+"""
+NumPy-backed statistics toolkit for the Lean Six Sigma agent.
+
+Each function takes a whole data set (inline or from a CSV file) and returns
+the full analysis in one tool call, instead of the model stepping through
+means and standard deviations one Calculator call at a time.
+"""
+
+import csv
+import json
+import math
+from typing import List, Optional
+
+import numpy as np
+
+from phi.tools import Toolkit
+from phi.utils.log import logger
+
+# Control chart constants for subgroup sizes 2-10
+A2 = {2: 1.880, 3: 1.023, 4: 0.729, 5: 0.577, 6: 0.483, 7: 0.419, 8: 0.373, 9: 0.337, 10: 0.308}
+D3 = {2: 0.0, 3: 0.0, 4: 0.0, 5: 0.0, 6: 0.0, 7: 0.076, 8: 0.136, 9: 0.184, 10: 0.223}
+D4 = {2: 3.267, 3: 2.574, 4: 2.282, 5: 2.114, 6: 2.004, 7: 1.924, 8: 1.864, 9: 1.816, 10: 1.777}
+D2 = {2: 1.128, 3: 1.693, 4: 2.059, 5: 2.326, 6: 2.534, 7: 2.704, 8: 2.847, 9: 2.970, 10: 3.078}
+
+
+# -*- Distribution helpers (regularized incomplete beta/gamma, so SciPy is not required)
+
+def _nonzero(value, tiny=1e-300):
+    return value if abs(value) > tiny else tiny
+
+
+def _betacf(a, b, x, max_iter=200, eps=3e-14):
+    """Continued fraction for the incomplete beta function (modified Lentz)"""
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = 1.0
+    d = 1.0 / _nonzero(1.0 - qab * x / qap)
+    h = d
+    for m in range(1, max_iter + 1):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 / _nonzero(1.0 + aa * d)
+        c = _nonzero(1.0 + aa / c)
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 / _nonzero(1.0 + aa * d)
+        c = _nonzero(1.0 + aa / c)
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < eps:
+            break
+    return h
+
+
+def _betainc(a, b, x):
+    """Regularized incomplete beta function I_x(a, b)"""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1.0 - x))
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1.0 - x) / b
+
+
+def _gammaincc(a, x, max_iter=500, eps=3e-14):
+    """Regularized upper incomplete gamma function Q(a, x)"""
+    if x <= 0.0:
+        return 1.0
+    if x < a + 1.0:
+        term = total = 1.0 / a
+        ap = a
+        for _ in range(max_iter):
+            ap += 1.0
+            term *= x / ap
+            total += term
+            if abs(term) < abs(total) * eps:
+                break
+        return 1.0 - total * math.exp(-x + a * math.log(x) - math.lgamma(a))
+    b = x + 1.0 - a
+    c = 1.0 / 1e-300
+    d = 1.0 / b
+    h = d
+    for i in range(1, max_iter + 1):
+        an = -i * (i - a)
+        b += 2.0
+        d = 1.0 / _nonzero(an * d + b)
+        c = _nonzero(b + an / c)
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < eps:
+            break
+    return math.exp(-x + a * math.log(x) - math.lgamma(a)) * h
+
+
+def t_sf_two_sided(t, df):
+    return _betainc(df / 2.0, 0.5, df / (df + t * t))
+
+
+def f_sf(f, df1, df2):
+    if f <= 0:
+        return 1.0
+    return _betainc(df2 / 2.0, df1 / 2.0, df2 / (df2 + df1 * f))
+
+
+def chi2_sf(x, df):
+    return _gammaincc(df / 2.0, x / 2.0)
+
+
+# -*- Data helpers
+
+def load_csv_columns(csv_path, columns):
+    """Read the named columns of a CSV file as lists of strings"""
+    values = {column: [] for column in columns}
+    with open(csv_path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        missing = [c for c in columns if c not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Column(s) {missing} not found in {csv_path}; available: {reader.fieldnames}")
+        for row in reader:
+            if all(row[c] not in (None, "") for c in columns):
+                for c in columns:
+                    values[c].append(row[c])
+    return values
+
+
+def _numeric(data=None, csv_path=None, column=None):
+    """Return a float array from inline data or a CSV column"""
+    if csv_path:
+        if not column:
+            raise ValueError("A column name is required when reading from a CSV file")
+        data = load_csv_columns(csv_path, [column])[column]
+    if data is None or len(data) == 0:
+        raise ValueError("No data provided")
+    return np.asarray(data, dtype=float)
+
+
+def _grouped(groups=None, csv_path=None, value_column=None, group_column=None):
+    """Return a list of (label, float array) from inline groups or a long-format CSV"""
+    if csv_path:
+        if not value_column or not group_column:
+            raise ValueError("value_column and group_column are required when reading groups from a CSV file")
+        columns = load_csv_columns(csv_path, [value_column, group_column])
+        labels = np.asarray(columns[group_column])
+        values = np.asarray(columns[value_column], dtype=float)
+        return [(str(label), values[labels == label]) for label in dict.fromkeys(labels)]
+    if not groups:
+        raise ValueError("No groups provided")
+    return [(f"group_{i + 1}", np.asarray(g, dtype=float)) for i, g in enumerate(groups)]
+
+
+def _subgroups(values, subgroup_size):
+    """Split values into complete consecutive subgroups"""
+    usable = len(values) - len(values) % subgroup_size
+    if usable < 2 * subgroup_size:
+        raise ValueError(f"Need at least two complete subgroups of size {subgroup_size}")
+    return values[:usable].reshape(-1, subgroup_size)
+
+
+def _within_sigma(values, subgroup_size):
+    """Short-term sigma from the average range (R-bar/d2) or moving range for individuals"""
+    if subgroup_size <= 1:
+        moving_range = np.abs(np.diff(values))
+        return float(moving_range.mean() / D2[2])
+    if subgroup_size not in D2:
+        raise ValueError("subgroup_size must be between 1 and 10")
+    ranges = np.ptp(_subgroups(values, subgroup_size), axis=1)
+    return float(ranges.mean() / D2[subgroup_size])
+
+
+def _round(value, digits=6):
+    """Round floats to significant digits so small p-values survive"""
+    if isinstance(value, dict):
+        return {k: _round(v, digits) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_round(v, digits) for v in value]
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        return value if not math.isfinite(value) else float(f"{value:.{digits}g}")
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def _result(operation, **fields):
+    # NaN and infinity are not JSON; a result containing one is reported as an error instead
+    return json.dumps({"operation": operation, **_round(fields)}, allow_nan=False)
+
+
+def _error(operation, e):
+    logger.error(f"{operation} failed: {e}")
+    return json.dumps({"operation": operation, "error": str(e)})
+
+
+class LeanSixSigmaStatistics(Toolkit):
+    def __init__(self):
+        super().__init__(name="lss_statistics")
+
+        self.register(self.descriptive_statistics)
+        self.register(self.process_capability)
+        self.register(self.control_chart_limits)
+        self.register(self.t_test)
+        self.register(self.anova)
+        self.register(self.chi_square_test)
+        self.register(self.pareto_analysis)
+        self.register(self.summarize_measurement_file)
+
+    def descriptive_statistics(
+        self, data: Optional[List[float]] = None, csv_path: Optional[str] = None, column: Optional[str] = None
+    ) -> str:
+        """Compute count, mean, standard deviation, min, quartiles and max for a whole data set in one call.
+
+        Args:
+            data (list of float, optional): The measurements.
+            csv_path (str, optional): Path to a CSV file to read the measurements from instead.
+            column (str, optional): CSV column holding the measurements.
+
+        Returns:
+            str: JSON string of the summary statistics.
+        """
+        try:
+            values = _numeric(data, csv_path, column)
+            q1, median, q3 = np.percentile(values, [25, 50, 75])
+            return _result(
+                "descriptive_statistics",
+                n=len(values),
+                mean=values.mean(),
+                std_dev=values.std(ddof=1) if len(values) > 1 else 0.0,
+                min=values.min(),
+                q1=q1,
+                median=median,
+                q3=q3,
+                max=values.max(),
+            )
+        except Exception as e:
+            return _error("descriptive_statistics", e)
+
+    def process_capability(
+        self,
+        lsl: Optional[float] = None,
+        usl: Optional[float] = None,
+        data: Optional[List[float]] = None,
+        subgroup_size: int = 1,
+        csv_path: Optional[str] = None,
+        column: Optional[str] = None,
+    ) -> str:
+        """Compute process capability (Cp, Cpk, Pp, Ppk) for a data set against its specification limits.
+
+        Within-subgroup sigma uses R-bar/d2 (or the average moving range for individuals);
+        overall sigma is the sample standard deviation.
+
+        Args:
+            lsl (float, optional): Lower specification limit.
+            usl (float, optional): Upper specification limit.
+            data (list of float, optional): The measurements, in production order.
+            subgroup_size (int): Rational subgroup size (1 for individuals, up to 10).
+            csv_path (str, optional): Path to a CSV file to read the measurements from instead.
+            column (str, optional): CSV column holding the measurements.
+
+        Returns:
+            str: JSON string with Cp, Cpk, Pp, Ppk, sigmas and expected PPM out of spec.
+        """
+        try:
+            if lsl is None and usl is None:
+                raise ValueError("At least one specification limit (lsl or usl) is required")
+            values = _numeric(data, csv_path, column)
+            mean = float(values.mean())
+            sigma_within = _within_sigma(values, subgroup_size)
+            sigma_overall = float(values.std(ddof=1))
+
+            def indices(sigma):
+                upper = (usl - mean) / (3 * sigma) if usl is not None and sigma > 0 else None
+                lower = (mean - lsl) / (3 * sigma) if lsl is not None and sigma > 0 else None
+                spread = (usl - lsl) / (6 * sigma) if usl is not None and lsl is not None and sigma > 0 else None
+                sided = [v for v in (upper, lower) if v is not None]
+                return spread, (min(sided) if sided else None)
+
+            cp, cpk = indices(sigma_within)
+            pp, ppk = indices(sigma_overall)
+
+            def ppm(z):
+                return 1e6 * 0.5 * math.erfc(z / math.sqrt(2))
+
+            ppm_out = 0.0
+            if sigma_overall > 0:
+                if usl is not None:
+                    ppm_out += ppm((usl - mean) / sigma_overall)
+                if lsl is not None:
+                    ppm_out += ppm((mean - lsl) / sigma_overall)
+
+            return _result(
+                "process_capability",
+                n=len(values),
+                mean=mean,
+                sigma_within=sigma_within,
+                sigma_overall=sigma_overall,
+                cp=cp,
+                cpk=cpk,
+                pp=pp,
+                ppk=ppk,
+                sigma_level=3 * cpk + 1.5 if cpk is not None else None,
+                expected_ppm_out_of_spec=ppm_out,
+            )
+        except Exception as e:
+            return _error("process_capability", e)
+
+    def control_chart_limits(
+        self,
+        data: Optional[List[float]] = None,
+        chart: str = "imr",
+        subgroup_size: int = 5,
+        csv_path: Optional[str] = None,
+        column: Optional[str] = None,
+    ) -> str:
+        """Compute control limits for an I-MR or X-bar/R chart and flag points beyond the limits.
+
+        Args:
+            data (list of float, optional): The measurements, in production order.
+            chart (str): "imr" for individuals/moving range or "xbar_r" for subgrouped data.
+            subgroup_size (int): Subgroup size for X-bar/R charts (2 to 10).
+            csv_path (str, optional): Path to a CSV file to read the measurements from instead.
+            column (str, optional): CSV column holding the measurements.
+
+        Returns:
+            str: JSON string with center lines, control limits and out-of-control point indices.
+        """
+        try:
+            values = _numeric(data, csv_path, column)
+            chart = chart.lower().replace("-", "_").replace("/", "_")
+            if chart in ("imr", "i_mr", "individuals"):
+                moving_range = np.abs(np.diff(values))
+                center, mr_bar = values.mean(), moving_range.mean()
+                ucl, lcl = center + 2.66 * mr_bar, center - 2.66 * mr_bar
+                beyond = np.flatnonzero((values > ucl) | (values < lcl))
+                return _result(
+                    "control_chart_limits",
+                    chart="I-MR",
+                    individuals={"center": center, "ucl": ucl, "lcl": lcl},
+                    moving_range={"center": mr_bar, "ucl": D4[2] * mr_bar, "lcl": 0.0},
+                    out_of_control_points=beyond.tolist(),
+                )
+            if chart in ("xbar_r", "xbar", "x_bar_r"):
+                if subgroup_size not in A2:
+                    raise ValueError("subgroup_size must be between 2 and 10 for X-bar/R charts")
+                groups = _subgroups(values, subgroup_size)
+                means, ranges = groups.mean(axis=1), np.ptp(groups, axis=1)
+                x_bar_bar, r_bar = means.mean(), ranges.mean()
+                ucl, lcl = x_bar_bar + A2[subgroup_size] * r_bar, x_bar_bar - A2[subgroup_size] * r_bar
+                r_ucl, r_lcl = D4[subgroup_size] * r_bar, D3[subgroup_size] * r_bar
+                return _result(
+                    "control_chart_limits",
+                    chart="X-bar/R",
+                    subgroups=len(groups),
+                    xbar={"center": x_bar_bar, "ucl": ucl, "lcl": lcl},
+                    range={"center": r_bar, "ucl": r_ucl, "lcl": r_lcl},
+                    out_of_control_subgroups=np.flatnonzero((means > ucl) | (means < lcl)).tolist(),
+                    out_of_control_ranges=np.flatnonzero((ranges > r_ucl) | (ranges < r_lcl)).tolist(),
+                )
+            raise ValueError("chart must be 'imr' or 'xbar_r'")
+        except Exception as e:
+            return _error("control_chart_limits", e)
+
+    def t_test(
+        self,
+        sample_a: Optional[List[float]] = None,
+        sample_b: Optional[List[float]] = None,
+        mu: float = 0.0,
+        csv_path: Optional[str] = None,
+        value_column: Optional[str] = None,
+        group_column: Optional[str] = None,
+    ) -> str:
+        """Run a one-sample t-test (sample_a against mu) or a two-sample Welch t-test (sample_a vs sample_b).
+
+        Args:
+            sample_a (list of float, optional): First sample.
+            sample_b (list of float, optional): Second sample; omit for a one-sample test.
+            mu (float): Hypothesized mean for the one-sample test.
+            csv_path (str, optional): CSV file in long format with exactly two groups, instead of inline samples.
+            value_column (str, optional): CSV column holding the measurements.
+            group_column (str, optional): CSV column holding the group labels.
+
+        Returns:
+            str: JSON string with the t statistic, degrees of freedom and two-sided p-value.
+        """
+        try:
+            if csv_path:
+                groups = _grouped(None, csv_path, value_column, group_column)
+                if len(groups) != 2:
+                    raise ValueError(f"Expected exactly two groups, found {len(groups)}")
+                (label_a, a), (label_b, b) = groups
+            else:
+                if sample_b is not None and len(sample_b) == 0:
+                    raise ValueError("sample_b is empty; omit it for a one-sample test")
+                label_a, a = "sample_a", _numeric(sample_a)
+                label_b, b = "sample_b", (_numeric(sample_b) if sample_b is not None else None)
+            for label, sample in ((label_a, a), (label_b, b)):
+                if sample is not None and len(sample) < 2:
+                    raise ValueError(f"{label} needs at least two values")
+
+            if b is None:
+                se = a.std(ddof=1) / math.sqrt(len(a))
+                if se == 0:
+                    raise ValueError(f"{label_a} has no variation, so the t statistic is undefined")
+                t = (a.mean() - mu) / se
+                df = len(a) - 1
+                return _result(
+                    "t_test", test="one-sample", mean=a.mean(), mu=mu, t=t, df=df, p_value=t_sf_two_sided(t, df)
+                )
+
+            var_a, var_b = a.var(ddof=1) / len(a), b.var(ddof=1) / len(b)
+            if var_a + var_b == 0:
+                raise ValueError("Neither sample has any variation, so the t statistic is undefined")
+            t = (a.mean() - b.mean()) / math.sqrt(var_a + var_b)
+            df = (var_a + var_b) ** 2 / (var_a ** 2 / (len(a) - 1) + var_b ** 2 / (len(b) - 1))
+            return _result(
+                "t_test",
+                test="two-sample (Welch)",
+                means={label_a: a.mean(), label_b: b.mean()},
+                difference=a.mean() - b.mean(),
+                t=t,
+                df=df,
+                p_value=t_sf_two_sided(t, df),
+            )
+        except Exception as e:
+            return _error("t_test", e)
+
+    def anova(
+        self,
+        groups: Optional[List[List[float]]] = None,
+        csv_path: Optional[str] = None,
+        value_column: Optional[str] = None,
+        group_column: Optional[str] = None,
+    ) -> str:
+        """Run a one-way ANOVA across two or more groups.
+
+        Args:
+            groups (list of list of float, optional): One list of measurements per group.
+            csv_path (str, optional): CSV file in long format, instead of inline groups.
+            value_column (str, optional): CSV column holding the measurements.
+            group_column (str, optional): CSV column holding the group labels.
+
+        Returns:
+            str: JSON string with group means, sums of squares, the F statistic and p-value.
+        """
+        try:
+            labelled = _grouped(groups, csv_path, value_column, group_column)
+            if len(labelled) < 2:
+                raise ValueError("ANOVA needs at least two groups")
+            all_values = np.concatenate([g for _, g in labelled])
+            grand_mean = all_values.mean()
+            ss_between = sum(len(g) * (g.mean() - grand_mean) ** 2 for _, g in labelled)
+            ss_within = sum(((g - g.mean()) ** 2).sum() for _, g in labelled)
+            df_between, df_within = len(labelled) - 1, len(all_values) - len(labelled)
+            if df_within < 1:
+                raise ValueError("ANOVA needs more values than groups")
+            ms_between, ms_within = ss_between / df_between, ss_within / df_within
+            if ms_within == 0:
+                raise ValueError("No variation within the groups, so the F statistic is undefined")
+            f = ms_between / ms_within
+            return _result(
+                "anova",
+                group_means={label: g.mean() for label, g in labelled},
+                ss_between=ss_between,
+                ss_within=ss_within,
+                df_between=df_between,
+                df_within=df_within,
+                f=f,
+                p_value=f_sf(f, df_between, df_within),
+            )
+        except Exception as e:
+            return _error("anova", e)
+
+    def chi_square_test(self, observed: List[List[float]], expected: Optional[List[float]] = None) -> str:
+        """Run a chi-square test of independence on a contingency table, or goodness-of-fit on a single row.
+
+        Args:
+            observed (list of list of float): Observed counts; one inner list per row of the table.
+            expected (list of float, optional): Expected counts for a single-row goodness-of-fit test (uniform if omitted).
+
+        Returns:
+            str: JSON string with the chi-square statistic, degrees of freedom and p-value.
+        """
+        try:
+            table = np.asarray(observed, dtype=float)
+            if table.ndim == 1 or table.shape[0] == 1:
+                counts = table.ravel()
+                exp = np.asarray(expected, dtype=float) if expected else np.full(len(counts), counts.mean())
+                exp = exp * counts.sum() / exp.sum()
+                chi2 = float(((counts - exp) ** 2 / exp).sum())
+                df = len(counts) - 1
+                return _result(
+                    "chi_square_test", test="goodness-of-fit", chi2=chi2, df=df, p_value=chi2_sf(chi2, df),
+                    expected=exp.tolist(),
+                )
+            exp = np.outer(table.sum(axis=1), table.sum(axis=0)) / table.sum()
+            chi2 = float(((table - exp) ** 2 / exp).sum())
+            df = (table.shape[0] - 1) * (table.shape[1] - 1)
+            return _result(
+                "chi_square_test", test="independence", chi2=chi2, df=df, p_value=chi2_sf(chi2, df),
+                expected=exp.tolist(),
+            )
+        except Exception as e:
+            return _error("chi_square_test", e)
+
+    def pareto_analysis(
+        self,
+        categories: Optional[List[str]] = None,
+        counts: Optional[List[float]] = None,
+        csv_path: Optional[str] = None,
+        column: Optional[str] = None,
+    ) -> str:
+        """Rank defect categories by frequency with cumulative percentages and identify the vital few (top 80%).
+
+        Args:
+            categories (list of str, optional): Category labels; one entry per defect if counts is omitted.
+            counts (list of float, optional): Count for each category label.
+            csv_path (str, optional): CSV file with one defect per row, instead of inline categories.
+            column (str, optional): CSV column holding the category of each defect.
+
+        Returns:
+            str: JSON string of the Pareto table.
+        """
+        try:
+            if csv_path:
+                if not column:
+                    raise ValueError("A column name is required when reading from a CSV file")
+                categories, counts = load_csv_columns(csv_path, [column])[column], None
+            if not categories:
+                raise ValueError("No categories provided")
+            if counts is None:
+                labels, totals = np.unique(np.asarray(categories, dtype=str), return_counts=True)
+            else:
+                if len(counts) != len(categories):
+                    raise ValueError("categories and counts must have the same length")
+                labels, totals = np.asarray(categories, dtype=str), np.asarray(counts, dtype=float)
+
+            order = np.argsort(-totals, kind="stable")
+            labels, totals = labels[order], totals[order]
+            cumulative = np.cumsum(totals) / totals.sum() * 100
+            vital_few = int(np.searchsorted(cumulative, 80.0) + 1)
+            table = [
+                {"category": str(label), "count": total, "percent": total / totals.sum() * 100, "cumulative_percent": cum}
+                for label, total, cum in zip(labels, totals, cumulative)
+            ]
+            return _result(
+                "pareto_analysis", total=totals.sum(), table=table, vital_few=[str(l) for l in labels[:vital_few]]
+            )
+        except Exception as e:
+            return _error("pareto_analysis", e)
+
+    def summarize_measurement_file(
+        self,
+        csv_path: str,
+        column: str,
+        subgroup_size: int = 5,
+        lsl: Optional[float] = None,
+        usl: Optional[float] = None,
+    ) -> str:
+        """Summarize a large measurement CSV (millions of rows) in one streaming pass for SPC analysis.
+
+        Use this instead of the other functions when the file is too large to load at once.
+
+        Args:
+            csv_path (str): Path to the CSV file.
+            column (str): CSV column holding the measurements.
+            subgroup_size (int): Rational subgroup size for X-bar/R limits (1 for individuals only).
+            lsl (float, optional): Lower specification limit.
+            usl (float, optional): Upper specification limit.
+
+        Returns:
+            str: JSON string with running statistics, control limits, capability, histogram and run-rule hits.
+        """
+        try:
+            from spc_ingest import summarize_csv
+
+            summary = summarize_csv(csv_path, column, subgroup_size=subgroup_size, lsl=lsl, usl=usl)
+            return _result("summarize_measurement_file", **summary)
+        except Exception as e:
+            return _error("summarize_measurement_file", e)
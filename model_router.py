@@ -0,0 +1,153 @@
+"""
+Complexity-based routing between a small fast model and the main model
+"""
+
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Words that signal multi-step analysis or design work the small model should not attempt
+COMPLEX_KEYWORDS = (
+    "design", "plan", "planning", "project", "roadmap", "strategy", "analyze", "analyse", "analysis", "compare",
+    "evaluate", "implement", "root cause", "step by step", "step-by-step", "prioritize", "calculate", "hypothesis", "regression",
+    "anova", "capability", "control chart", "experiment", "doe", "fmea", "dmaic", "value stream", "business case",
+    "why", "should we", "recommend",
+)
+
+# Look-ups and definitions that a small model answers as well as a large one
+SIMPLE_PATTERNS = (
+    re.compile(r"^(what|who) (does|do|did|is|are|was) [\w\s\-/&]{1,40} (stand for|mean)\b"),
+    re.compile(r"^(define|definition of|meaning of|abbreviation|acronym)\b"),
+    re.compile(r"^what(?: is|'s| are) (an? |the )?[\w\-/&]+( [\w\-/&]+){0,2}$"),
+    re.compile(r"^(who (invented|created|developed)|when (was|did))\b"),
+)
+
+# Phrases that mark an answer the small model was not confident about
+HEDGES = (
+    "i don't know", "i do not know", "i'm not sure", "i am not sure", "not certain", "cannot answer",
+    "can't answer", "unable to answer", "unable to provide", "as an ai", "need more context", "need more information",
+)
+
+
+class ModelRouter:
+    def __init__(self, small_model, large_model, threshold=1.0, min_answer_chars=20, alpha=0.2):
+        """Send simple questions to a small model and everything else to the main model.
+
+        Args:
+            small_model: Fast model for short look-up style questions.
+            large_model: Main model, also used when a small-model answer fails the check.
+            threshold: Complexity score at or above which a question goes to the main model.
+            min_answer_chars: Shorter small-model answers are escalated.
+            alpha: Weight of the newest turn in the per-token timing averages.
+        """
+        self.small_model = small_model
+        self.large_model = large_model
+        self.threshold = threshold
+        self.min_answer_chars = min_answer_chars
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        # Seconds per prompt token and per generated token, by model
+        self.prompt_rate = {}
+        self.generation_rate = {}
+        self.counts = {"small": 0, "large": 0, "escalated": 0}
+        self.saved_seconds = 0.0
+
+    def score(self, message, has_context=False):
+        """Complexity score and the reasons behind it; higher means harder"""
+        text = " ".join(message.lower().split())
+        words = len(text.split())
+        reasons = []
+        score = words / 25
+        sentences = len([s for s in re.split(r"[.?!]+(?:\s|$)", text) if s.strip()])
+        if sentences > 1:
+            score += 0.5 * (sentences - 1)
+            reasons.append(f"{sentences} sentences")
+        keywords = [keyword for keyword in COMPLEX_KEYWORDS if re.search(rf"\b{re.escape(keyword)}\b", text)]
+        if keywords:
+            score += len(keywords)
+            reasons.append("keywords: " + ", ".join(keywords))
+        if len(re.findall(r"\d+(?:\.\d+)?", text)) >= 3:
+            score += 1
+            reasons.append("numeric data")
+        if has_context:
+            score += 0.5
+            reasons.append("follow-up")
+        if any(pattern.search(text.rstrip("?!. ")) for pattern in SIMPLE_PATTERNS):
+            score -= 1
+            reasons.append("look-up question")
+        return score, reasons
+
+    def choose(self, message, has_context=False):
+        """Model to run the question on"""
+        score, reasons = self.score(message, has_context)
+        model = self.small_model if score < self.threshold else self.large_model
+        logger.info("Routing to %s (score %.2f: %s)", model, score, "; ".join(reasons) or "short question")
+        return model
+
+    def accept(self, answer):
+        """Confidence and format check on a small-model answer; False means escalate"""
+        text = (answer or "").strip()
+        if len(text) < self.min_answer_chars or text.startswith("Error: "):
+            return False
+        lowered = text.lower()
+        return not any(hedge in lowered for hedge in HEDGES)
+
+    def estimate_seconds(self, model, prompt_tokens, output_tokens):
+        """Prompt-eval plus generation time the model would need for these token counts"""
+        with self._lock:
+            if model not in self.prompt_rate:
+                return None
+            return prompt_tokens * self.prompt_rate[model] + output_tokens * self.generation_rate[model]
+
+    def record(self, metrics):
+        """Update timing averages from a finished turn and fill in the latency it saved"""
+        if metrics.cached or metrics.model is None:
+            return
+        if metrics.prompt_tokens and metrics.output_tokens and metrics.generation_time:
+            with self._lock:
+                for rates, seconds, tokens in ((self.prompt_rate, metrics.prompt_eval_time, metrics.prompt_tokens),
+                                               (self.generation_rate, metrics.generation_time,
+                                                metrics.output_tokens)):
+                    rate = seconds / tokens
+                    previous = rates.get(metrics.model)
+                    rates[metrics.model] = rate if previous is None else previous + self.alpha * (rate - previous)
+
+        if metrics.escalated:
+            # The small model's attempt was wasted time
+            metrics.latency_saved = -(metrics.escalated_after or 0.0)
+            counted = "escalated"
+        elif metrics.model == self.small_model:
+            estimate = self.estimate_seconds(self.large_model, metrics.prompt_tokens, metrics.output_tokens)
+            if estimate is not None:
+                metrics.latency_saved = estimate - (metrics.prompt_eval_time + metrics.generation_time)
+            counted = "small"
+        else:
+            counted = "large"
+        # Server sessions finish turns on several threads at once
+        with self._lock:
+            self.counts[counted] += 1
+            if metrics.latency_saved is not None:
+                self.saved_seconds += metrics.latency_saved
+        logger.info("Turn on %s%s, latency saved %s", metrics.model, " after escalation" if metrics.escalated else "",
+                    "unknown" if metrics.latency_saved is None else f"{metrics.latency_saved:.2f}s")
+
+    def summary(self):
+        with self._lock:
+            counts, saved_seconds = dict(self.counts), self.saved_seconds
+        return (f"Model routing: {counts['small']} on {self.small_model}, {counts['large']} on "
+                f"{self.large_model}, {counts['escalated']} escalated, ~{saved_seconds:.1f}s saved")
+
+
+def model_router_from_env(large_model):
+    """Router configured in .env, or None when no small model is set.
+
+    OLLAMA_SMALL_MODEL names the fast model; MODEL_ROUTER_THRESHOLD sets the
+    complexity score at which questions go to the main model.
+    """
+    small_model = os.getenv("OLLAMA_SMALL_MODEL")
+    if not small_model or small_model == large_model:
+        return None
+    return ModelRouter(small_model, large_model, threshold=float(os.getenv("MODEL_ROUTER_THRESHOLD", 1.0)))
@@ -0,0 +1,185 @@
+"""
+Routing across several Ollama hosts with health checks, circuit breakers and least-loaded balancing
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from resilience import BackendUnavailable, CircuitBreaker, DeadlineExceeded, breaker_settings_from_env
+
+
+def ollama_base_urls():
+    """Ollama hosts from OLLAMA_BASE_URLS (comma-separated), falling back to OLLAMA_BASE_URL"""
+    urls = os.getenv("OLLAMA_BASE_URLS") or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    return [url.strip().rstrip("/") for url in urls.split(",") if url.strip()]
+
+
+class Backend:
+    def __init__(self, url, breaker):
+        self.url = url
+        self.healthy = True
+        self.breaker = breaker
+        self.inflight = 0
+        self.latency = None
+        self.requests = 0
+        self.failures = 0
+        self.last_checked = None
+
+    def as_dict(self):
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "circuit": self.breaker.state,
+            "inflight": self.inflight,
+            "latency": self.latency,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class OllamaRouter:
+    def __init__(self, base_urls, health_interval=15.0, timeout=5.0, max_failures=2, latency_alpha=0.3,
+                 cooldown=10.0):
+        """Send each request to the least-loaded healthy Ollama host.
+
+        Args:
+            base_urls: Ollama server URLs.
+            health_interval: Seconds between background health checks.
+            timeout: Seconds allowed for a health check.
+            max_failures: Consecutive request failures that open a host's circuit, taking it out of rotation.
+            latency_alpha: Weight of the newest sample in the latency moving average.
+            cooldown: Seconds before an open circuit lets one trial request through; doubles while trials fail.
+        """
+        if not base_urls:
+            raise ValueError("At least one Ollama base URL is required")
+        self.backends = [
+            Backend(url.rstrip("/"), CircuitBreaker(failure_threshold=max_failures, cooldown=cooldown))
+            for url in base_urls
+        ]
+        self.health_interval = health_interval
+        self.timeout = timeout
+        self.max_failures = max_failures
+        self.latency_alpha = latency_alpha
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check_health(self):
+        """Probe every backend's /api/tags and return how many are healthy"""
+        # Imported here so run_agent.py's quick commands do not pay for it
+        import requests
+
+        for backend in self.backends:
+            try:
+                response = requests.get(f"{backend.url}/api/tags", timeout=self.timeout)
+                healthy = response.ok
+            except requests.exceptions.RequestException:
+                healthy = False
+            with self._lock:
+                backend.healthy = healthy
+                backend.last_checked = time.time()
+        return sum(1 for backend in self.backends if backend.healthy)
+
+    def start(self):
+        """Run health checks periodically on a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._health_loop, name="ollama-health", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            self.check_health()
+
+    def acquire(self, exclude=None):
+        """Pick the least-loaded healthy backend whose circuit is closed and count the request against it.
+
+        With ``exclude`` (a URL) another host is picked, or None returned if there is
+        none. Otherwise raises BackendUnavailable when every host's circuit is open.
+        """
+        with self._lock:
+            usable = [b for b in self.backends if b.url != exclude and b.breaker.available()]
+            # Health checks can lag behind a recovered host, so unhealthy hosts are a last resort
+            candidates = [b for b in usable if b.healthy] or usable
+            if not candidates:
+                if exclude is not None:
+                    return None
+                raise BackendUnavailable("Every Ollama host is failing; their circuits are open")
+            # Unknown latency counts as the best observed so new hosts get traffic
+            known = [b.latency for b in candidates if b.latency is not None]
+            default_latency = min(known) if known else 1.0
+            backend = min(candidates, key=lambda b: ((b.inflight + 1) * (b.latency or default_latency), b.inflight))
+            backend.breaker.acquire()
+            backend.inflight += 1
+            backend.requests += 1
+            return backend
+
+    def release(self, backend, latency=None, failed=False):
+        """Return a backend after a request; requests that ended without an outcome pass neither flag"""
+        with self._lock:
+            backend.inflight -= 1
+            if failed:
+                backend.failures += 1
+                backend.breaker.record_failure()
+                return
+            if latency is None:
+                return
+            backend.breaker.record_success()
+            if backend.latency is None:
+                backend.latency = latency
+            else:
+                backend.latency += self.latency_alpha * (latency - backend.latency)
+
+    @contextmanager
+    def lease(self, model=None):
+        """Hold a backend for one request, pointing a phidata Ollama model at it if given"""
+        backend = self.acquire()
+        if model is not None:
+            model.host = backend.url
+        started = time.perf_counter()
+        try:
+            yield backend
+        except DeadlineExceeded:
+            # Out of turn time: says nothing about the backend
+            self.release(backend)
+            raise
+        except Exception:
+            self.release(backend, failed=True)
+            raise
+        except BaseException:
+            # Cancelled or abandoned by the caller: not the backend's fault
+            self.release(backend)
+            raise
+        self.release(backend, latency=time.perf_counter() - started)
+
+    def stats(self):
+        with self._lock:
+            return [backend.as_dict() for backend in self.backends]
+
+
+_shared_router = None
+_shared_router_lock = threading.Lock()
+
+
+def shared_router():
+    """Process-wide router over OLLAMA_BASE_URLS, or None when only one host is configured.
+
+    Sharing one router lets every agent in the process see the same in-flight counts.
+    """
+    global _shared_router
+    urls = ollama_base_urls()
+    if len(urls) < 2:
+        return None
+    with _shared_router_lock:
+        if _shared_router is None:
+            breaker = breaker_settings_from_env()
+            _shared_router = OllamaRouter(urls, health_interval=float(os.getenv("OLLAMA_HEALTH_INTERVAL", 15)),
+                                          max_failures=breaker["failure_threshold"], cooldown=breaker["cooldown"])
+            _shared_router.check_health()
+            _shared_router.start()
+        return _shared_router
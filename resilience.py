@@ -0,0 +1,464 @@
+"""
+Tail-latency controls for the agents: circuit breakers for Ollama hosts, hedged model requests
+and turn deadlines with a degraded answer when one is missed
+"""
+
+import asyncio
+import collections
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from agent_metrics import percentile
+
+
+class DeadlineExceeded(TimeoutError):
+    """A turn ran past its deadline; ``worker`` is the thread still finishing the abandoned run, if any"""
+
+    def __init__(self, message="Turn deadline passed", worker=None):
+        super().__init__(message)
+        self.worker = worker
+
+
+class BackendUnavailable(RuntimeError):
+    """Every Ollama host's circuit is open, so the request is not sent at all"""
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=3, cooldown=10.0, max_cooldown=120.0):
+        """Stop sending requests to a host after repeated failures, then probe it with one request.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit.
+            cooldown: Seconds the circuit stays open before a trial request is let through.
+            max_cooldown: Upper bound for the cooldown, which doubles every time a trial fails.
+        """
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+    def available(self):
+        """Whether a request could be sent now, without claiming the trial slot"""
+        with self._lock:
+            return self._available(time.monotonic())
+
+    def _available(self, now):
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return now - self._opened_at >= self.cooldown
+        # Half-open: one trial at a time; a trial nobody reported back on is given up after a cooldown
+        return self._trial_started is None or now - self._trial_started >= self.cooldown
+
+    def acquire(self):
+        """Claim the right to send a request; returns False while the circuit is open"""
+        now = time.monotonic()
+        with self._lock:
+            if not self._available(now):
+                return False
+            if self.state != self.CLOSED:
+                self.state = self.HALF_OPEN
+                self._trial_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self._trial_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                # The host is still failing: wait longer before the next trial
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            elif self.failures < self.failure_threshold:
+                return
+            self.state = self.OPEN
+            self.opened += 1
+            self._opened_at = time.monotonic()
+            self._trial_started = None
+
+    @contextmanager
+    def guard(self, host=None):
+        """Send one request through the breaker: refused while open, its outcome recorded"""
+        if not self.acquire():
+            raise BackendUnavailable(f"Ollama at {host or 'the configured host'} is failing; "
+                                     f"requests resume within {self.cooldown:g}s")
+        try:
+            yield
+        except DeadlineExceeded:
+            # Out of turn time (or cancelled): nothing learned about the host; a half-open trial expires
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+
+    def as_dict(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "opened": self.opened,
+                    "cooldown": self.cooldown}
+
+
+class LatencyWindow:
+    """The most recent latency samples, for percentiles that follow the current load"""
+
+    def __init__(self, size=200):
+        self._samples = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, q):
+        with self._lock:
+            samples = list(self._samples)
+        return percentile(samples, q)
+
+
+def _first(chunks):
+    """Start a stream and wait for its first chunk, which is what the hedge races on"""
+    iterator = iter(chunks)
+    return iterator, next(iterator, None)
+
+
+def _chain(first, iterator):
+    if first is not None:
+        yield first
+    yield from iterator
+
+
+class Hedger:
+    def __init__(self, router, percentile=95.0, min_samples=20, min_delay=0.05):
+        """Repeat a slow model request on a second Ollama host and use whichever answers first.
+
+        A request still unanswered after the ``percentile`` of recent response
+        times of its host is sent again to the least-loaded other host. Streams
+        race on their first chunk and the losing stream is closed, which stops its
+        generation; a losing non-streamed request is left to finish unread.
+
+        Args:
+            router: OllamaRouter whose other backends take the hedged requests.
+            percentile: Response-time percentile after which a request is hedged.
+            min_samples: Samples a host needs before its requests are hedged.
+            min_delay: Lower bound for the hedge delay in seconds.
+        """
+        self.router = router
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.counters = {"requests": 0, "hedged": 0, "hedge_won": 0}
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def _window(self, host, kind):
+        with self._lock:
+            window = self._windows.get((host, kind))
+            if window is None:
+                window = self._windows[(host, kind)] = LatencyWindow()
+            return window
+
+    def delay(self, host, kind):
+        """Seconds to wait for ``host`` before hedging, or None while there is too little history"""
+        window = self._window(host, kind)
+        if len(window) < self.min_samples:
+            return None
+        return max(self.min_delay, window.percentile(self.percentile))
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _timed(self, host, kind, request):
+        started = time.perf_counter()
+        result = request(host)
+        self._window(host, kind).add(time.perf_counter() - started)
+        return result
+
+    def call(self, host, request, stream=False):
+        """``request(host)`` with a hedge to another host; streams return a new iterator"""
+        kind = "stream" if stream else "call"
+        send = (lambda target: _first(request(target))) if stream else request
+        self._count("requests")
+        delay = self.delay(host, kind)
+        if delay is None or len(self.router.backends) < 2:
+            return self._finish(self._timed(host, kind, send), stream)
+
+        pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hedge")
+        try:
+            primary = pool.submit(self._timed, host, kind, send)
+            done, _ = wait([primary], timeout=delay)
+            if done:
+                return self._finish(primary.result(), stream)
+            backend = self.router.acquire(exclude=host)
+            if backend is None:
+                return self._finish(primary.result(), stream)
+            self._count("hedged")
+            started = time.perf_counter()
+            hedge = pool.submit(self._timed, backend.url, kind, send)
+            pending, winner = {primary, hedge}, None
+            while winner is None:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                # A failed request only loses if the other one can still answer
+                winner = next((future for future in done if future.exception() is None or not pending), None)
+            self._release(backend, hedge, winner, started)
+            if stream:
+                # Runs at once for a loser that has already answered
+                for loser in {primary, hedge} - {winner}:
+                    loser.add_done_callback(self._close_stream)
+            return self._finish(winner.result(), stream)
+        finally:
+            pool.shutdown(wait=False)
+
+    @staticmethod
+    def _close_stream(future):
+        if future.exception() is None:
+            iterator, _ = future.result()
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    @staticmethod
+    def _finish(result, stream):
+        return _chain(*reversed(result)) if stream else result
+
+    async def acall(self, host, request, stream=False):
+        """Asyncio counterpart of call; the losing request is cancelled, streamed or not"""
+        kind = "stream" if stream else "call"
+
+        async def send(target):
+            started = time.perf_counter()
+            if stream:
+                iterator = (await request(target)).__aiter__()
+                # Not anext(iterator, None): the builtin needs Python 3.10
+                try:
+                    first = await iterator.__anext__()
+                except StopAsyncIteration:
+                    first = None
+                result = (iterator, first)
+            else:
+                result = await request(target)
+            self._window(target, kind).add(time.perf_counter() - started)
+            return result
+
+        self._count("requests")
+        delay = self.delay(host, kind)
+        primary = asyncio.ensure_future(send(host))
+        backend = None
+        if delay is not None and len(self.router.backends) > 1:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if not done:
+                backend = self.router.acquire(exclude=host)
+        if backend is None:
+            return self._afinish(await primary, stream)
+
+        self._count("hedged")
+        started = time.perf_counter()
+        hedge = asyncio.ensure_future(send(backend.url))
+        pending, winner = {primary, hedge}, None
+        try:
+            while winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None or not pending), None)
+        finally:
+            for task in pending:
+                task.cancel()
+            self._release(backend, hedge, winner, started)
+        for loser in {primary, hedge} - {winner}:
+            if stream and loser.done() and not loser.cancelled() and loser.exception() is None:
+                await loser.result()[0].aclose()
+        return self._afinish(winner.result(), stream)
+
+    def _release(self, backend, hedge, winner, started):
+        """Return the second host to the router; only a hedge that ran to completion tells it anything"""
+        if winner is hedge and hedge.exception() is None:
+            self._count("hedge_won")
+            self.router.release(backend, latency=time.perf_counter() - started)
+        elif hedge.done() and not hedge.cancelled() and hedge.exception() is not None:
+            self.router.release(backend, failed=True)
+        else:
+            self.router.release(backend)
+
+    @staticmethod
+    def _afinish(result, stream):
+        if not stream:
+            return result
+        iterator, first = result
+
+        async def chained():
+            if first is not None:
+                yield first
+            async for chunk in iterator:
+                yield chunk
+
+        return chained()
+
+    def summary(self):
+        return (f"Hedging: {self.counters['hedged']} of {self.counters['requests']} request(s) hedged, "
+                f"{self.counters['hedge_won']} won by the second host")
+
+
+_shared_hedgers = {}
+_shared_lock = threading.Lock()
+
+
+def shared_hedger(router):
+    """Process-wide hedger over the router's hosts, or None when HEDGE_PERCENTILE is unset or there is one host.
+
+    HEDGE_PERCENTILE sets the response-time percentile after which a request is
+    repeated on a second host (e.g. 95); HEDGE_MIN_SAMPLES the history it needs.
+    """
+    percentile = float(os.getenv("HEDGE_PERCENTILE") or 0)
+    if not percentile or router is None or len(router.backends) < 2:
+        return None
+    with _shared_lock:
+        hedger = _shared_hedgers.get(id(router))
+        if hedger is None:
+            hedger = _shared_hedgers[id(router)] = Hedger(
+                router, percentile=percentile, min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", 20))
+            )
+        return hedger
+
+
+def breaker_settings_from_env():
+    """CircuitBreaker arguments: CIRCUIT_FAILURES failures in a row open it for CIRCUIT_COOLDOWN seconds"""
+    return {
+        "failure_threshold": int(os.getenv("CIRCUIT_FAILURES", 3)),
+        "cooldown": float(os.getenv("CIRCUIT_COOLDOWN", 10)),
+    }
+
+
+_shared_breakers = {}
+
+
+def shared_breaker(url):
+    """Process-wide circuit breaker for a single Ollama host (an OllamaRouter keeps its own per host)"""
+    with _shared_lock:
+        breaker = _shared_breakers.get(url)
+        if breaker is None:
+            breaker = _shared_breakers[url] = CircuitBreaker(**breaker_settings_from_env())
+        return breaker
+
+
+def turn_deadline_from_env():
+    """Seconds a turn may take (TURN_DEADLINE, default 300), or None when set to 0"""
+    return float(os.getenv("TURN_DEADLINE", 300)) or None
+
+
+_DONE = object()
+
+
+def iterate_with_deadline(chunks, deadline):
+    """Yield from a blocking iterator consumed on a worker thread, giving up at ``deadline`` (perf_counter).
+
+    Raises DeadlineExceeded, carrying the worker thread, when the next chunk does
+    not arrive in time; the worker then stops at its next chunk and closes the
+    iterator, so its run winds down instead of generating an answer nobody reads.
+    """
+    chunks = iter(chunks)
+    handoff = queue.Queue()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if stop.is_set():
+                    break
+                handoff.put((chunk, None))
+        except BaseException as e:
+            handoff.put((_DONE, e))
+        else:
+            handoff.put((_DONE, None))
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    worker = threading.Thread(target=produce, name="turn", daemon=True)
+    worker.start()
+    try:
+        while True:
+            try:
+                chunk, error = handoff.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                raise DeadlineExceeded(worker=worker) from None
+            if chunk is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield chunk
+    finally:
+        # Also when the caller stops reading early
+        stop.set()
+
+
+async def aiterate_with_deadline(chunks, deadline):
+    """Yield from an async iterator until ``deadline`` (perf_counter), then cancel it and raise DeadlineExceeded.
+
+    The iterator runs in its own task, so cancelling it at the deadline never
+    interrupts whatever the caller awaits between chunks.
+    """
+    handoff = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for chunk in chunks:
+                await handoff.put((chunk, None))
+        except Exception as e:
+            await handoff.put((_DONE, e))
+        else:
+            await handoff.put((_DONE, None))
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            try:
+                chunk, error = await asyncio.wait_for(handoff.get(), max(0.0, deadline - time.perf_counter()))
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded() from None
+            if chunk is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield chunk
+    finally:
+        producer.cancel()
+
+
+def call_with_deadline(function, deadline, *args):
+    """``function(*args)`` on a worker thread, raising DeadlineExceeded if it is still running at ``deadline``"""
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = function(*args)
+        except BaseException as e:
+            outcome["error"] = e
+
+    worker = threading.Thread(target=run, name="turn", daemon=True)
+    worker.start()
+    worker.join(max(0.0, deadline - time.perf_counter()))
+    if worker.is_alive():
+        raise DeadlineExceeded(worker=worker)
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
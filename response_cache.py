@@ -0,0 +1,200 @@
+"""
+Opt-in response cache for the Ollama agents.
+
+Entries are keyed on everything that shapes an answer: the model id, the full
+persona instructions, the registered tools and the normalized user message.
+Editing the persona or switching OLLAMA_MODEL therefore produces new keys, and
+the stale entries age out through the TTL and size limits.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_VERSION = 1
+
+
+def normalize_message(message):
+    """Collapse whitespace and case so trivially different phrasings share an entry"""
+    return " ".join(str(message).split()).casefold()
+
+
+def tool_signature(tools):
+    """Sorted list of toolkit/function names registered on an agent"""
+    names = []
+    for tool in tools or []:
+        functions = getattr(tool, "functions", None)
+        if functions:
+            names.extend(f"{tool.name}.{name}" for name in functions)
+        else:
+            names.append(getattr(tool, "name", None) or getattr(tool, "__name__", repr(tool)))
+    return sorted(names)
+
+
+def make_cache_key(model_id, instructions, tools, message, knowledge=None):
+    """Hash (model id, instructions, tool set, normalized message) into a cache key.
+
+    ``knowledge`` identifies the version of any documents whose excerpts go into the
+    prompt, so answers are not reused once those documents change.
+    """
+    fields = {
+        "version": CACHE_VERSION,
+        "model": model_id,
+        "instructions": list(instructions or []),
+        "tools": tool_signature(tools),
+        "message": normalize_message(message),
+    }
+    if knowledge is not None:
+        fields["knowledge"] = knowledge
+    payload = json.dumps(fields, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=None, ttl=7 * 24 * 3600, max_memory_entries=256, max_disk_entries=10000):
+        """In-memory LRU in front of an optional SQLite store.
+
+        Args:
+            path: SQLite file for persistence; None keeps the cache in memory only.
+            ttl: Seconds an entry stays valid.
+            max_memory_entries: Size of the in-process LRU.
+            max_disk_entries: Rows kept on disk; least recently used rows are evicted first.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+            self._db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    def get(self, key):
+        """Return the cached response for key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at >= now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] >= now:
+                    self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    return row[0]
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """Store a response under key"""
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, value, expires_at, now),
+                )
+                self._evict_disk()
+                self._db.commit()
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self):
+        """Hit/miss counters and current sizes"""
+        with self._lock:
+            disk_entries = None
+            if self._db is not None:
+                (disk_entries,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
+
+
+def cache_from_env():
+    """Build the cache configured in .env, or None when caching is not enabled.
+
+    RESPONSE_CACHE_PATH enables a persistent cache; RESPONSE_CACHE=memory enables
+    an in-process one. RESPONSE_CACHE_TTL and RESPONSE_CACHE_MAX_ENTRIES tune it.
+    """
+    path = os.getenv("RESPONSE_CACHE_PATH")
+    if not path and os.getenv("RESPONSE_CACHE", "").lower() not in ("1", "true", "memory"):
+        return None
+    return ResponseCache(
+        path=path or None,
+        ttl=float(os.getenv("RESPONSE_CACHE_TTL", 7 * 24 * 3600)),
+        max_disk_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 10000)),
+    )
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def shared_cache():
+    """Process-wide cache configured in .env, so every agent shares its hits and its SQLite connection"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = cache_from_env()
+        return _shared_cache
@@ -3,22 +3,68 @@
 Script to run the specialized Lean Six Sigma Black Belt AI Agent
 """
 
+import argparse
+import asyncio
 import sys
 import os
-import requests
+from batch_runner import run_batch, print_batch_summary
+from ollama_router import OllamaRouter, ollama_base_urls
+from session_store import print_sessions, session_store_from_env
 from lss_agent import create_lss_agent
 
 
-def check_ollama_connection():
-    """Check if Ollama is running and accessible"""
+def check_ollama_connection(base_urls=None):
+    """Check that at least one configured Ollama host is running and accessible"""
+    return OllamaRouter(base_urls or ollama_base_urls()).check_health() > 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--batch", metavar="IN_JSONL", help="Run prompts from a JSONL file instead of the interactive session")
+    parser.add_argument("--out", metavar="OUT_JSONL", help="Where batch results are appended (default: <input>.out.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Requests kept in flight during a batch (default: $OLLAMA_NUM_PARALLEL or 4)")
+    parser.add_argument("--no-warmup", action="store_true", help="Skip preloading the model at startup")
+    parser.add_argument("--resume", metavar="SESSION_ID", nargs="?", const="",
+                        help="Continue a saved session (default: the most recent one)")
+    parser.add_argument("--list-sessions", action="store_true", help="List saved sessions and exit")
+    return parser.parse_args()
+
+
+def run_batch_mode(args, agent_factory):
+    """Process a JSONL prompt file and append results, resuming any earlier run"""
+    out_path = args.out or os.path.splitext(args.batch)[0] + ".out.jsonl"
+    print(f"📦 Batch: {args.batch} -> {out_path}\n")
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
-        return True
-    except requests.exceptions.RequestException:
-        return False
+        summary = asyncio.run(run_batch(agent_factory, args.batch, out_path, concurrency=args.concurrency))
+    except KeyboardInterrupt:
+        print("\nBatch interrupted - rerun the same command to resume.")
+        sys.exit(1)
+    print_batch_summary(summary)
+
+
+def resume_session(agent, session_id):
+    """Load a saved session into the agent's memory and say where it left off"""
+    if agent.session_store is None:
+        print("⚠️ Session storage is off (SESSION_STORE=off); starting a new session")
+        return
+    session = agent.resume_session(session_id or None)
+    if session is None:
+        print(f"⚠️ No saved session {session_id or 'yet'}; starting a new one")
+        return
+    print(f"💾 Resumed session {session['session_id']}: {session['turns']} turn(s), "
+          f"last {len(session['tail'])} replayed{' plus summary' if session['summary'] else ''}")
+    if session["tail"]:
+        print(f"   Last question: {session['tail'][-1][0][:80]}")
 
 
 def main():
+    args = parse_args()
+    session_store = session_store_from_env()
+    if args.list_sessions:
+        print_sessions(session_store.list_sessions(agent="lss") if session_store is not None else [])
+        return
+
     print("Initializing Lean Six Sigma Black Belt Consultant...\n")
 
     # Check if Ollama is running
@@ -30,10 +76,23 @@ def main():
 
     print("✅ System ready - Connecting to LSS expertise base...")
 
+    if args.batch:
+        run_batch_mode(args, create_lss_agent)
+        return
+
     # Create and start the specialized agent
     try:
-        agent = create_lss_agent()
+        # phidata and the tools load in the background while the banner and prompt appear
+        agent = create_lss_agent(background=True)
+        agent.session_store = session_store
+        if args.resume is not None:
+            resume_session(agent, args.resume)
+        if not args.no_warmup:
+            print(f"🔥 Warming up {agent.model_name} in the background (keep_alive={agent.keep_alive})...")
+            agent.start_warmup()
         agent.start_interactive_session()
+        if agent.session_id is not None:
+            print(f"💾 Session saved - continue it with --resume {agent.session_id}")
     except KeyboardInterrupt:
         print("\nShutting down LSS consultant...")
     except Exception as e:
@@ -0,0 +1,180 @@
+"""
+Durable, append-only storage for interactive sessions.
+
+Every finished turn is one INSERT into a SQLite database in WAL mode, so a crash
+or Ctrl+C loses at most the turn in progress. Conversation summaries are
+appended the same way whenever memory folds old turns. Resuming reads the
+session's index row, its latest summary and the last few turns through their
+primary keys, so it takes the same time after ten turns as after ten thousand.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sessions ("
+    "id TEXT PRIMARY KEY, agent TEXT NOT NULL, model TEXT, title TEXT, "
+    "created_at REAL NOT NULL, updated_at REAL NOT NULL, turns INTEGER NOT NULL DEFAULT 0)",
+    "CREATE INDEX IF NOT EXISTS sessions_by_update ON sessions (agent, updated_at)",
+    "CREATE TABLE IF NOT EXISTS turns ("
+    "session_id TEXT NOT NULL, seq INTEGER NOT NULL, user TEXT NOT NULL, assistant TEXT NOT NULL, "
+    "prompt_tokens INTEGER, created_at REAL NOT NULL, PRIMARY KEY (session_id, seq)) WITHOUT ROWID",
+    # through_turn: the summary covers turns 1..through_turn
+    "CREATE TABLE IF NOT EXISTS summaries ("
+    "session_id TEXT NOT NULL, through_turn INTEGER NOT NULL, summary TEXT NOT NULL, "
+    "created_at REAL NOT NULL, PRIMARY KEY (session_id, through_turn)) WITHOUT ROWID",
+)
+
+TITLE_CHARS = 60
+
+
+class SessionStore:
+    def __init__(self, path):
+        """Open (or create) the session database at ``path``; thread-safe"""
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL appends each commit to the log instead of rewriting pages in place, and readers never block
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            self._db.execute(statement)
+        # Turns through which each session's stored summary reaches, to append only new summaries
+        self._summarized = {}
+
+    def create_session(self, agent, model=None):
+        """New session id; the session is listed once its first turn is stored"""
+        session_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT INTO sessions (id, agent, model, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                             (session_id, agent, model, now, now))
+        return session_id
+
+    def append_turn(self, session_id, user, assistant, prompt_tokens=None, summary=None, summary_turns=0):
+        """Store one finished turn, and the memory's summary if it now covers more turns; returns the turn number"""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                # UPDATE ... RETURNING needs SQLite 3.35, newer than many Python builds ship with
+                self._db.execute(
+                    "UPDATE sessions SET turns = turns + 1, updated_at = ?, title = COALESCE(title, ?) WHERE id = ?",
+                    (now, " ".join(user.split())[:TITLE_CHARS], session_id),
+                )
+                (seq,) = self._db.execute("SELECT turns FROM sessions WHERE id = ?", (session_id,)).fetchone()
+                self._db.execute(
+                    "INSERT INTO turns (session_id, seq, user, assistant, prompt_tokens, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (session_id, seq, user, assistant, prompt_tokens, now),
+                )
+                if summary and summary_turns > self._summarized.get(session_id, 0):
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO summaries (session_id, through_turn, summary, created_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        (session_id, summary_turns, summary, now),
+                    )
+                    self._summarized[session_id] = summary_turns
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return seq
+
+    def resolve(self, session_id=None, agent=None):
+        """Full id for an id or unique id prefix; None picks the agent's most recent session.
+
+        With an ``agent``, a prefix only matches that agent's sessions.
+        """
+        with self._lock:
+            if session_id is None:
+                row = self._db.execute(
+                    "SELECT id FROM sessions WHERE agent = ? AND turns > 0 ORDER BY updated_at DESC LIMIT 1",
+                    (agent,),
+                ).fetchone()
+                return row[0] if row else None
+            # Ids are hex, so every id starting with the prefix sorts below prefix + "g"
+            query = "SELECT id FROM sessions WHERE id >= ? AND id < ?"
+            params = (session_id, session_id + "g")
+            if agent is not None:
+                # Another persona's session would be replayed under the wrong instructions and tools
+                query += " AND agent = ?"
+                params += (agent,)
+            rows = self._db.execute(query + " LIMIT 2", params).fetchall()
+        return rows[0][0] if len(rows) == 1 else None
+
+    def list_sessions(self, agent=None, limit=20):
+        """Most recently used sessions with at least one turn, newest first"""
+        query = "SELECT id, agent, model, title, created_at, updated_at, turns FROM sessions WHERE turns > 0"
+        params = ()
+        if agent is not None:
+            query += " AND agent = ?"
+            params = (agent,)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY updated_at DESC LIMIT ?", params + (limit,)).fetchall()
+        keys = ("session_id", "agent", "model", "title", "created_at", "updated_at", "turns")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def resume(self, session_id, tail_turns=6):
+        """What a session's memory needs to continue: its latest summary and up to ``tail_turns`` later turns.
+
+        Returns None for an unknown session.
+        """
+        with self._lock:
+            session = self._db.execute("SELECT agent, model, title, turns FROM sessions WHERE id = ?",
+                                       (session_id,)).fetchone()
+            if session is None:
+                return None
+            row = self._db.execute(
+                "SELECT through_turn, summary FROM summaries WHERE session_id = ? "
+                "ORDER BY through_turn DESC LIMIT 1",
+                (session_id,),
+            ).fetchone()
+            summary_turns, summary = row if row else (0, "")
+            tail = self._db.execute(
+                "SELECT user, assistant FROM turns WHERE session_id = ? AND seq > ? ORDER BY seq DESC LIMIT ?",
+                (session_id, summary_turns, tail_turns),
+            ).fetchall()
+            self._summarized[session_id] = summary_turns
+        agent, model, title, turns = session
+        return {
+            "session_id": session_id,
+            "agent": agent,
+            "model": model,
+            "title": title,
+            "turns": turns,
+            "summary": summary,
+            # Turns between the summary and the tail (when memory had not folded them yet) are not replayed
+            "summary_turns": turns - len(tail),
+            "tail": list(reversed(tail)),
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def print_sessions(sessions):
+    """Print stored sessions as listed by SessionStore.list_sessions"""
+    if not sessions:
+        print("No saved sessions yet.")
+        return
+    print("=== Saved Sessions ===")
+    for session in sessions:
+        updated = time.strftime("%Y-%m-%d %H:%M", time.localtime(session["updated_at"]))
+        print(f"{session['session_id']}  {updated}  {session['turns']:>4} turn(s)  {session['title'] or ''}")
+
+
+def session_store_from_env():
+    """Session store configured in .env, or None when disabled.
+
+    SESSION_STORE_PATH sets the database file; SESSION_STORE=off turns storage off.
+    """
+    if os.getenv("SESSION_STORE", "on").lower() in ("0", "off", "false", "no"):
+        return None
+    return SessionStore(os.getenv("SESSION_STORE_PATH", os.path.join(".cache", "sessions.sqlite3")))
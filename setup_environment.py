@@ -1,125 +1,308 @@
+#!/usr/bin/env python3
+"""
+Check and prepare the environment for the agents: Python, virtual environment, packages, the
+Ollama service and its models. Independent checks run in parallel and steps whose inputs have
+not changed since the last successful run are skipped, so repeat runs take seconds
+"""
+
+import argparse
+import hashlib
+import importlib.metadata
+import json
+import os
+import re
+import shutil
 import subprocess
 import sys
-import os
-import requests
+import threading
 import time
-from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
+import requests
 
-def run_command(command, check=True):
-    """Run a command and return the result"""
-    try:
-        result = subprocess.run(command, shell=True, capture_output=True, text=True, check=check)
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        print(f"Error running command '{command}': {e}")
-        return None
+STATE_PATH = os.path.join(".cache", "setup_state.json")
 
 
-def check_python():
-    """Check if Python is installed"""
-    try:
-        version = run_command("python --version")
-        print(f"✓ Python found: {version}")
-        return True
-    except:
-        print("✗ Python not found. Please install Python 3.8+")
-        return False
+class SetupState:
+    def __init__(self, path=STATE_PATH, force=False):
+        """Fingerprints of the steps that succeeded, kept between runs.
 
+        Args:
+            path: JSON file holding them.
+            force: Ignore what was stored, so every step runs again.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {}
+        if not force and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                self._data = {}
 
-def check_ollama():
-    """Check if Ollama is installed and running"""
-    try:
-        # Check if Ollama is installed
-        version = run_command("ollama --version")
-        print(f"✓ Ollama found: {version}")
-
-        # Check if Ollama service is running
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
-        print("✓ Ollama service is running")
-        return True
-    except requests.exceptions.RequestException:
-        print("✗ Ollama service not running. Starting Ollama...")
-        # Try to start Ollama
-        subprocess.Popen(["ollama", "serve"], creationflags=subprocess.CREATE_NEW_CONSOLE)
-        time.sleep(5)
-        try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=5)
-            print("✓ Ollama service started successfully")
-            return True
-        except:
-            print("✗ Failed to start Ollama service")
-            return False
-    except:
-        print("✗ Ollama not found. Please install Ollama from https://ollama.ai")
-        return False
+    def unchanged(self, key, fingerprint):
+        with self._lock:
+            return self._data.get(key) == fingerprint
+
+    def record(self, key, fingerprint):
+        with self._lock:
+            self._data[key] = fingerprint
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, indent=2)
+
+
+def check_python():
+    """Check the Python version running this script"""
+    if sys.version_info < (3, 8):
+        return False, f"Python {sys.version.split()[0]} found. Please install Python 3.8+"
+    return True, f"Python {sys.version.split()[0]}"
 
 
 def check_virtual_environment():
     """Check if we're in a virtual environment"""
     if hasattr(sys, 'real_prefix') or (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix):
-        print("✓ Virtual environment is active")
-        return True
-    else:
-        print("✗ Virtual environment not active")
-        return False
+        return True, f"Virtual environment active ({sys.prefix})"
+    return False, "Virtual environment not active"
 
 
-def install_requirements():
-    """Install required packages"""
-    print("Installing required packages...")
-    try:
-        run_command("pip install -r requirements.txt")
-        print("✓ Requirements installed successfully")
-        return True
-    except:
-        print("✗ Failed to install requirements")
-        return False
+def _requirement_names(path):
+    names = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            match = re.match(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)", line.split("#")[0])
+            if match:
+                names.append(match.group(1))
+    return names
+
+
+def install_requirements(state, path="requirements.txt"):
+    """Install required packages unless requirements.txt is unchanged and they are all still installed"""
+    with open(path, "rb") as f:
+        # The interpreter is part of the fingerprint: a new virtual environment needs its own install
+        fingerprint = hashlib.sha256(f.read() + sys.executable.encode() + sys.version.encode()).hexdigest()
+    missing = []
+    for name in _requirement_names(path):
+        try:
+            importlib.metadata.version(name)
+        except importlib.metadata.PackageNotFoundError:
+            missing.append(name)
+    if not missing and state.unchanged("requirements", fingerprint):
+        return True, f"Requirements unchanged ({path})"
+
+    result = subprocess.run([sys.executable, "-m", "pip", "install", "-r", path], capture_output=True, text=True)
+    if result.returncode != 0:
+        return False, f"Failed to install requirements: {(result.stderr or result.stdout).strip()[-500:]}"
+    state.record("requirements", fingerprint)
+    return True, f"Requirements installed ({path})"
+
+
+def wait_until_ready(base_url, timeout=30.0, interval=0.2):
+    """Poll Ollama's /api/version until it answers; returns the version, or None after ``timeout`` seconds"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            response = requests.get(f"{base_url}/api/version", timeout=2)
+            if response.ok:
+                return response.json().get("version", "unknown")
+        except (requests.exceptions.RequestException, ValueError):
+            pass
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(interval)
+
+
+def check_ollama(base_url, start_timeout=30.0):
+    """Check that the Ollama service answers, starting it if it is installed here but not running"""
+    version = wait_until_ready(base_url, timeout=0)
+    if version is not None:
+        return True, f"Ollama {version} running at {base_url}"
+    if shutil.which("ollama") is None:
+        return False, "Ollama not found. Please install Ollama from https://ollama.ai"
+
+    print(f"  Ollama not running at {base_url}. Starting Ollama...")
+    # A console of its own on Windows, so closing this one does not stop the service
+    flags = {"creationflags": subprocess.CREATE_NEW_CONSOLE} if os.name == "nt" else {"start_new_session": True}
+    subprocess.Popen(["ollama", "serve"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **flags)
+    started = time.monotonic()
+    version = wait_until_ready(base_url, timeout=start_timeout)
+    if version is None:
+        return False, f"Failed to start Ollama service within {start_timeout:g}s"
+    return True, f"Ollama {version} started in {time.monotonic() - started:.1f}s"
+
+
+def _local_models(base_url):
+    """Digest of every model the Ollama host has, by name"""
+    response = requests.get(f"{base_url}/api/tags", timeout=10)
+    response.raise_for_status()
+    models = {}
+    for model in response.json().get("models", []):
+        name = model.get("name") or model.get("model")
+        models[name] = model.get("digest")
+        if name.endswith(":latest"):
+            models[name[:-len(":latest")]] = model.get("digest")
+    return models
+
+
+def pull_model(base_url, model_name, attempts=3, progress_step=10):
+    """Pull a model through Ollama's streaming /api/pull, printing progress.
+
+    Ollama keeps the layers a broken pull already downloaded, so a retry resumes
+    where it stopped instead of starting over.
+    """
+    for attempt in range(1, attempts + 1):
+        reported = {}
+        try:
+            with requests.post(f"{base_url}/api/pull", json={"model": model_name, "stream": True}, stream=True,
+                               timeout=(10, 300)) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    update = json.loads(line)
+                    if update.get("error"):
+                        raise RuntimeError(update["error"])
+                    if update.get("status") == "success":
+                        return
+                    total, completed = update.get("total"), update.get("completed")
+                    if not total or completed is None:
+                        continue
+                    # One line per progress_step percent of each layer, readable when several models pull at once
+                    percent = int(completed * 100 / total) // progress_step * progress_step
+                    layer = (update.get("digest") or "")[-12:]
+                    if reported.get(layer) != percent:
+                        reported[layer] = percent
+                        print(f"  {model_name}: {update.get('status', 'pulling')} {percent}% of {total / 1e6:.0f} MB")
+            problem = "stream ended before Ollama reported success"
+        except requests.exceptions.RequestException as e:
+            problem = str(e)
+        if attempt == attempts:
+            raise RuntimeError(f"pull failed after {attempts} attempts: {problem}")
+        print(f"  {model_name}: pull interrupted ({problem}), resuming...")
+        time.sleep(attempt)
 
 
-def check_ollama_model(model_name="llama2"):
-    """Check if the specified model is available"""
+def check_ollama_model(state, base_url, model_name):
+    """Check if the specified model is available, pulling it if not"""
     try:
-        models = run_command("ollama list")
-        if model_name in models:
-            print(f"✓ Model '{model_name}' is available")
-            return True
-        else:
-            print(f"Model '{model_name}' not found. Pulling model...")
-            run_command(f"ollama pull {model_name}")
-            print(f"✓ Model '{model_name}' pulled successfully")
-            return True
-    except:
-        print(f"✗ Failed to check/pull model '{model_name}'")
-        return False
+        models = _local_models(base_url)
+        digest = models.get(model_name)
+        if digest is not None:
+            if state.unchanged(f"model:{model_name}", digest):
+                return True, f"Model '{model_name}' unchanged"
+            state.record(f"model:{model_name}", digest)
+            return True, f"Model '{model_name}' is available"
+
+        started = time.monotonic()
+        print(f"  Model '{model_name}' not found. Pulling model...")
+        pull_model(base_url, model_name)
+        digest = _local_models(base_url).get(model_name)
+        if digest is not None:
+            state.record(f"model:{model_name}", digest)
+        return True, f"Model '{model_name}' pulled in {time.monotonic() - started:.0f}s"
+    except (requests.exceptions.RequestException, RuntimeError, ValueError) as e:
+        return False, f"Failed to check/pull model '{model_name}': {e}"
+
+
+def models_from_env():
+    """Every model the agents use: OLLAMA_MODEL, the small routing model and the knowledge-base embedder"""
+    models = [os.getenv("OLLAMA_MODEL", "llama3.1")]
+    if os.getenv("OLLAMA_SMALL_MODEL"):
+        models.append(os.getenv("OLLAMA_SMALL_MODEL"))
+    if os.getenv("LSS_KB_DIR"):
+        models.append(os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text"))
+    return list(dict.fromkeys(models))
+
+
+def run_checks(checks, workers=8):
+    """Run (name, function, dependencies) checks in parallel, each once the checks it depends on pass.
+
+    Returns {name: (passed, message)}; a check whose dependency failed is not run.
+    """
+    results = {}
+    waiting = list(checks)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="setup-check") as pool:
+        running = {}
+        while waiting or running:
+            for check in list(waiting):
+                name, function, depends = check
+                if any(dependency not in results for dependency in depends):
+                    continue
+                waiting.remove(check)
+                failed = [dependency for dependency in depends if not results[dependency][0]]
+                if failed:
+                    results[name] = (False, f"Skipped: {', '.join(failed)} failed")
+                else:
+                    running[pool.submit(function)] = name
+            if not running:
+                # Only checks depending on names that are not in the list are left
+                for name, _, depends in waiting:
+                    results[name] = (False, f"Unknown dependency: {', '.join(d for d in depends if d not in results)}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    results[name] = (False, f"{type(e).__name__}: {e}")
+                passed, message = results[name]
+                print(f"{'✓' if passed else '✗'} {name}: {message}")
+    return results
 
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--force", action="store_true", help="Run every step again, ignoring the saved state")
+    parser.add_argument("--requirements", default="requirements.txt")
+    parser.add_argument("--state", default=STATE_PATH, help="Where step fingerprints are kept between runs")
+    parser.add_argument("--start-timeout", type=float, default=30.0,
+                        help="Seconds to wait for a freshly started Ollama service")
+    args = parser.parse_args()
+
+    try:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+    except ImportError:
+        # Installed by the requirements step; the defaults apply until then
+        pass
+    base_url = (os.getenv("OLLAMA_BASE_URLS") or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"))
+    base_url = base_url.split(",")[0].strip().rstrip("/")
+
     print("=== PhiData + Ollama Environment Setup ===\n")
+    started = time.monotonic()
+    state = SetupState(args.state, force=args.force)
 
     checks = [
-        ("Python Installation", check_python),
-        ("Ollama Installation & Service", check_ollama),
-        ("Virtual Environment", check_virtual_environment),
-        ("Package Installation", install_requirements),
-        ("Ollama Model", lambda: check_ollama_model("llama2")),
+        ("Python Installation", check_python, ()),
+        ("Virtual Environment", check_virtual_environment, ()),
+        ("Package Installation", lambda: install_requirements(state, args.requirements), ()),
+        ("Ollama Installation & Service", lambda: check_ollama(base_url, args.start_timeout), ()),
     ]
+    for model_name in models_from_env():
+        checks.append((f"Ollama Model {model_name}", lambda m=model_name: check_ollama_model(state, base_url, m),
+                       ("Ollama Installation & Service",)))
+    results = run_checks(checks)
+    state.save()
 
-    all_passed = True
-    for check_name, check_func in checks:
-        print(f"\nChecking {check_name}...")
-        if not check_func():
-            all_passed = False
-
-    print("\n=== Setup Summary ===")
+    all_passed = all(passed for passed, _ in results.values())
+    print(f"\n=== Setup Summary ({time.monotonic() - started:.1f}s) ===")
     if all_passed:
         print("✓ All checks passed! Environment is ready.")
         print("\nYou can now run: python run_agent.py")
     else:
+        for name, _, _ in checks:
+            if not results[name][0]:
+                print(f"✗ {name}: {results[name][1]}")
         print("✗ Some checks failed. Please resolve the issues above.")
 
     return all_passed
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,325 @@
+"""
+Streaming ingestion of large measurement CSVs for SPC analysis.
+
+Files are memory-mapped and parsed in fixed-size chunks, and every statistic is
+accumulated incrementally (Welford/Chan mean and variance, subgroup ranges,
+moving ranges, histogram bins and run-rule counters). Memory stays bounded by
+the chunk size no matter how many rows the file holds, and the agent receives
+a compact summary instead of raw rows.
+"""
+
+import math
+import mmap
+import os
+import time
+import warnings
+
+import numpy as np
+
+from lss_stats import A2, D2, D3, D4
+
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def _split_row(line, delimiter):
+    return [field.strip().strip('"') for field in line.split(delimiter)]
+
+
+def iter_csv_column_chunks(csv_path, column, chunk_bytes=DEFAULT_CHUNK_BYTES, delimiter=","):
+    """Yield float arrays holding successive chunks of one CSV column.
+
+    Numeric-only files take a vectorized fast path; files with text columns
+    (timestamps, line ids) fall back to splitting each line in the chunk.
+    Blank or non-numeric cells in the requested column are skipped.
+    """
+    with open(csv_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header_end = mm.find(b"\n")
+            if header_end == -1:
+                return
+            header = _split_row(mm[:header_end].decode("utf-8-sig").rstrip("\r"), delimiter)
+            if column not in header:
+                raise ValueError(f"Column '{column}' not found in {csv_path}; available: {header}")
+            index, width = header.index(column), len(header)
+            sep = delimiter.encode()
+
+            pos, size = header_end + 1, len(mm)
+            while pos < size:
+                end = min(pos + chunk_bytes, size)
+                if end < size:
+                    cut = mm.rfind(b"\n", pos, end)
+                    end = cut + 1 if cut != -1 else (mm.find(b"\n", end) + 1 or size)
+                block = mm[pos:end].replace(b"\r", b"")
+                pos = end
+
+                lines = block.count(b"\n") + (0 if block.endswith(b"\n") else 1)
+                table = _parse_numeric_block(block, delimiter, lines, width)
+                if table is not None:
+                    yield table[:, index]
+                    continue
+
+                parsed = []
+                for line in block.split(b"\n"):
+                    fields = line.split(sep)
+                    if len(fields) <= index:
+                        continue
+                    try:
+                        parsed.append(float(fields[index].strip(b' "')))
+                    except ValueError:
+                        continue
+                yield np.asarray(parsed, dtype=float)
+
+
+def _parse_numeric_block(block, delimiter, lines, width):
+    """Vectorized parse of an all-numeric block; None when the block has text or gaps"""
+    if not block.strip():
+        return None
+    with warnings.catch_warnings():
+        # Partial parses are reported as a DeprecationWarning (or ValueError on newer NumPy)
+        warnings.simplefilter("ignore", DeprecationWarning)
+        try:
+            values = np.fromstring(block.replace(b"\n", delimiter.encode()), sep=delimiter)
+        except ValueError:
+            return None
+    if values.size != lines * width:
+        return None
+    return values.reshape(lines, width)
+
+
+def _run_lengths(flags, carry):
+    """Length of the run of True values ending at each position, continuing a run of ``carry``"""
+    idx = np.arange(len(flags))
+    last_reset = np.maximum.accumulate(np.where(~flags, idx, -1))
+    lengths = idx - last_reset
+    return np.where(last_reset == -1, lengths + carry, lengths)
+
+
+class SPCAccumulator:
+    """
+    One-pass accumulator for SPC statistics over a stream of measurement chunks.
+
+    Control limits for the run rules come from the first ``baseline_rows``
+    points (a phase I baseline); every point, baseline included, is then checked
+    against them.
+    """
+
+    def __init__(self, subgroup_size=5, lsl=None, usl=None, bins=30, baseline_rows=1000):
+        if subgroup_size != 1 and subgroup_size not in D2:
+            raise ValueError("subgroup_size must be 1 or between 2 and 10")
+        self.subgroup_size = subgroup_size
+        self.lsl = lsl
+        self.usl = usl
+        self.bins = bins
+        self.baseline_rows = baseline_rows
+
+        # Welford/Chan running moments
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+        # Moving ranges for individuals
+        self.last_value = None
+        self.mr_sum = 0.0
+        self.mr_count = 0
+
+        # Subgroup ranges and means; incomplete subgroups carry into the next chunk
+        self.pending = np.empty(0)
+        self.range_sum = 0.0
+        self.subgroup_mean_sum = 0.0
+        self.subgroups = 0
+
+        # Phase I baseline, histogram and run rules
+        self.baseline = np.empty(0)
+        self.center = None
+        self.sigma = None
+        self.edges = None
+        self.hist = None
+        self.underflow = 0
+        self.overflow = 0
+        self.rule_hits = {"beyond_3_sigma": 0, "nine_same_side": 0, "six_trending": 0}
+        self.runs = {"above": 0, "below": 0, "up": 0, "down": 0}
+        self.last_checked = None
+        self.waiting = []
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+
+        self._update_moments(values)
+        self._update_moving_range(values)
+        self._update_subgroups(values)
+
+        if self.center is None:
+            self.waiting.append(values)
+            self.baseline = np.concatenate([self.baseline, values[: self.baseline_rows - len(self.baseline)]])
+            if len(self.baseline) < self.baseline_rows:
+                return
+            self._establish_baseline()
+            waiting, self.waiting = self.waiting, []
+            for chunk in waiting:
+                self._check(chunk)
+            return
+        self._check(values)
+
+    def _update_moments(self, values):
+        n_b = values.size
+        mean_b = float(values.mean())
+        m2_b = float(((values - mean_b) ** 2).sum())
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * self.n * n_b / n
+        self.n = n
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def _update_moving_range(self, values):
+        series = values if self.last_value is None else np.concatenate([[self.last_value], values])
+        if series.size > 1:
+            self.mr_sum += float(np.abs(np.diff(series)).sum())
+            self.mr_count += series.size - 1
+        self.last_value = float(values[-1])
+
+    def _update_subgroups(self, values):
+        if self.subgroup_size == 1:
+            return
+        series = np.concatenate([self.pending, values])
+        usable = series.size - series.size % self.subgroup_size
+        if usable:
+            groups = series[:usable].reshape(-1, self.subgroup_size)
+            self.range_sum += float(np.ptp(groups, axis=1).sum())
+            self.subgroup_mean_sum += float(groups.mean(axis=1).sum())
+            self.subgroups += groups.shape[0]
+        self.pending = series[usable:]
+
+    def _establish_baseline(self):
+        baseline = self.baseline
+        self.center = float(baseline.mean())
+        mr = np.abs(np.diff(baseline))
+        self.sigma = float(mr.mean() / D2[2]) if mr.size and mr.mean() > 0 else float(baseline.std()) or 1.0
+        low, high = self.center - 4 * self.sigma, self.center + 4 * self.sigma
+        if self.lsl is not None:
+            low = min(low, self.lsl)
+        if self.usl is not None:
+            high = max(high, self.usl)
+        self.edges = np.linspace(low, high, self.bins + 1)
+        self.hist = np.zeros(self.bins, dtype=np.int64)
+        self.baseline = np.empty(0)
+
+    def _check(self, values):
+        counts, _ = np.histogram(values, bins=self.edges)
+        self.hist += counts
+        self.underflow += int((values < self.edges[0]).sum())
+        self.overflow += int((values > self.edges[-1]).sum())
+
+        self.rule_hits["beyond_3_sigma"] += int((np.abs(values - self.center) > 3 * self.sigma).sum())
+
+        for side, flags in (("above", values > self.center), ("below", values < self.center)):
+            lengths = _run_lengths(flags, self.runs[side])
+            self.rule_hits["nine_same_side"] += int((lengths >= 9).sum())
+            self.runs[side] = int(lengths[-1])
+
+        series = values if self.last_checked is None else np.concatenate([[self.last_checked], values])
+        steps = np.diff(series)
+        for direction, flags in (("up", steps > 0), ("down", steps < 0)):
+            if flags.size == 0:
+                continue
+            lengths = _run_lengths(flags, self.runs[direction])
+            # A run of 5 consecutive increases spans 6 points
+            self.rule_hits["six_trending"] += int((lengths >= 5).sum())
+            self.runs[direction] = int(lengths[-1])
+        self.last_checked = float(values[-1])
+
+    def summary(self):
+        """Compact, JSON-serializable summary of everything accumulated so far"""
+        if self.n == 0:
+            return {"rows": 0}
+        if self.center is None and self.waiting:
+            # Fewer rows than the baseline size: use them all as the baseline
+            self.baseline_rows = len(self.baseline)
+            self._establish_baseline()
+            waiting, self.waiting = self.waiting, []
+            for chunk in waiting:
+                self._check(chunk)
+
+        std_dev = math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+        mr_bar = self.mr_sum / self.mr_count if self.mr_count else 0.0
+        summary = {
+            "rows": self.n,
+            "mean": self.mean,
+            "std_dev": std_dev,
+            "min": self.min,
+            "max": self.max,
+            "imr_limits": {
+                "center": self.mean,
+                "ucl": self.mean + 2.66 * mr_bar,
+                "lcl": self.mean - 2.66 * mr_bar,
+                "mr_bar": mr_bar,
+                "mr_ucl": D4[2] * mr_bar,
+            },
+            "baseline": {"rows": self.baseline_rows, "center": self.center, "sigma": self.sigma},
+            "rule_hits": dict(self.rule_hits),
+            "histogram": {
+                "edges": self.edges.tolist(),
+                "counts": self.hist.tolist(),
+                "underflow": self.underflow,
+                "overflow": self.overflow,
+            },
+        }
+
+        sigma_within = mr_bar / D2[2] if mr_bar else std_dev
+        if self.subgroups:
+            r_bar = self.range_sum / self.subgroups
+            x_bar_bar = self.subgroup_mean_sum / self.subgroups
+            n = self.subgroup_size
+            sigma_within = r_bar / D2[n]
+            summary["xbar_r_limits"] = {
+                "subgroup_size": n,
+                "subgroups": self.subgroups,
+                "xbar_center": x_bar_bar,
+                "xbar_ucl": x_bar_bar + A2[n] * r_bar,
+                "xbar_lcl": x_bar_bar - A2[n] * r_bar,
+                "r_bar": r_bar,
+                "r_ucl": D4[n] * r_bar,
+                "r_lcl": D3[n] * r_bar,
+            }
+        summary["sigma_within"] = sigma_within
+
+        if self.lsl is not None or self.usl is not None:
+            capability = {"lsl": self.lsl, "usl": self.usl}
+            for label, sigma in (("within", sigma_within), ("overall", std_dev)):
+                if sigma <= 0:
+                    continue
+                sided = []
+                if self.usl is not None:
+                    sided.append((self.usl - self.mean) / (3 * sigma))
+                if self.lsl is not None:
+                    sided.append((self.mean - self.lsl) / (3 * sigma))
+                spread = (self.usl - self.lsl) / (6 * sigma) if None not in (self.lsl, self.usl) else None
+                if label == "within":
+                    capability.update(cp=spread, cpk=min(sided))
+                else:
+                    capability.update(pp=spread, ppk=min(sided))
+            summary["capability"] = capability
+        return summary
+
+
+def summarize_csv(csv_path, column, subgroup_size=5, lsl=None, usl=None, bins=30, baseline_rows=1000,
+                  chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Stream one column of a CSV file through an SPCAccumulator and return its summary"""
+    started = time.perf_counter()
+    accumulator = SPCAccumulator(subgroup_size=subgroup_size, lsl=lsl, usl=usl, bins=bins, baseline_rows=baseline_rows)
+    for chunk in iter_csv_column_chunks(csv_path, column, chunk_bytes=chunk_bytes):
+        accumulator.update(chunk)
+    summary = accumulator.summary()
+    elapsed = time.perf_counter() - started
+    summary["source"] = {"path": os.path.abspath(csv_path), "column": column}
+    summary["elapsed_seconds"] = elapsed
+    summary["rows_per_second"] = summary["rows"] / elapsed if elapsed > 0 else None
+    return summary
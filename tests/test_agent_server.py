@@ -0,0 +1,83 @@
+import asyncio
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import agent_server
+from ai_agent import create_agent
+from fake_ollama import FakeOllama
+
+TOOL_SECONDS = 1.5
+
+
+def slow_lookup(seconds: float) -> str:
+    """Look up a value slowly, like a web search or a large CSV.
+
+    Args:
+        seconds: How long the lookup takes.
+    """
+    time.sleep(seconds)
+    return "42"
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeOllama(tokens_per_second=500.0, prompt_eval_seconds=0.01, response_tokens=10,
+                      tool_calls=[{"name": "slow_lookup", "arguments": {"seconds": TOOL_SECONDS}}]).start()
+    monkeypatch.delenv("OLLAMA_BASE_URLS", raising=False)
+    monkeypatch.setenv("OLLAMA_BASE_URL", fake.base_url)
+    monkeypatch.delenv("RESPONSE_CACHE_PATH", raising=False)
+    yield fake
+    fake.stop()
+
+
+def agent_with_slow_tool():
+    agent = create_agent()
+    agent.cache = None
+    agent.agent.tools.append(slow_lookup)
+    return agent
+
+
+async def post_chat(port, message, session_id):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps({"message": message, "agent": "general", "session_id": session_id, "stream": False}).encode()
+    writer.write(f"POST /v1/chat HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+def test_a_slow_tool_does_not_hold_up_other_sessions(fake, monkeypatch):
+    monkeypatch.setattr(agent_server, "AGENT_FACTORIES", {"general": agent_with_slow_tool})
+
+    async def run():
+        server = agent_server.AgentServer(workers=2, kinds=["general"])
+        tcp_server = await server.start("127.0.0.1", 0)
+        port = tcp_server.sockets[0].getsockname()[1]
+        try:
+            started = time.perf_counter()
+            slow = asyncio.ensure_future(post_chat(port, f"Look it up {fake.tool_trigger}", "slow"))
+            # Let the first session reach its tool call
+            await asyncio.sleep(0.3)
+            quick = await post_chat(port, "What is takt time?", "quick")
+            # Timed from the start: a blocked event loop would also delay the sleep above
+            quick_seconds = time.perf_counter() - started
+            slow = await slow
+            return quick, quick_seconds, slow, time.perf_counter() - started
+        finally:
+            tcp_server.close()
+            for task in server._tasks:
+                task.cancel()
+
+    quick, quick_seconds, slow, slow_seconds = asyncio.run(run())
+    assert "response" in quick and "response" in slow
+    assert slow_seconds >= TOOL_SECONDS
+    # Answered while the other session's tool was still running
+    assert quick_seconds < TOOL_SECONDS * 2 / 3
+    assert any(request["tool_calls"] for request in fake.requests)
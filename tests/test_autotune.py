@@ -0,0 +1,51 @@
+import pytest
+
+from autotune import Autotuner, best_profile
+
+
+def profile(num_ctx, prompt_tps, generation_tps, memory_gb=3.0, num_thread=8, prompt_tokens=1000):
+    return {
+        "options": {"num_ctx": num_ctx, "num_batch": 256, "num_thread": num_thread},
+        "prompt_tokens": prompt_tokens,
+        "prompt_tps": prompt_tps,
+        "generation_tps": generation_tps,
+        "memory_bytes": memory_gb * 1e9,
+    }
+
+
+def test_turn_seconds_adds_prompt_and_answer_time():
+    assert Autotuner.turn_seconds(profile(4096, 500.0, 10.0), 100) == pytest.approx(1000 / 500 + 100 / 10)
+
+
+def test_fastest_profile_wins():
+    results = [profile(4096, 500.0, 10.0, num_thread=4), profile(4096, 800.0, 20.0, num_thread=8),
+               profile(4096, 400.0, 8.0, num_thread=12)]
+    assert best_profile(results, 256)["options"]["num_thread"] == 8
+
+
+def test_larger_context_preferred_within_tolerance():
+    fast, slightly_slower = profile(4096, 800.0, 20.0), profile(8192, 790.0, 19.5)
+    much_slower = profile(16384, 500.0, 12.0)
+    assert best_profile([fast, slightly_slower, much_slower], 256, tolerance=0.05) is slightly_slower
+    assert best_profile([fast, slightly_slower, much_slower], 256, tolerance=0.0) is fast
+
+
+def test_profiles_over_the_memory_limit_are_skipped():
+    results = [profile(16384, 900.0, 25.0, memory_gb=12.0), profile(8192, 800.0, 20.0, memory_gb=4.0)]
+    assert best_profile(results, 256, max_memory=8e9)["options"]["num_ctx"] == 8192
+
+
+def test_profiles_below_the_minimum_context_are_skipped():
+    results = [profile(2048, 900.0, 25.0), profile(4096, 600.0, 15.0)]
+    assert best_profile(results, 256, min_ctx=4096)["options"]["num_ctx"] == 4096
+
+
+def test_failed_and_untimed_profiles_are_skipped():
+    results = [
+        {"options": {"num_ctx": 16384, "num_batch": 256, "num_thread": 8}, "error": "out of memory"},
+        profile(8192, None, 20.0),
+        profile(8192, 800.0, None),
+        profile(4096, 600.0, 15.0),
+    ]
+    assert best_profile(results, 256) is results[3]
+    assert best_profile(results[:3], 256) is None
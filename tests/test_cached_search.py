@@ -0,0 +1,101 @@
+import json
+import threading
+import time
+
+from cached_search import CachedDuckDuckGo
+
+
+class FakeBackend:
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.release = threading.Event()
+        self.release.set()
+
+    def duckduckgo_search(self, query, max_results):
+        self.calls += 1
+        self.release.wait()
+        if self.fail:
+            raise RuntimeError("rate limited")
+        return json.dumps([{"title": f"{query} #{self.calls}"}])
+
+    duckduckgo_news = duckduckgo_search
+
+
+def age_rows(tool, seconds):
+    """Make every cached row ``seconds`` older"""
+    tool._db.execute("UPDATE search_results SET fetched_at = fetched_at - ?", (seconds,))
+    tool._db.commit()
+
+
+def test_fresh_result_is_served_from_cache():
+    backend = FakeBackend()
+    tool = CachedDuckDuckGo(backend=backend, ttl=60, news=False)
+    first = tool.duckduckgo_search("control chart")
+    assert tool.duckduckgo_search("  Control   CHART ") == first
+    assert backend.calls == 1
+    assert tool.stats()["hits"] == 1
+
+
+def test_expired_result_is_refreshed():
+    backend = FakeBackend()
+    tool = CachedDuckDuckGo(backend=backend, ttl=60, news=False)
+    first = tool.duckduckgo_search("control chart")
+    age_rows(tool, 61)
+    assert tool.duckduckgo_search("control chart") != first
+    assert backend.calls == 2
+
+
+def test_expired_result_is_the_fallback_when_the_search_fails():
+    backend = FakeBackend()
+    tool = CachedDuckDuckGo(backend=backend, ttl=60, stale_ttl=3600, news=False)
+    first = tool.duckduckgo_search("control chart")
+    age_rows(tool, 120)
+    backend.fail = True
+    assert tool.duckduckgo_search("control chart") == first
+    assert tool.stats()["stale_served"] == 1
+
+
+def test_result_past_stale_ttl_is_not_served():
+    backend = FakeBackend()
+    tool = CachedDuckDuckGo(backend=backend, ttl=60, stale_ttl=3600, news=False)
+    tool.duckduckgo_search("control chart")
+    age_rows(tool, 7200)
+    backend.fail = True
+    result = json.loads(tool.duckduckgo_search("control chart"))
+    assert "rate limited" in result["error"]
+    assert tool.stats()["stale_served"] == 0
+
+
+def test_timeout_falls_back_and_the_late_result_refreshes_the_cache():
+    backend = FakeBackend()
+    tool = CachedDuckDuckGo(backend=backend, ttl=60, timeout=0.05, news=False)
+    first = tool.duckduckgo_search("control chart")
+    age_rows(tool, 120)
+    backend.release.clear()
+    assert tool.duckduckgo_search("control chart") == first
+    assert tool.stats()["timeouts"] == 1
+    backend.release.set()
+    key = json.dumps(["search", "control chart", 5])
+    deadline = time.time() + 5
+    while tool._read(key)[1] < time.time() - 60:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    assert tool.duckduckgo_search("control chart") != first
+
+
+def test_concurrent_identical_queries_share_one_call():
+    backend = FakeBackend()
+    backend.release.clear()
+    tool = CachedDuckDuckGo(backend=backend, ttl=60, news=False)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(tool.duckduckgo_search("pareto")))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    backend.release.set()
+    for thread in threads:
+        thread.join()
+    assert backend.calls == 1
+    assert len(set(results)) == 1
@@ -0,0 +1,106 @@
+import pytest
+
+from conversation_memory import ConversationMemory
+
+
+def turn(number, chars=40):
+    return f"question {number} ".ljust(chars, "q"), f"answer {number} ".ljust(chars, "a")
+
+
+def test_turns_beyond_keep_recent_are_folded_into_the_summary():
+    calls = []
+
+    def summarizer(previous, transcript):
+        calls.append((previous, transcript))
+        return f"{previous}|{transcript.count('User:')} turns".strip("|")
+
+    memory = ConversationMemory(token_budget=100_000, keep_recent_turns=3, summarizer=summarizer, background=False)
+    for number in range(5):
+        memory.add_turn(*turn(number))
+
+    assert [user for user, _ in memory.turns] == [turn(n)[0] for n in (2, 3, 4)]
+    assert memory.folded_turns == 2
+    assert memory.summary == "1 turns|1 turns"
+    # The oldest turn is folded first
+    assert "question 0" in calls[0][1]
+
+
+def test_context_is_folded_until_it_fits_the_budget():
+    memory = ConversationMemory(token_budget=1000, reserve_tokens=200, keep_recent_turns=50,
+                                summarizer=lambda previous, transcript: "short summary", background=False)
+    memory.system_tokens = 300
+    for number in range(20):
+        memory.add_turn(*turn(number, chars=200))
+
+    # 1000 - 300 - 200 tokens are left for the summary and the verbatim turns
+    assert memory.available_tokens() == 500
+    assert memory.context_tokens() <= memory.available_tokens()
+    assert memory.folded_turns + len(memory.turns) == 20
+    assert memory.turns[-1] == turn(19, chars=200)
+
+
+def test_system_tokens_shrink_the_room_for_turns():
+    def kept(system_tokens):
+        memory = ConversationMemory(token_budget=2000, reserve_tokens=200, keep_recent_turns=50, background=False)
+        memory.system_tokens = system_tokens
+        for number in range(20):
+            memory.add_turn(*turn(number, chars=200))
+        return len(memory.turns)
+
+    assert kept(1500) < kept(0)
+
+
+def test_failed_summarizer_falls_back_to_a_truncated_transcript():
+    def summarizer(previous, transcript):
+        raise RuntimeError("model not loaded")
+
+    memory = ConversationMemory(token_budget=1000, reserve_tokens=200, keep_recent_turns=2, summarizer=summarizer,
+                                background=False)
+    for number in range(10):
+        memory.add_turn(*turn(number, chars=400))
+
+    assert "Assistant: answer" in memory.summary
+    # Limited to a quarter of the available window
+    assert len(memory.summary) <= memory.available_tokens() / 4 * memory.chars_per_token + len("...")
+
+
+def test_no_summary_is_kept_when_the_system_prompt_fills_the_window():
+    memory = ConversationMemory(token_budget=2048, keep_recent_turns=2,
+                                summarizer=lambda previous, transcript: f"{previous}\n{transcript}", background=False)
+    # Tool definitions and persona prompt alone exceed the window
+    memory.system_tokens = 2500
+    for number in range(5):
+        memory.add_turn(*turn(number, chars=2000))
+
+    assert memory.available_tokens() == 0
+    assert memory.summary == ""
+    assert memory.folded_turns == 4
+    assert len(memory.turns) == 1
+
+
+def test_background_fold_finishes_before_the_context_is_read():
+    memory = ConversationMemory(token_budget=100_000, keep_recent_turns=1,
+                                summarizer=lambda previous, transcript: "summary", background=True)
+    memory.add_turn(*turn(0))
+    memory.add_turn(*turn(1))
+    messages = memory.context_messages()
+    assert messages[0] == {"role": "system", "content": "Summary of the earlier conversation:\nsummary"}
+    assert [m["role"] for m in messages[1:]] == ["user", "assistant"]
+
+
+def test_token_estimate_is_calibrated_from_ollama_counts():
+    memory = ConversationMemory(background=False)
+    memory.add_turn(*turn(0), prompt_tokens=1000, prompt_chars=3000)
+    assert memory.chars_per_token == pytest.approx(0.7 * 4.0 + 0.3 * 3.0)
+    # Partly cached prompts report implausible ratios and are ignored
+    memory.add_turn(*turn(1), prompt_tokens=10, prompt_chars=3000)
+    assert memory.chars_per_token == pytest.approx(3.7)
+
+
+def test_restore_continues_from_a_stored_summary():
+    memory = ConversationMemory(keep_recent_turns=2, background=False)
+    memory.restore("earlier summary", [turn(5), turn(6)], folded_turns=5)
+    assert memory.snapshot() == ("earlier summary", 5)
+    memory.add_turn(*turn(7))
+    assert memory.folded_turns == 6
+    assert len(memory.turns) == 2
@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+from phi.tools.function import Function, FunctionCall
+
+from instrumented_ollama import InstrumentedOllama
+
+
+def lookup(label: str, seconds: float) -> str:
+    """Look up a value.
+
+    Args:
+        label: What to look up.
+        seconds: How long the lookup takes.
+    """
+    time.sleep(seconds)
+    return f"{label} done"
+
+
+def hang(seconds: float) -> str:
+    """Take far too long.
+
+    Args:
+        seconds: How long to take.
+    """
+    time.sleep(seconds)
+    return "too late"
+
+
+def call(function, call_id, **arguments):
+    return FunctionCall(function=Function.from_callable(function), arguments=arguments, call_id=call_id)
+
+
+def model(**fields):
+    return InstrumentedOllama(id="llama3.1", **{"tool_workers": 4, "tool_timeout": None, "tool_timeouts": {}, **fields})
+
+
+def test_results_keep_the_order_the_model_asked_for():
+    calls = [call(lookup, "a", label="a", seconds=0.3), call(lookup, "b", label="b", seconds=0.1),
+             call(lookup, "c", label="c", seconds=0.2)]
+    results = []
+    started = time.perf_counter()
+    list(model().run_function_calls(calls, results))
+    elapsed = time.perf_counter() - started
+
+    assert [message.tool_call_id for message in results] == ["a", "b", "c"]
+    assert [message.content for message in results] == ["a done", "b done", "c done"]
+    # Run together, the batch takes about as long as its slowest call
+    assert elapsed < 0.5
+    assert all(message.metrics["batch_size"] == 3 for message in results)
+
+
+def test_a_per_tool_timeout_cuts_off_only_that_tool():
+    calls = [call(hang, "slow", seconds=1.0), call(lookup, "fast", label="fast", seconds=0.05)]
+    started = time.perf_counter()
+    outcomes = model(tool_timeouts={"hang": 0.2})._run_concurrently(calls)
+    elapsed = time.perf_counter() - started
+
+    assert not outcomes[0]["success"]
+    assert "timed out" in calls[0].error
+    assert outcomes[1]["success"] and outcomes[1]["output"] == "fast done"
+    assert elapsed < 0.6
+
+
+def test_no_tool_call_outlives_the_turn_deadline():
+    instrumented = model(tool_timeout=30.0)
+    instrumented.deadline = time.perf_counter() + 0.2
+    calls = [call(hang, "slow", seconds=1.0)]
+    started = time.perf_counter()
+    outcomes = instrumented._run_concurrently(calls)
+
+    assert time.perf_counter() - started < 0.6
+    assert not outcomes[0]["success"]
+    assert "timed out" in calls[0].error
+
+
+def test_queued_calls_are_dropped_when_every_worker_is_stuck():
+    calls = [call(hang, "stuck", seconds=1.0), call(lookup, "queued", label="queued", seconds=0.0)]
+    outcomes = model(tool_workers=1, tool_timeouts={"hang": 0.1})._run_concurrently(calls)
+
+    assert not outcomes[0]["success"] and not outcomes[1]["success"]
+    assert calls[1].error == "Tool call not run: earlier calls timed out"
+
+
+def test_the_async_batch_leaves_the_event_loop_free():
+    calls = [call(lookup, "a", label="a", seconds=0.3), call(hang, "b", seconds=1.0)]
+    instrumented = model(tool_timeouts={"hang": 0.3})
+
+    async def run():
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.02)
+
+        task = asyncio.ensure_future(ticker())
+        try:
+            outcomes = await instrumented._arun_concurrently(calls)
+        finally:
+            task.cancel()
+        return outcomes, ticks
+
+    outcomes, ticks = asyncio.run(run())
+    assert outcomes[0]["output"] == "a done"
+    assert not outcomes[1]["success"] and "timed out" in calls[1].error
+    # The loop kept running other coroutines while the tools ran
+    assert len(ticks) >= 10
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from intent_router import IntentRouter, answer_arithmetic, arithmetic_expression, safe_eval
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("what is 17 * 23?", "17 * 23"),
+    ("calc (4+5)/3", "(4+5)/3"),
+    ("sqrt(2) * 3", "sqrt(2) * 3"),
+    ("2^10", "2^10"),
+    ("1/0", "1/0"),
+])
+def test_arithmetic_is_recognized(text, expected):
+    assert arithmetic_expression(text) == expected
+
+
+@pytest.mark.parametrize("text", ["what is DMAIC?", "42", "-7", "what is a control chart", "__import__('os')",
+                                  "sqrt.__class__(1)", "open('x') + 1"])
+def test_other_text_is_not_arithmetic(text):
+    assert arithmetic_expression(text) is None
+
+
+def test_answers():
+    assert answer_arithmetic("17 * 23") == "17 * 23 = 391"
+    assert answer_arithmetic("2^0.5") == "2^0.5 = 1.414213562"
+    assert answer_arithmetic("1/0") == "1/0: division by zero"
+
+
+@pytest.mark.parametrize("expression", [
+    "10**10**10",
+    "2**100000",
+    "((9**999)**999)**99",
+    "(9**999)**999",
+    "((2**999)**999)",
+    "(2**999)*(2**999)*(2**999)*(2**999)*(2**999)*(2**999)*(2**999)*(2**999)*(2**999)*(2**999)*(2**999)",
+])
+def test_huge_results_are_refused_quickly(expression):
+    started = time.perf_counter()
+    with pytest.raises(ValueError):
+        safe_eval(expression)
+    assert arithmetic_expression(expression) is None
+    assert time.perf_counter() - started < 0.5
+
+
+def test_large_results_within_the_limit_are_computed():
+    assert safe_eval("9**999") == 9 ** 999
+    assert safe_eval("(2**999)*(2**999)") == 2 ** 1998
+
+
+def test_a_command_matches_with_and_without_its_argument():
+    router = IntentRouter()
+    router.add("kb", lambda query: query or "usage", phrases=["kb", "search kb"], takes_argument=True)
+    assert router.handle("kb torque audit") == "torque audit"
+    assert router.handle("search kb torque audit") == "torque audit"
+    assert router.handle("kb") == "usage"
+    assert router.handle("Search KB?") == "usage"
+    assert router.handle("kbase torque") is None
@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+from lss_stats import LeanSixSigmaStatistics
+
+# R's sleep data: extra hours of sleep under two drugs, the same ten patients
+SLEEP_GROUP_1 = [0.7, -1.6, -0.2, -1.2, -0.1, 3.4, 3.7, 0.8, 0.0, 2.0]
+SLEEP_GROUP_2 = [1.9, 0.8, 1.1, 0.1, -0.1, 4.4, 5.5, 1.6, 4.6, 3.4]
+
+# R's PlantGrowth data: dried plant weight under a control and two treatments
+PLANT_GROWTH = [
+    [4.17, 5.58, 5.18, 6.11, 4.50, 4.61, 5.17, 4.53, 5.33, 5.14],
+    [4.81, 4.17, 4.41, 3.59, 5.87, 3.83, 6.03, 4.89, 4.32, 4.69],
+    [6.31, 5.12, 5.54, 5.50, 5.37, 5.29, 4.92, 6.15, 5.80, 5.26],
+]
+
+
+@pytest.fixture(scope="module")
+def stats():
+    return LeanSixSigmaStatistics()
+
+
+def run(function, **arguments):
+    return json.loads(function(**arguments))
+
+
+def test_one_sample_t_test_matches_the_paired_sleep_study(stats):
+    differences = [b - a for a, b in zip(SLEEP_GROUP_1, SLEEP_GROUP_2)]
+    result = run(stats.t_test, sample_a=differences)
+    assert result["test"] == "one-sample"
+    assert result["t"] == pytest.approx(4.0621, abs=1e-4)
+    assert result["df"] == 9
+    assert result["p_value"] == pytest.approx(0.002833, abs=1e-6)
+
+
+def test_welch_t_test_matches_the_sleep_study(stats):
+    result = run(stats.t_test, sample_a=SLEEP_GROUP_1, sample_b=SLEEP_GROUP_2)
+    assert result["t"] == pytest.approx(-1.8608, abs=1e-4)
+    assert result["df"] == pytest.approx(17.776, abs=1e-3)
+    assert result["p_value"] == pytest.approx(0.07939, abs=1e-5)
+
+
+def test_t_test_reads_two_groups_from_a_csv(stats, tmp_path):
+    path = tmp_path / "sleep.csv"
+    rows = [f"{value},drug_1" for value in SLEEP_GROUP_1] + [f"{value},drug_2" for value in SLEEP_GROUP_2]
+    path.write_text("extra,group\n" + "\n".join(rows) + "\n")
+    result = run(stats.t_test, csv_path=str(path), value_column="extra", group_column="group")
+    assert result["means"] == {"drug_1": pytest.approx(0.75), "drug_2": pytest.approx(2.33)}
+    assert result["p_value"] == pytest.approx(0.07939, abs=1e-5)
+
+
+def test_a_sample_without_variation_is_an_error_not_nan(stats):
+    result = stats.t_test(sample_a=[5.0, 5.0, 5.0], mu=4.0)
+    assert "NaN" not in result and "Infinity" not in result
+    assert "no variation" in json.loads(result)["error"]
+    assert "error" in run(stats.t_test, sample_a=[1.0, 1.0], sample_b=[2.0, 2.0])
+
+
+def test_an_empty_second_sample_is_an_error(stats):
+    result = run(stats.t_test, sample_a=[1.0, 2.0, 3.0], sample_b=[])
+    assert "sample_b is empty" in result["error"]
+
+
+def test_anova_matches_plant_growth(stats):
+    result = run(stats.anova, groups=PLANT_GROWTH)
+    assert result["df_between"] == 2 and result["df_within"] == 27
+    assert result["ss_between"] == pytest.approx(3.76634, abs=1e-5)
+    assert result["ss_within"] == pytest.approx(10.49209, abs=1e-4)
+    assert result["f"] == pytest.approx(4.846088, abs=1e-5)
+    assert result["p_value"] == pytest.approx(0.01591, abs=1e-5)
+
+
+def test_anova_without_variation_within_groups_is_an_error(stats):
+    assert "error" in run(stats.anova, groups=[[1.0, 1.0], [2.0, 2.0]])
+
+
+def test_chi_square_independence_matches_the_party_affiliation_table(stats):
+    result = run(stats.chi_square_test, observed=[[762, 327, 468], [484, 239, 477]])
+    assert result["test"] == "independence"
+    assert result["chi2"] == pytest.approx(30.0701, abs=1e-4)
+    assert result["df"] == 2
+    assert result["p_value"] == pytest.approx(2.954e-07, rel=1e-3)
+
+
+def test_chi_square_goodness_of_fit_against_uniform(stats):
+    result = run(stats.chi_square_test, observed=[[20, 15, 25]])
+    assert result["chi2"] == pytest.approx(2.5)
+    assert result["df"] == 2
+    assert result["p_value"] == pytest.approx(0.2865048, abs=1e-6)
+
+
+def test_pareto_ranks_categories_and_finds_the_vital_few(stats):
+    result = run(stats.pareto_analysis, categories=["scratch", "dent", "misalign", "other"], counts=[50, 30, 15, 5])
+    assert [row["category"] for row in result["table"]] == ["scratch", "dent", "misalign", "other"]
+    assert [row["cumulative_percent"] for row in result["table"]] == [50.0, 80.0, 95.0, 100.0]
+    assert result["vital_few"] == ["scratch", "dent"]
+
+
+def test_pareto_counts_one_defect_per_entry(stats):
+    result = run(stats.pareto_analysis, categories=["dent", "scratch", "dent", "dent", "scratch", "other"])
+    assert [(row["category"], row["count"]) for row in result["table"]] == [("dent", 3), ("scratch", 2),
+                                                                           ("other", 1)]
+
+
+def test_capability_of_individuals(stats):
+    # Moving ranges are all 2, so sigma within is 2 / d2 = 2 / 1.128; sigma overall is sqrt(10 / 9)
+    result = run(stats.process_capability, data=[10.0, 12.0] * 5, lsl=5.0, usl=20.0)
+    assert result["mean"] == 11.0
+    assert result["cp"] == pytest.approx(15 * 1.128 / 12, rel=1e-5)
+    assert result["cpk"] == pytest.approx(6 * 1.128 / 6, rel=1e-5)
+    assert result["pp"] == pytest.approx(2.371708, rel=1e-5)
+    assert result["ppk"] == pytest.approx(1.897367, rel=1e-5)
+
+
+def test_capability_of_subgroups_with_one_limit(stats):
+    # Every subgroup has a range of 4, so sigma within is 4 / d2 = 4 / 2.326
+    data = [8.0, 10.0, 12.0, 9.0, 11.0] * 4
+    result = run(stats.process_capability, data=data, usl=16.0, subgroup_size=5)
+    assert result["sigma_within"] == pytest.approx(4 / 2.326, rel=1e-5)
+    assert result["cp"] is None
+    assert result["cpk"] == pytest.approx(6 * 2.326 / 12, rel=1e-5)
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from model_router import ModelRouter
+from turn_metrics import TurnMetrics
+
+
+@pytest.fixture
+def router():
+    return ModelRouter("small", "large")
+
+
+def test_a_short_look_up_scores_below_zero(router):
+    score, reasons = router.score("What is a kanban?")
+    assert score == pytest.approx(4 / 25 - 1)
+    assert reasons == ["look-up question"]
+
+
+def test_acronym_questions_are_look_ups_even_with_a_keyword(router):
+    score, reasons = router.score("What does DMAIC stand for?")
+    assert score == pytest.approx(5 / 25 + 1 - 1)
+    assert reasons == ["keywords: dmaic", "look-up question"]
+
+
+def test_each_keyword_adds_a_point(router):
+    score, reasons = router.score("Design an experiment to compare two suppliers")
+    assert score == pytest.approx(7 / 25 + 3)
+    assert reasons == ["keywords: design, compare, experiment"]
+
+
+def test_extra_sentences_numbers_and_follow_ups_raise_the_score(router):
+    assert router.score("Hello there. How are you?") == (pytest.approx(5 / 25 + 0.5), ["2 sentences"])
+    assert router.score("mean of 4 5 6") == (pytest.approx(5 / 25 + 1), ["numeric data"])
+    assert router.score("ok thanks", has_context=True) == (pytest.approx(2 / 25 + 0.5), ["follow-up"])
+
+
+def test_choose_splits_on_the_threshold(router):
+    assert router.choose("What is a kanban?") == "small"
+    assert router.choose("Why did the control chart drift?") == "large"
+    assert ModelRouter("small", "large", threshold=5).choose("Design an experiment") == "small"
+
+
+def test_accept_rejects_short_error_and_hedging_answers(router):
+    assert router.accept("Kanban is a pull-based scheduling system.")
+    assert not router.accept("Kanban.")
+    assert not router.accept(None)
+    assert not router.accept("Error: the model is not available")
+    assert not router.accept("I'm not sure, but kanban might be a scheduling system.")
+
+
+def test_concurrent_turns_are_all_counted(router):
+    def record_turns(model):
+        for _ in range(500):
+            router.record(TurnMetrics(started_at=time.perf_counter(), model=model))
+
+    threads = [threading.Thread(target=record_turns, args=(model,)) for model in ("small", "large") * 4]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert router.counts == {"small": 2000, "large": 2000, "escalated": 0}
+    assert router.summary().startswith("Model routing: 2000 on small, 2000 on large, 0 escalated")
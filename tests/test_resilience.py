@@ -0,0 +1,294 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from resilience import (BackendUnavailable, CircuitBreaker, DeadlineExceeded, Hedger, aiterate_with_deadline,
+                        call_with_deadline, iterate_with_deadline)
+
+
+class Backend:
+    def __init__(self, url):
+        self.url = url
+
+
+class FakeRouter:
+    def __init__(self, *urls):
+        self.backends = [Backend(url) for url in urls]
+        self.released = []
+
+    def acquire(self, exclude=None):
+        return next((backend for backend in self.backends if backend.url != exclude), None)
+
+    def release(self, backend, latency=None, failed=False):
+        self.released.append((backend.url, failed))
+
+
+def trained(hedger, host, kind, seconds=0.05):
+    """Give the host enough history that its requests are hedged after ``seconds``"""
+    for _ in range(hedger.min_samples):
+        hedger._window(host, kind).add(seconds)
+
+
+# -*- CircuitBreaker
+
+def test_circuit_opens_after_consecutive_failures_and_refuses_requests():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            with breaker.guard("a"):
+                raise ConnectionError("refused")
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(BackendUnavailable):
+        with breaker.guard("a"):
+            pass
+
+
+def test_a_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_trial_through_and_backs_off_when_it_fails():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05, max_cooldown=0.15)
+    breaker.record_failure()
+    assert not breaker.acquire()
+    time.sleep(0.06)
+    assert breaker.acquire()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # One trial at a time
+    assert not breaker.acquire()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.cooldown == pytest.approx(0.1)
+    time.sleep(0.11)
+    assert breaker.acquire()
+    breaker.record_failure()
+    assert breaker.cooldown == pytest.approx(0.15)
+
+
+def test_a_successful_trial_closes_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    with breaker.guard():
+        pass
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.cooldown == 0.01
+
+
+def test_a_missed_deadline_is_not_held_against_the_host():
+    breaker = CircuitBreaker(failure_threshold=1)
+    with pytest.raises(DeadlineExceeded):
+        with breaker.guard():
+            raise DeadlineExceeded()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+# -*- Hedger
+
+def test_requests_are_not_hedged_without_history():
+    hedger = Hedger(FakeRouter("a", "b"))
+    assert hedger.call("a", lambda host: host) == "a"
+    assert hedger.counters == {"requests": 1, "hedged": 0, "hedge_won": 0}
+
+
+def test_a_slow_request_is_hedged_and_the_faster_host_wins():
+    router = FakeRouter("a", "b")
+    hedger = Hedger(router, min_samples=5)
+    trained(hedger, "a", "call")
+
+    def request(host):
+        time.sleep(0.5 if host == "a" else 0.0)
+        return host
+
+    started = time.perf_counter()
+    assert hedger.call("a", request) == "b"
+    assert time.perf_counter() - started < 0.4
+    assert hedger.counters["hedged"] == 1 and hedger.counters["hedge_won"] == 1
+    assert router.released == [("b", False)]
+
+
+def test_a_failed_hedge_loses_to_the_primary():
+    router = FakeRouter("a", "b")
+    hedger = Hedger(router, min_samples=5)
+    trained(hedger, "a", "call")
+
+    def request(host):
+        if host == "b":
+            raise ConnectionError("b is down")
+        time.sleep(0.2)
+        return host
+
+    assert hedger.call("a", request) == "a"
+    assert router.released == [("b", True)]
+
+
+def test_hedged_streams_race_on_the_first_chunk():
+    hedger = Hedger(FakeRouter("a", "b"), min_samples=5)
+    trained(hedger, "a", "stream")
+    closed = []
+
+    def request(host):
+        def chunks():
+            try:
+                time.sleep(0.5 if host == "a" else 0.0)
+                yield from (f"{host}1", f"{host}2")
+            finally:
+                closed.append(host)
+        return chunks()
+
+    assert list(hedger.call("a", request, stream=True)) == ["b1", "b2"]
+    deadline = time.perf_counter() + 2
+    while "a" not in closed and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    # The losing stream is closed once it answers
+    assert "a" in closed
+
+
+def test_async_hedge_cancels_the_losing_request():
+    hedger = Hedger(FakeRouter("a", "b"), min_samples=5)
+    trained(hedger, "a", "call")
+    cancelled = []
+
+    async def request(host):
+        try:
+            await asyncio.sleep(1.0 if host == "a" else 0.0)
+        except asyncio.CancelledError:
+            cancelled.append(host)
+            raise
+        return host
+
+    assert asyncio.run(hedger.acall("a", request)) == "b"
+    assert cancelled == ["a"]
+
+
+def test_async_hedged_stream_yields_every_chunk_of_the_winner():
+    hedger = Hedger(FakeRouter("a", "b"), min_samples=5)
+    trained(hedger, "a", "stream")
+
+    async def request(host):
+        async def chunks():
+            await asyncio.sleep(1.0 if host == "a" else 0.0)
+            for number in range(3):
+                yield f"{host}{number}"
+        return chunks()
+
+    async def run():
+        return [chunk async for chunk in await hedger.acall("a", request, stream=True)]
+
+    assert asyncio.run(run()) == ["b0", "b1", "b2"]
+
+
+def test_async_stream_without_chunks_is_empty():
+    hedger = Hedger(FakeRouter("a"))
+
+    async def request(host):
+        async def chunks():
+            return
+            yield
+        return chunks()
+
+    async def run():
+        return [chunk async for chunk in await hedger.acall("a", request, stream=True)]
+
+    assert asyncio.run(run()) == []
+
+
+# -*- Deadlines
+
+def test_iterate_with_deadline_passes_chunks_through():
+    deadline = time.perf_counter() + 5
+    assert list(iterate_with_deadline(iter(["a", "b"]), deadline)) == ["a", "b"]
+
+
+def test_iterate_with_deadline_gives_up_on_a_stalled_stream():
+    release = threading.Event()
+
+    def chunks():
+        yield "first"
+        release.wait(5)
+        yield "late"
+
+    received = []
+    started = time.perf_counter()
+    with pytest.raises(DeadlineExceeded) as raised:
+        for chunk in iterate_with_deadline(chunks(), time.perf_counter() + 0.2):
+            received.append(chunk)
+    assert received == ["first"]
+    assert time.perf_counter() - started < 1.0
+    release.set()
+    # The worker stops at its next chunk instead of running on
+    raised.value.worker.join(2)
+    assert not raised.value.worker.is_alive()
+
+
+def test_iterate_with_deadline_reraises_the_stream_error():
+    def chunks():
+        yield "a"
+        raise ValueError("broken stream")
+
+    with pytest.raises(ValueError, match="broken stream"):
+        list(iterate_with_deadline(chunks(), time.perf_counter() + 5))
+
+
+def test_aiterate_with_deadline_cancels_a_stalled_stream():
+    cancelled = []
+
+    async def chunks():
+        yield "first"
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        yield "late"
+
+    async def run():
+        received = []
+        with pytest.raises(DeadlineExceeded):
+            async for chunk in aiterate_with_deadline(chunks(), time.perf_counter() + 0.2):
+                received.append(chunk)
+        await asyncio.sleep(0)
+        return received
+
+    assert asyncio.run(run()) == ["first"]
+    assert cancelled == [True]
+
+
+def test_aiterate_with_deadline_reraises_the_stream_error():
+    async def chunks():
+        yield "a"
+        raise ValueError("broken stream")
+
+    async def run():
+        return [chunk async for chunk in aiterate_with_deadline(chunks(), time.perf_counter() + 5)]
+
+    with pytest.raises(ValueError, match="broken stream"):
+        asyncio.run(run())
+
+
+def test_call_with_deadline_returns_the_result_or_raises_the_error():
+    assert call_with_deadline(lambda a, b: a + b, time.perf_counter() + 5, 2, 3) == 5
+
+    def fail():
+        raise KeyError("missing")
+
+    with pytest.raises(KeyError):
+        call_with_deadline(fail, time.perf_counter() + 5)
+
+
+def test_call_with_deadline_hands_back_the_still_running_worker():
+    release = threading.Event()
+    started = time.perf_counter()
+    with pytest.raises(DeadlineExceeded) as raised:
+        call_with_deadline(release.wait, time.perf_counter() + 0.1, 5)
+    assert time.perf_counter() - started < 1.0
+    assert raised.value.worker.is_alive()
+    release.set()
+    raised.value.worker.join(2)
@@ -0,0 +1,100 @@
+import pytest
+
+from session_store import SessionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_turns_are_numbered_in_order_per_session(store):
+    first = store.create_session("lss", "llama3.1")
+    second = store.create_session("lss", "llama3.1")
+    assert [store.append_turn(first, f"q{n}", f"a{n}") for n in range(3)] == [1, 2, 3]
+    assert store.append_turn(second, "other", "answer") == 1
+    assert store.append_turn(first, "q3", "a3") == 4
+
+
+def test_the_first_message_becomes_the_title(store):
+    session_id = store.create_session("lss")
+    store.append_turn(session_id, "How do I   compute\nCpk?", "answer")
+    store.append_turn(session_id, "Something else", "answer")
+    [listed] = store.list_sessions(agent="lss")
+    assert listed["title"] == "How do I compute Cpk?"
+    assert listed["turns"] == 2
+
+
+def test_sessions_without_turns_are_not_listed(store):
+    store.create_session("lss")
+    assert store.list_sessions() == []
+    assert store.resolve(agent="lss") is None
+
+
+def test_resume_without_a_summary_replays_the_last_turns(store):
+    session_id = store.create_session("lss", "llama3.1")
+    for number in range(5):
+        store.append_turn(session_id, f"q{number}", f"a{number}")
+
+    session = store.resume(session_id, tail_turns=3)
+    assert session["summary"] == ""
+    assert session["turns"] == 5
+    assert session["tail"] == [("q2", "a2"), ("q3", "a3"), ("q4", "a4")]
+    # The two turns before the tail are neither summarized nor replayed
+    assert session["summary_turns"] == 2
+
+
+def test_resume_with_a_summary_replays_only_the_turns_after_it(store):
+    session_id = store.create_session("lss")
+    for number in range(1, 7):
+        # From the fourth turn on, memory has folded all but the last two turns into a summary
+        summary_turns = number - 2 if number >= 4 else 0
+        store.append_turn(session_id, f"q{number}", f"a{number}", summary=f"turns 1-{summary_turns}",
+                          summary_turns=summary_turns)
+
+    session = store.resume(session_id, tail_turns=10)
+    assert session["summary"] == "turns 1-4"
+    assert session["tail"] == [("q5", "a5"), ("q6", "a6")]
+    assert session["summary_turns"] == 4
+
+
+def test_an_unchanged_summary_is_not_stored_again(store):
+    session_id = store.create_session("lss")
+    store.append_turn(session_id, "q0", "a0", summary="s", summary_turns=1)
+    store.append_turn(session_id, "q1", "a1", summary="s", summary_turns=1)
+    rows = store._db.execute("SELECT COUNT(*) FROM summaries WHERE session_id = ?", (session_id,)).fetchone()
+    assert rows == (1,)
+
+
+def test_resume_of_an_unknown_session_is_none(store):
+    assert store.resume("0123456789ab") is None
+
+
+def test_resolve_takes_a_unique_prefix(store):
+    sessions = [store.create_session("lss") for _ in range(2)]
+    for session_id in sessions:
+        store.append_turn(session_id, "q", "a")
+    assert store.resolve(sessions[0]) == sessions[0]
+    assert store.resolve(sessions[0][:8]) == sessions[0]
+    assert store.resolve("") is None
+    assert store.resolve("zz") is None
+
+
+def test_resolve_without_an_id_picks_the_agents_latest_session(store):
+    older, newer = store.create_session("lss"), store.create_session("lss")
+    general = store.create_session("general")
+    store.append_turn(older, "q", "a")
+    store.append_turn(newer, "q", "a")
+    store.append_turn(general, "q", "a")
+    assert store.resolve(agent="lss") == newer
+    assert store.resolve(agent="general") == general
+
+
+def test_resolve_does_not_match_another_agents_session(store):
+    lss = store.create_session("lss")
+    store.append_turn(lss, "q", "a")
+    assert store.resolve(lss[:6], agent="general") is None
+    assert store.resolve(lss[:6], agent="lss") == lss
+    assert store.resolve(lss[:6]) == lss
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from lss_stats import A2, D2, D4
+from spc_ingest import SPCAccumulator, iter_csv_column_chunks, summarize_csv
+
+
+@pytest.fixture
+def measurements():
+    rng = np.random.default_rng(7)
+    return np.round(rng.normal(10.0, 0.2, 403), 4)
+
+
+def write_csv(path, values, text_column=False):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("timestamp,fill_weight,line\n" if text_column else "sample,fill_weight\n")
+        for number, value in enumerate(values):
+            f.write(f"2024-01-01T00:{number:04d},{value},L1\n" if text_column else f"{number},{value}\n")
+
+
+@pytest.mark.parametrize("text_column", [False, True])
+def test_chunks_hold_every_value_in_order(tmp_path, measurements, text_column):
+    path = tmp_path / "weights.csv"
+    write_csv(path, measurements, text_column)
+    chunks = list(iter_csv_column_chunks(str(path), "fill_weight", chunk_bytes=256))
+    assert len(chunks) > 1
+    np.testing.assert_array_equal(np.concatenate(chunks), measurements)
+
+
+def test_summary_matches_numpy(tmp_path, measurements):
+    path = tmp_path / "weights.csv"
+    write_csv(path, measurements)
+    summary = summarize_csv(str(path), "fill_weight", subgroup_size=5, lsl=9.4, usl=10.6, baseline_rows=100,
+                            chunk_bytes=256)
+
+    assert summary["rows"] == measurements.size
+    assert summary["mean"] == pytest.approx(measurements.mean())
+    assert summary["std_dev"] == pytest.approx(measurements.std(ddof=1))
+    assert summary["min"] == measurements.min()
+    assert summary["max"] == measurements.max()
+
+    mr_bar = np.abs(np.diff(measurements)).mean()
+    assert summary["imr_limits"]["mr_bar"] == pytest.approx(mr_bar)
+    assert summary["imr_limits"]["mr_ucl"] == pytest.approx(D4[2] * mr_bar)
+
+    # The last 3 values do not fill a subgroup and are left out, as in a batch calculation
+    groups = measurements[:400].reshape(-1, 5)
+    r_bar = np.ptp(groups, axis=1).mean()
+    limits = summary["xbar_r_limits"]
+    assert limits["subgroups"] == 80
+    assert limits["r_bar"] == pytest.approx(r_bar)
+    assert limits["xbar_ucl"] == pytest.approx(groups.mean() + A2[5] * r_bar)
+
+    sigma_within = r_bar / D2[5]
+    assert summary["capability"]["cpk"] == pytest.approx(
+        min(10.6 - measurements.mean(), measurements.mean() - 9.4) / (3 * sigma_within))
+    assert summary["capability"]["pp"] == pytest.approx(1.2 / (6 * measurements.std(ddof=1)))
+
+    histogram = summary["histogram"]
+    counts, _ = np.histogram(measurements, bins=np.array(histogram["edges"]))
+    assert histogram["counts"] == counts.tolist()
+
+
+def test_chunking_does_not_change_the_result(measurements):
+    whole, split = SPCAccumulator(baseline_rows=50), SPCAccumulator(baseline_rows=50)
+    whole.update(measurements)
+    for chunk in np.array_split(measurements, 17):
+        split.update(chunk)
+    a, b = whole.summary(), split.summary()
+    assert a["rule_hits"] == b["rule_hits"]
+    assert a["histogram"]["counts"] == b["histogram"]["counts"]
+    assert a["std_dev"] == pytest.approx(b["std_dev"])
+
+
+def test_run_rules_count_across_chunks():
+    accumulator = SPCAccumulator(subgroup_size=1, baseline_rows=20)
+    accumulator.update(np.tile([11.0, 9.0], 10))
+    # Ten points above the center, split over two chunks: the 9th and 10th break the rule
+    accumulator.update(np.full(4, 10.5))
+    accumulator.update(np.full(6, 10.5))
+    # Six rising points, split over two chunks
+    accumulator.update([9.1, 9.2, 9.3])
+    accumulator.update([9.4, 9.5, 9.6])
+    hits = accumulator.summary()["rule_hits"]
+    assert hits["nine_same_side"] == 2
+    assert hits["six_trending"] == 1
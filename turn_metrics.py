@@ -0,0 +1,178 @@
+"""
+Per-turn timing helpers shared by the Ollama agents
+"""
+
+import time
+from dataclasses import dataclass, asdict, field
+from typing import Dict, Optional
+
+
+@dataclass
+class TurnMetrics:
+    """Timing figures recorded for a single chat turn"""
+
+    started_at: float
+    time_to_first_token: Optional[float] = None
+    total_time: Optional[float] = None
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    tokens_per_second: Optional[float] = None
+    cached: bool = False
+    # Breakdown from Ollama's timing fields, summed over the model calls of the turn
+    model_calls: int = 0
+    load_time: float = 0.0
+    prompt_eval_time: float = 0.0
+    generation_time: float = 0.0
+    server_time: float = 0.0
+    network_overhead: float = 0.0
+    # Wall time the turn spent in tools; concurrent calls overlap, so it can be less than the per-tool sum
+    tool_time: float = 0.0
+    tool_calls: int = 0
+    tool_times: Dict[str, float] = field(default_factory=dict)
+    # Set when a ModelRouter picked the model for the turn
+    model: Optional[str] = None
+    escalated: bool = False
+    escalated_after: Optional[float] = None
+    latency_saved: Optional[float] = None
+    # Set when the turn ran past its deadline or found no Ollama host available; fallback says
+    # what was answered instead ("partial" streamed text, a "cache"d answer to the same question, or "none")
+    deadline_missed: bool = False
+    fallback: Optional[str] = None
+
+    def as_dict(self):
+        return asdict(self)
+
+    def summary(self):
+        """One-line human readable summary for the interactive loops"""
+        parts = ["cached response"] if self.cached else []
+        if self.deadline_missed:
+            parts.append("deadline missed")
+        if self.fallback is not None:
+            parts.append(f"fallback: {self.fallback}")
+        if self.model is not None:
+            parts.append(f"{self.model} after escalation" if self.escalated else self.model)
+        if self.time_to_first_token is not None:
+            parts.append(f"first token {self.time_to_first_token:.2f}s")
+        if self.total_time is not None:
+            parts.append(f"total {self.total_time:.2f}s")
+        if self.tokens_per_second is not None:
+            parts.append(f"{self.tokens_per_second:.1f} tokens/s")
+        if self.prompt_tokens:
+            parts.append(f"{self.prompt_tokens} prompt tokens")
+        if self.tool_times:
+            parts.append(f"tools {self.tool_time:.2f}s")
+        return ", ".join(parts)
+
+    def breakdown(self):
+        """Where the turn's time went, one figure per line, for the 'stats' command"""
+        if self.cached:
+            return [f"Answered from cache in {self.total_time:.3f}s"]
+        if self.fallback is not None:
+            reason = "Deadline missed" if self.deadline_missed else "No Ollama host available"
+            return [f"{reason} after {self.total_time:.2f}s, fallback: {self.fallback}"]
+        lines = [
+            f"Total: {self.total_time or 0.0:.2f}s over {self.model_calls} model call(s)",
+            f"  Model load:      {self.load_time:.2f}s",
+            f"  Prompt eval:     {self.prompt_eval_time:.2f}s ({self.prompt_tokens} tokens)",
+            f"  Generation:      {self.generation_time:.2f}s ({self.output_tokens} tokens)",
+            f"  Network/client:  {self.network_overhead:.2f}s",
+        ]
+        if self.tool_calls:
+            lines.append(f"  Tools:           {self.tool_time:.2f}s for {self.tool_calls} call(s)")
+        for name, seconds in sorted(self.tool_times.items(), key=lambda item: -item[1]):
+            lines.append(f"    {name}: {seconds:.2f}s")
+        if self.time_to_first_token is not None:
+            lines.append(f"First token after {self.time_to_first_token:.2f}s")
+        if self.model is not None:
+            routed = f"Model: {self.model}" + (f" (escalated after {self.escalated_after:.2f}s)" if self.escalated else "")
+            if self.latency_saved is not None:
+                routed += f", ~{self.latency_saved:.2f}s saved"
+            lines.append(routed)
+        return lines
+
+
+def _run_metric(agent, key):
+    """Per-model-call values of a run metric in the last run (tool-call turns included)"""
+    run_response = getattr(agent, "run_response", None)
+    metrics = getattr(run_response, "metrics", None) or {}
+    return metrics.get(key, []) or []
+
+
+def _run_tool_times(agent):
+    """Seconds per tool, the wall time spent in tools and the number of calls during the last run"""
+    tool_times, wall_time, calls, batch_left = {}, 0.0, 0, 0
+    run_response = getattr(agent, "run_response", None)
+    for message in getattr(run_response, "messages", None) or []:
+        if message.role == "tool" and message.tool_name:
+            metrics = message.metrics or {}
+            seconds = metrics.get("time") or 0.0
+            tool_times[message.tool_name] = tool_times.get(message.tool_name, 0.0) + seconds
+            calls += 1
+            # Calls run concurrently by InstrumentedOllama share one batch wall time
+            if "batch_time" not in metrics:
+                wall_time += seconds
+            elif batch_left:
+                batch_left -= 1
+            else:
+                wall_time += metrics["batch_time"]
+                batch_left = metrics.get("batch_size", 1) - 1
+    return tool_times, wall_time, calls
+
+
+def finish_turn(agent, metrics, first_token_at=None):
+    """Fill in total time, generation rate and the time breakdown once a run has completed"""
+    finished_at = time.perf_counter()
+    metrics.total_time = finished_at - metrics.started_at
+    metrics.prompt_tokens = sum(_run_metric(agent, "input_tokens"))
+    metrics.output_tokens = sum(_run_metric(agent, "output_tokens"))
+
+    # Recorded per model call by InstrumentedOllama; plain Ollama models leave them at zero
+    call_times = _run_metric(agent, "time")
+    metrics.model_calls = len(call_times)
+    metrics.load_time = sum(_run_metric(agent, "load_time"))
+    metrics.prompt_eval_time = sum(_run_metric(agent, "prompt_eval_time"))
+    metrics.generation_time = sum(_run_metric(agent, "generation_time"))
+    metrics.server_time = sum(_run_metric(agent, "server_time"))
+    if metrics.server_time:
+        metrics.network_overhead = max(0.0, sum(call_times) - metrics.server_time)
+    metrics.tool_times, metrics.tool_time, metrics.tool_calls = _run_tool_times(agent)
+
+    # Generation rate is measured from the first token so it excludes load and prompt eval
+    generation_time = finished_at - (first_token_at if first_token_at is not None else metrics.started_at)
+    if metrics.output_tokens and generation_time > 0:
+        metrics.tokens_per_second = metrics.output_tokens / generation_time
+    return metrics
+
+
+def stream_agent_run(agent, message, metrics):
+    """Run a phidata agent in streaming mode, yielding text chunks as Ollama produces them.
+
+    Tool-call turns are handled inside ``agent.run``; their progress lines arrive as
+    ordinary content chunks, so callers only ever see text.
+    """
+    first_token_at = None
+    for chunk in agent.run(message, stream=True):
+        content = getattr(chunk, "content", None)
+        if not isinstance(content, str) or content == "":
+            continue
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+            metrics.time_to_first_token = first_token_at - metrics.started_at
+        yield content
+
+    finish_turn(agent, metrics, first_token_at)
+
+
+async def astream_agent_run(agent, message, metrics):
+    """Async counterpart of stream_agent_run, driven by agent.arun on Ollama's async client"""
+    first_token_at = None
+    async for chunk in await agent.arun(message, stream=True):
+        content = getattr(chunk, "content", None)
+        if not isinstance(content, str) or content == "":
+            continue
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+            metrics.time_to_first_token = first_token_at - metrics.started_at
+        yield content
+
+    finish_turn(agent, metrics, first_token_at)
@@ -0,0 +1,94 @@
+"""
+Background model warm-up so the first question does not pay for loading the model
+"""
+
+import threading
+import time
+
+
+class ModelWarmup:
+    def __init__(self, base_url, model_name, system_prompt=None, keep_alive="30m", options=None, timeout=600):
+        """Preload a model and pre-evaluate the persona system prompt on a background thread.
+
+        Args:
+            base_url: Ollama server URL.
+            model_name: Model to load.
+            system_prompt: Exact system message the agent sends, evaluated once so
+                Ollama's prompt cache already holds it when the first question arrives.
+                May be a callable, called on the warm-up thread once the model has loaded.
+            keep_alive: How long Ollama keeps the model in memory after each request.
+            options: Runtime options the agent uses; they must match or Ollama reloads the model.
+            timeout: Seconds to wait for each warm-up request.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.model_name = model_name
+        self.system_prompt = system_prompt
+        self.keep_alive = keep_alive
+        self.options = options
+        self.timeout = timeout
+
+        self.done = threading.Event()
+        self.error = None
+        self.elapsed = None
+        self.load_seconds = None
+        self.prompt_eval_seconds = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="ollama-warmup", daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self):
+        # Imported on the warm-up thread, off the startup path
+        import requests
+
+        started = time.perf_counter()
+        try:
+            # An empty prompt loads the model without generating anything
+            payload = {"model": self.model_name, "prompt": "", "stream": False}
+            if self.keep_alive is not None:
+                payload["keep_alive"] = self.keep_alive
+            if self.options:
+                payload["options"] = self.options
+            response = requests.post(f"{self.base_url}/api/generate", json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            self.load_seconds = response.json().get("load_duration", 0) / 1e9
+
+            system_prompt = self.system_prompt() if callable(self.system_prompt) else self.system_prompt
+            if system_prompt:
+                payload = {
+                    "model": self.model_name,
+                    "messages": [{"role": "system", "content": system_prompt}],
+                    "stream": False,
+                    "options": {**(self.options or {}), "num_predict": 1},
+                }
+                if self.keep_alive is not None:
+                    payload["keep_alive"] = self.keep_alive
+                response = requests.post(f"{self.base_url}/api/chat", json=payload, timeout=self.timeout)
+                response.raise_for_status()
+                self.prompt_eval_seconds = response.json().get("prompt_eval_duration", 0) / 1e9
+        except Exception as e:
+            self.error = e
+        finally:
+            self.elapsed = time.perf_counter() - started
+            self.done.set()
+
+    def is_warm(self):
+        return self.done.is_set() and self.error is None
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def status(self):
+        """Short description for the startup output"""
+        if not self.done.is_set():
+            return "model still warming up"
+        if self.error is not None:
+            return f"warm-up failed ({self.error})"
+        details = [f"ready in {self.elapsed:.1f}s"]
+        if self.load_seconds:
+            details.append(f"load {self.load_seconds:.1f}s")
+        if self.prompt_eval_seconds:
+            details.append(f"persona prompt {self.prompt_eval_seconds:.1f}s")
+        return "model warm (" + ", ".join(details) + ")"